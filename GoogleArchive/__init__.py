@@ -3,13 +3,15 @@
 This can be done through the analyzeData function that is present in this
 module.
 """
-import os
 import time
 from pathlib import Path
-from typing import Sequence, Callable, Union
+from typing import Dict, Sequence, Callable, Optional, Union
 
-from . import parse, graph, photos, searchTerms
-from .historyElements import HistoryElement
+import numpy as np
+
+from . import parse, location, preview, pipeline
+from .filters import ElementFilter
+from .historyElements import HistoryElement, SearchHistoryElement
 
 outputDir = Path.cwd().joinpath('GoogleArchiveData')
 if outputDir.exists():
@@ -21,18 +23,53 @@ else:
     except:
         raise Exception('Error in creating folder.')
 
-def analyzeData(takeoutPath: Union[str, Path]):
+def analyzeData(takeoutPath: Union[str, Path],
+                elementFilter: Optional[ElementFilter] = None,
+                checkpointDir: Optional[Path] = None,
+                previewSize: Optional[int] = None,
+                dir: Optional[Path] = None,
+                processes: Optional[int] = None,
+                memoryBudget: Optional[int] = None) -> Dict[str, np.ndarray]:
     """Do analysis of all data.
 
     Runs analysis of PhotoURL, Purchase Data
-    Youtube Search and Watch, and Google Search.
+    Youtube Search and Watch, Google Search, Youtube channels, Chrome
+    domains, the videos watched after searches, sessions of activity, topics
+    of similar searches and the top searches of each month and year. A
+    SearchIndex of the text of every element is saved to Search_Index.npz,
+    which can be loaded with SearchIndex.load. Location History is summarized
+    with a heatmap and time of day profiles.
 
-    Data is output via .png and .txt files to the GoogleArchiveData directory
+    Data is output via .png and .txt files to the GoogleArchiveData directory,
+    or to the given directory
 
     Args:
         takeoutPath (Union[str, Path]): Relative or absolute path to takeout folder.
             Can be either a string or a Path.
-    
+        elementFilter (ElementFilter) (optional): only analyze elements that
+            match the filter (e.g. a time range). Elements that don't match are
+            skipped while parsing.
+        checkpointDir (Path) (optional): directory to save checkpoints of
+            parsing to, so that an interrupted run resumes where it stopped.
+            Elements that fail to parse are listed in quarantine files there.
+            Checkpoints in the output directory by default.
+        previewSize (int) (optional): if given, only preview the history
+            files: the usual plots and Common_Searches.txt are estimated from
+            a random sample of this many elements of each file, with 95%
+            confidence intervals. Nothing else is analyzed.
+        dir (Path) (optional): directory to save output to. It is created if
+            it doesn't exist. GoogleArchiveData by default.
+        processes (int) (optional): most processes to parse with. The number
+            of CPUs by default. If this is 1, everything runs in this process.
+        memoryBudget (int) (optional): approximate bytes that the counts of
+            common searches may use. Past it, partial counts are spilled to
+            temporary files and merged at the end, with the same results.
+            Counts are kept in memory by default.
+
+    Returns:
+        epochs (see TimeStamp.epoch) of each kind of data that was analyzed, by
+        name (e.g. 'Google Search History'). Empty for a preview.
+
     Raises:
         FileNotFoundError: if the given path to takeout doesn't exist
         ValueError: if taekoutPath is not a folder
@@ -43,46 +80,64 @@ def analyzeData(takeoutPath: Union[str, Path]):
         raise FileNotFoundError("The takeout path {} does not exist".format(takeoutPath))
     if not takeoutPath.is_dir():
         raise ValueError("The takeoutPath {} must be a folder".format(takeoutPath))
+    if dir is None:
+        dir = outputDir
+    dir.mkdir(parents=True, exist_ok=True)
+    if previewSize is not None:
+        previewData(takeoutPath, previewSize, elementFilter, dir)
+        return {}
+    if checkpointDir is None:
+        checkpointDir = dir.joinpath('Checkpoints')
+
+    return pipeline.runPipeline(takeoutPath, elementFilter, checkpointDir, dir, processes,
+                                memoryBudget)
+
+def previewData(takeoutPath: Path, sampleSize: int,
+                elementFilter: Optional[ElementFilter] = None,
+                dir: Optional[Path] = None) -> None:
+    """Save plots and common searches estimated from a sample of each history file.
+
+    Args:
+        takeoutPath (Path): path to the takeout folder
+        sampleSize (int): number of elements to sample from each file
+        elementFilter (ElementFilter) (optional): only estimate elements that
+            match the filter
+        dir (Path) (optional): directory to save output to. GoogleArchiveData
+            by default.
+    """
+    if dir is None:
+        dir = outputDir
+    searchSamples = []
+    for name, filePath, elementClass, _ in parse.historyFiles(takeoutPath):
+        sample = parseData(lambda path, sampleFilter: preview.sampleFile(
+                               path, filePath, elementClass, sampleSize, sampleFilter),
+                           takeoutPath, name, elementFilter)
+        if not sample:
+            continue
+        preview.displayEstimatePlots(sample, 'month', name, dir)
+        if elementClass is SearchHistoryElement:
+            searchSamples.append(sample)
+    preview.logEstimatedSearches(searchSamples, 25, dir)
+
+def analyzeLocations(locationData: location.LocationHistory, title: str,
+                     dir: Optional[Path] = None) -> None:
+    """Save plots and a summary of locations to the output directory.
+
+    Args:
+        locationData (LocationHistory): the locations
+        title (str): name of the locations (e.g. 'Location History')
+        dir (Path) (optional): directory to save output to. GoogleArchiveData
+            by default.
+    """
+    if dir is None:
+        dir = outputDir
+    for draw in pipeline.locationPlots(locationData, title, dir):
+        draw()
 
-    photos.photoURL(takeoutPath, outputDir)
-    # TODO - can't fix purchase data right now b/c I have none
-    # purchase.getData(takeoutPath)
-    
-    YoutubeSearchData = parseData(parse.YoutubeSearchHistory,
-                                   takeoutPath,
-                                   "Youtube Search History")
-    YoutubeWatchData = parseData(parse.YoutubeWatchHistory,
-                                  takeoutPath,
-                                  "Youtube Watch History")
-    GoogleSearchData = parseData(parse.GoogleSearchHistory,
-                                  takeoutPath,
-                                  "Google Search History")
-    ChromeData = parseData(parse.chromeHistory,
-                           takeoutPath,
-                           "Google Chrome History")
-
-    allData = []
-    if (YoutubeSearchData):
-        allData.extend(YoutubeSearchData)
-        searchData = [x for x in YoutubeSearchData if x.action=="Searched for"]
-        graph.displayDataPlots(searchData, dir = outputDir)
-    if (YoutubeWatchData):
-        allData.extend(YoutubeWatchData)
-        graph.displayDataPlots(YoutubeWatchData, title="Youtube Watch Data", dir = outputDir)
-    if (GoogleSearchData):
-        allData.extend(GoogleSearchData)
-        graph.displayDataPlots(GoogleSearchData, title = 'Google Search', dir = outputDir)
-    if (ChromeData):
-        allData.extend(ChromeData)
-        graph.displayDataPlots(ChromeData, title = "Google Chrome", dir = outputDir)
-    if(len(allData) > 0):
-        graph.displayDataPlots(allData, title = 'All Search and Watch', dir = outputDir)
-
-    searchTerms.commonSearchTerms(allData, 25, outputDir)
-
-def parseData(func: Callable[[Path], Sequence[HistoryElement]],
+def parseData(func: Callable[[Path, Optional[ElementFilter]], Sequence[HistoryElement]],
                takeoutPath: Path,
-               dataName: str
+               dataName: str,
+               elementFilter: Optional[ElementFilter] = None
                ) -> Sequence[HistoryElement]:
     """Run the given parse function.
 
@@ -94,6 +149,8 @@ def parseData(func: Callable[[Path], Sequence[HistoryElement]],
             parse function
         dataName (str): the name of the data, used in messages, such as
             (e.g. "google search")
+        elementFilter (ElementFilter) (optional): filter to pass through to
+            the parse function
 
     Returns:
         Sequence of HistoryElements from parsing the object, or an empty list if
@@ -102,7 +159,7 @@ def parseData(func: Callable[[Path], Sequence[HistoryElement]],
     start = time.time()
     data = []
     try:
-        data = func(takeoutPath)
+        data = func(takeoutPath, elementFilter)
     except FileNotFoundError:
         print("Could not find {} data".format(dataName))
     except Exception as e:
@@ -113,8 +170,4 @@ def parseData(func: Callable[[Path], Sequence[HistoryElement]],
 
 
 #TODO - 
-#parse chrome data
-#parse maps
-#parse location history
-#number contacts
-#mail
\ No newline at end of file
+#number contacts
\ No newline at end of file
@@ -1,11 +1,32 @@
-"""Functions for parsing HTML."""
+"""Functions for parsing HTML.
+
+HTML is turned into Tags by a backend. The available backends are:
+    regex: a regex scan and a simple tree builder, always available
+    htmlparser: events from the standard library's html.parser
+    lxml: lxml's iterparse, only available if lxml is installed
+
+When no backend is given, lxml is used if it is installed, and regex otherwise.
+"""
 # %%
 from __future__ import annotations  # We need this to use Tag type in Tag class
+from abc import ABC, abstractmethod
+from html import unescape
+from html.parser import HTMLParser
 from pathlib import Path
+import io
 import re
 import os
 
-from typing import Sequence, Optional
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+"""Tags that never have a closing tag."""
+_VOID_TAGS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input",
+                        "link", "meta", "param", "source", "track", "wbr"))
 
 class Tag:
     """Defines an HTML tag.
@@ -57,9 +78,10 @@ class Tag:
         names = re.findall(tagRegex, self._tagString)
         if names:
             # TODO - add some sort of check here that we don't find multiple matches
-            value = "".join(names[0].split("=")[1:])
-            # remove first and last quotes
-            return value[1:-1]
+            # split only on the first "=" so values such as URLs keep theirs
+            value = names[0].split("=", 1)[1]
+            # remove first and last quotes, and the quotes that _tagString escaped
+            return value[1:-1].replace("&quot;", '"')
         return ""
 
     @property
@@ -190,28 +212,280 @@ def _generateTags(tags: Sequence[str], texts: Sequence[str]) -> None:
 
     return headTag
 
-def generateTags(html: str) -> Tag:
+def _tagString(name: str, attributes: Sequence[Tuple[str, Optional[str]]]) -> str:
+    """Rebuild the raw text of an opening tag from its name and attributes."""
+    parts = [name]
+    for key, value in attributes:
+        if value is None:
+            parts.append(key)
+        else:
+            parts.append('{}="{}"'.format(key, value.replace('"', "&quot;")))
+    return "<{}>".format(" ".join(parts))
+
+class HTMLBackend(ABC):
+    """Turns an HTML string into a tree of Tags.
+
+    Every backend gives the same tree for well formed HTML. The text of a Tag
+    is the stripped text between its opening tag and the next tag, and the text
+    after a void tag such as <br> belongs to the void tag.
+
+    Attributes:
+        name (str): name the backend is selected by
+    """
+
+    name = ""
+
+    @abstractmethod
+    def generateTags(self, html: str) -> Tag:
+        """Generate tags for an HTML string.
+
+        Args:
+            html (str): the string of the HTML
+
+        Returns:
+            Tag object which is the head tag of the HTML
+        """
+
+class RegexBackend(HTMLBackend):
+    """Backend that splits the HTML on a tag regex.
+
+    Character references (e.g. &amp;) are converted in text and attributes,
+    like the other backends. Only <br> and comments are treated as tags
+    without a closing tag, and it stops at the first closing tag that has no
+    matching opening tag.
+    """
+
+    name = "regex"
+
+    def generateTags(self, html: str) -> Tag:
+        tagRegex = re.compile("<[^>]*>")
+        tags = re.findall(tagRegex, html)
+        texts = re.split(tagRegex, html)
+        texts = texts[1:]   # Ignore the first "" before open tag
+        tags = [_unescapeTag(tag.strip()) for tag in tags]
+        texts = [unescape(text).strip() for text in texts]
+        return _generateTags(tags, texts)
+
+"""Name or attribute of an opening tag, with a quoted, unquoted or no value."""
+_ATTRIBUTE_REGEX = re.compile(r"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+
+def _unescapeTag(tag: str) -> str:
+    """Convert the character references of the attributes of an opening tag.
+
+    The tag is rebuilt the way the htmlparser and lxml backends build it, so
+    that every backend gives the same attribute values. Tags without a
+    character reference are left as they are.
+    """
+    if "&" not in tag or tag[:2] in ("</", "<!"):
+        return tag
+    name, *attributes = _ATTRIBUTE_REGEX.finditer(tag[1:-1])
+    values = []
+    for attribute in attributes:
+        value = next((x for x in attribute.groups()[1:] if x is not None), None)
+        values.append((attribute.group(1).lower(), unescape(value) if value is not None else None))
+    return _tagString(name.group(1).lower(), values)
+
+class _TagBuilder(HTMLParser):
+    """Builds Tags from the events of html.parser."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.head: Optional[Tag] = None
+        self._open: List[Tag] = []
+        self._openNames: List[str] = []
+        self._textTag: Optional[Tag] = None
+        self._textParts: List[str] = []
+
+    def _flushText(self) -> None:
+        if self._textTag is not None:
+            self._textTag.setText("".join(self._textParts).strip())
+        self._textTag = None
+        self._textParts = []
+
+    def handle_starttag(self, name: str, attributes) -> None:
+        self._flushText()
+        parent = self._open[-1] if self._open else self.head
+        tag = Tag(_tagString(name, attributes), parent)
+        if parent is None:
+            self.head = tag
+        else:
+            parent.addChild(tag)
+        if name not in _VOID_TAGS:
+            self._open.append(tag)
+            self._openNames.append(name)
+        self._textTag = tag
+
+    def handle_startendtag(self, name: str, attributes) -> None:
+        self._flushText()
+        parent = self._open[-1] if self._open else self.head
+        tag = Tag(_tagString(name, attributes), parent)
+        if parent is None:
+            self.head = tag
+        else:
+            parent.addChild(tag)
+        self._textTag = tag
+
+    def handle_endtag(self, name: str) -> None:
+        self._flushText()
+        # close any tags left open inside this one, and ignore stray end tags
+        if name in self._openNames:
+            while self._openNames.pop() != name:
+                self._open.pop()
+            self._open.pop()
+
+    def handle_data(self, data: str) -> None:
+        if self._textTag is not None:
+            self._textParts.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._flushText()
+
+class HTMLParserBackend(HTMLBackend):
+    """Backend that builds Tags from the events of html.parser.HTMLParser.
+
+    Character references are converted in text and attributes. Closing tags
+    without an opening tag are ignored, and a closing tag closes any tags that
+    were left open inside of it.
+    """
+
+    name = "htmlparser"
+
+    def generateTags(self, html: str) -> Tag:
+        builder = _TagBuilder()
+        builder.feed(html)
+        builder.close()
+        if builder.head is None:
+            raise ValueError("The given HTML has no tags")
+        return builder.head
+
+class LxmlBackend(HTMLBackend):
+    """Backend that builds Tags from lxml's iterparse events.
+
+    Character references are converted in text and attributes, and malformed
+    nesting is repaired by libxml2. The <html> and <body> tags that libxml2
+    adds around a fragment are left out of the tree.
+    """
+
+    name = "lxml"
+
+    def generateTags(self, html: str) -> Tag:
+        implied = {name for name in ("html", "body")
+                   if re.search("<{}\\b".format(name), html, re.IGNORECASE) is None}
+        events = etree.iterparse(io.BytesIO(html.encode("UTF-8")), events=("start", "end"),
+                                 html=True, encoding="UTF-8")
+        head = None
+        openTags: List[Tag] = []
+        built = []
+        for event, element in events:
+            if not isinstance(element.tag, str) or element.tag in implied:
+                continue
+            if event == "end":
+                if element.tag not in _VOID_TAGS:
+                    openTags.pop()
+                continue
+            parent = openTags[-1] if openTags else head
+            tag = Tag(_tagString(element.tag, element.attrib.items()), parent)
+            if parent is None:
+                head = tag
+            else:
+                parent.addChild(tag)
+            if element.tag not in _VOID_TAGS:
+                openTags.append(tag)
+            built.append((tag, element))
+        if head is None:
+            raise ValueError("The given HTML has no tags")
+        # text is only complete once the whole document has been parsed
+        for tag, element in built:
+            text = element.tail if element.tag in _VOID_TAGS else element.text
+            tag.setText((text or "").strip())
+        return head
+
+_BACKENDS: Dict[str, HTMLBackend] = {backend.name: backend for backend in
+                                     (RegexBackend(), HTMLParserBackend(), LxmlBackend())}
+
+def availableBackends() -> Sequence[str]:
+    """Get the names of the backends that can be used."""
+    return tuple(name for name in _BACKENDS if name != LxmlBackend.name or etree is not None)
+
+def getBackend(name: Optional[str] = None) -> HTMLBackend:
+    """Get an HTML backend by its name.
+
+    Args:
+        name (str) (optional): 'regex', 'htmlparser' or 'lxml'. If None, lxml
+            is used when it is installed, and regex otherwise.
+
+    Returns:
+        the backend
+
+    Raises:
+        ValueError: if there is no backend with the name, or if lxml is asked
+            for but is not installed
+    """
+    if name is None:
+        name = LxmlBackend.name if etree is not None else RegexBackend.name
+    if name not in _BACKENDS:
+        raise ValueError("Unknown HTML backend {}, must be one of {}".format(name, list(_BACKENDS)))
+    if name not in availableBackends():
+        raise ValueError("The {} HTML backend is not installed".format(name))
+    return _BACKENDS[name]
+
+def generateTags(html: str, backend: Optional[str] = None) -> Tag:
     """Generate tags for an HTML string.
 
     Args:
         html (str): the string of the HTML
+        backend (str) (optional): name of the backend to use (see getBackend)
     
     Returns:
         Tag object which is the head tag of the HTML
     """
-    tagRegex = re.compile("<[^>]*>")
-    tags = re.findall(tagRegex, html)
-    texts = re.split(tagRegex, html)
-    texts = texts[1:]   # Ignore the first "" before open tag
-    tags = [tag.strip() for tag in tags]
-    texts = [text.strip() for text in texts]
-    return _generateTags(tags, texts)
-
-def loadHTML(path: Path) -> Tag:
+    return getBackend(backend).generateTags(html)
+
+_DIV_REGEX = re.compile(rb"<(/?)div\b", re.IGNORECASE)
+
+def iterElementSpans(source: bytes, className: str, start: int = 0) -> Iterator[Tuple[int, int]]:
+    """Find the byte spans of every div with the given class.
+
+    The source is scanned for the opening tag and the matching closing tag is
+    found by counting nested divs, so no Tags are built. Works on any bytes-like
+    object, including a mmap of the file, which means only the parts of the
+    file that are scanned have to be read.
+
+    Args:
+        source (bytes): the raw HTML
+        className (str): the exact class of the divs to find
+        start (int) (optional): byte offset to start scanning from
+
+    Returns:
+        Iterator of (start, end) byte offsets, such that source[start:end] is
+        the HTML of the div including its opening and closing tags
+    """
+    marker = '<div class="{}"'.format(className).encode()
+    position = source.find(marker, start)
+    while position != -1:
+        end = _findClosingDiv(source, position)
+        yield position, end
+        position = source.find(marker, end)
+
+def _findClosingDiv(source: bytes, start: int) -> int:
+    """Get the offset just past the closing tag of the div that opens at start.
+
+    If the div is never closed, the length of the source is returned.
+    """
+    depth = 0
+    for match in _DIV_REGEX.finditer(source, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return source.find(b">", match.end()) + 1
+    return len(source)
+
+def loadHTML(path: Path, backend: Optional[str] = None) -> Tag:
     """Load HTML and return the head tag.
 
     Args:
         path (str): Path the the HTML file
+        backend (str) (optional): name of the backend to use (see getBackend)
     
     Returns:
         Tag which is the head tag of the HTML document
@@ -223,7 +497,7 @@ def loadHTML(path: Path) -> Tag:
         raise ValueError("The given path {} does not exist or is not a file".format(path))
     with path.open('r', encoding="UTF-8") as f:
         htmlString = f.read()
-    return generateTags(htmlString)
+    return generateTags(htmlString, backend)
 
 """
 # %%
@@ -0,0 +1,172 @@
+"""Analyze many Takeout folders at once, such as the exports of several accounts.
+
+Every Takeout is analyzed by the pipeline of analyzeData, into its own output
+directory, and the pipelines of all of them run at once (see
+pipeline.runPipelines). The files of every Takeout are parsed on one process
+pool of a bounded size, and their aggregate and render stages share one set
+of threads, so a large Takeout is parsed on every process while the others
+are aggregated and drawn. The files of the largest Takeouts are started
+first, so a large one doesn't start last and hold up the end of the batch.
+
+Once every Takeout is done, the usage of the Takeouts is compared in
+Batch_Summary.txt and a plot of activity per month.
+
+Can be run as:
+    python -m GoogleArchive.batch path/to/Takeout1 path/to/Takeout2 ...
+
+Functions:
+    analyzeBatch
+    logBatchSummary
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+from typing import Dict, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from . import graph, manifest, pipeline, timeConvert, timeSeries
+from .filters import ElementFilter
+
+
+def _archiveNames(takeoutPaths: Sequence[Path]) -> Sequence[str]:
+    """Name each Takeout after its folder, or the folder it was extracted to.
+
+    Takeouts are usually extracted to a folder like Takeout-20200210/Takeout,
+    so a folder named Takeout is named after the folder it is in. Repeated
+    names are numbered.
+    """
+    names = []
+    for path in takeoutPaths:
+        path = path.resolve()
+        name = path.parent.name if path.name == 'Takeout' and path.parent.name else path.name
+        # a number is added until the name is unique, since it names an output folder
+        base = name
+        number = names.count(base)
+        while name in names:
+            number += 1
+            name = "{} ({})".format(base, number)
+        names.append(name)
+    return names
+
+
+def _archiveSize(takeoutPath: Path) -> int:
+    """Get the total size of the files of a Takeout in bytes."""
+    size = 0
+    for root, _, files in os.walk(takeoutPath):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+
+def analyzeBatch(takeoutPaths: Sequence[Union[str, Path]],
+                 dir: Optional[Path] = None,
+                 elementFilter: Optional[ElementFilter] = None,
+                 processes: Optional[int] = None) -> Dict[str, Dict[str, np.ndarray]]:
+    """Analyze every Takeout on one pool of processes.
+
+    The output of each Takeout is saved to its own folder of dir, named after
+    the Takeout (see analyzeData), and a comparison of them all to dir.
+
+    Args:
+        takeoutPaths (Sequence[Union[str, Path]]): paths of the Takeout folders
+        dir (Path) (optional): directory to save output to. It is created if
+            it doesn't exist. GoogleArchiveData by default.
+        elementFilter (ElementFilter) (optional): only analyze elements that
+            match the filter
+        processes (int) (optional): most processes to use. The number of CPUs
+            by default.
+
+    Returns:
+        the result of analyzeData of each Takeout that was analyzed, by the
+        name of the Takeout. Takeouts that fail are printed and left out.
+
+    Raises:
+        FileNotFoundError: if a path doesn't exist
+        ValueError: if a path is not a folder
+    """
+    takeoutPaths = [Path(x) for x in takeoutPaths]
+    for path in takeoutPaths:
+        if not path.exists():
+            raise FileNotFoundError("The takeout path {} does not exist".format(path))
+        if not path.is_dir():
+            raise ValueError("The takeoutPath {} must be a folder".format(path))
+    if dir is None:
+        dir = Path.cwd().joinpath('GoogleArchiveData')
+    dir.mkdir(parents=True, exist_ok=True)
+    names = _archiveNames(takeoutPaths)
+    sizes = {name: _archiveSize(path) for name, path in zip(names, takeoutPaths)}
+
+    start = time.time()
+    order = sorted(zip(names, takeoutPaths), key=lambda x: -sizes[x[0]])
+    takeouts = []
+    for name, path in order:
+        dir.joinpath(name).mkdir(exist_ok=True)
+        takeouts.append((path, dir.joinpath(name, 'Checkpoints'), dir.joinpath(name)))
+    outcomes = dict(zip([name for name, _ in order],
+                        pipeline.runPipelines(takeouts, elementFilter, processes)))
+    results = {}
+    for name in names:
+        if isinstance(outcomes[name], Exception):
+            print("An unexcepted exception, {}, occured in analyzing {}".format(outcomes[name], name))
+        else:
+            results[name] = outcomes[name]
+    print("Took {}s to analyze {} takeouts".format(time.time() - start, len(results)))
+    logBatchSummary(results, dir)
+    return results
+
+
+def logBatchSummary(results: Mapping[str, Mapping[str, np.ndarray]], dir: Path) -> None:
+    """Compare the data of several Takeouts in Batch_Summary.txt and a plot.
+
+    The plot, 'All Takeouts Activity Per month', shows the number of elements
+    per month of every kind of data except Location History, whose records
+    are taken automatically rather than by use.
+
+    Args:
+        results (Mapping[str, Mapping[str, np.ndarray]]): epochs of each kind
+            of data of each Takeout, by the name of the Takeout (see
+            analyzeBatch)
+        dir (Path): directory to save the files to
+    """
+    kinds = sorted({kind for epochs in results.values() for kind in epochs})
+    with manifest.textOutput(dir.joinpath("Batch_Summary.txt")) as f:
+        f.write("Takeouts: {}\n".format(", ".join(results)))
+        for kind in kinds:
+            f.write("\n{}:\n".format(kind))
+            for name, epochs in results.items():
+                if kind not in epochs:
+                    f.write("{} , none\n".format(name))
+                    continue
+                first = timeConvert.TimeStamp.fromEpoch(int(epochs[kind].min()))
+                last = timeConvert.TimeStamp.fromEpoch(int(epochs[kind].max()))
+                f.write("{} , Total:{} , From:{}-{:02d}-{:02d} , To:{}-{:02d}-{:02d}\n".format(
+                    name, len(epochs[kind]), first.year, first.monthNumber, first.day,
+                    last.year, last.monthNumber, last.day))
+    series = {}
+    for name, epochs in results.items():
+        activity = [x for kind, x in epochs.items() if 'Location' not in kind]
+        if activity:
+            series[name] = timeSeries.resample(np.concatenate(activity), 'month')
+    if series:
+        graph.comparePlot(series, 'All Takeouts Activity', dir)
+
+
+def main() -> None:
+    """Analyze the Takeouts given on the command line."""
+    parser = argparse.ArgumentParser(description="Analyze several Google Takeout folders.")
+    parser.add_argument("takeoutPaths", nargs="+", type=Path, help="paths of Takeout folders")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="directory to save output to (GoogleArchiveData by default)")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="most processes to use (the number of CPUs by default)")
+    args = parser.parse_args()
+    analyzeBatch(args.takeoutPaths, args.output, processes=args.processes)
+
+
+if __name__ == '__main__':
+    main()
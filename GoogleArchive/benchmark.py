@@ -0,0 +1,138 @@
+"""Reports on the cost of parsing a Takeout archive.
+
+These are meant to be run on a real archive to check how changes to parsing
+affect it. Reports are written as .txt files to the given directory.
+
+Functions:
+    internMemoryReport
+    backendSpeedReport
+"""
+import gc
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple, Type
+
+from . import parse
+from ._htmlParse import availableBackends
+from .historyElements import HistoryElement
+from .symbols import SymbolTable
+
+"""Name, path within Takeout and element class of each file that is parsed."""
+_SOURCES = parse.HISTORY_FILES
+
+
+def _retainedMemory(build: Callable[[], Sequence[HistoryElement]]) -> Tuple[int, int, float]:
+    """Measure the memory that the result of build holds on to.
+
+    Args:
+        build: function that parses and returns elements
+
+    Returns:
+        Tuple of bytes retained by the result, number of elements, and seconds
+        taken to build it
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    before = tracemalloc.get_traced_memory()[0]
+    elements = build()
+    seconds = time.time() - start
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained, len(elements), seconds
+
+
+def _parseElements(takeoutPath: Path, filePath: str, elementClass: Type[HistoryElement],
+                   symbols: Optional[SymbolTable] = None,
+                   backend: Optional[str] = None) -> List[HistoryElement]:
+    """Parse every element of a file with parse.iterElements.
+
+    Args:
+        takeoutPath (Path): path to the takeout folder
+        filePath (str): the path to the file from within Takeout
+        elementClass (Type[HistoryElement]): class to create for each element
+        symbols (SymbolTable) (optional): table to intern fields through.
+            Fields are not interned by default.
+        backend (str) (optional): HTML backend to generate Tags with
+
+    Returns:
+        List of every element that could be parsed
+
+    Raises:
+        FileNotFoundError: if the file does not exist
+    """
+    source = parse.openFile(takeoutPath, filePath)
+    if source is None:
+        return []
+    with source:
+        return [x for _, _, x, _ in parse.iterElements(source, elementClass, backend=backend,
+                                                       symbols=symbols)
+                if x is not None]
+
+
+def internMemoryReport(takeoutPath: Path, dir: Path) -> None:
+    """Compare memory of parsed elements with and without string interning.
+
+    Every file is parsed twice, once with a per-parse SymbolTable and once
+    without, and the memory held by the resulting elements is written to
+    Memory_Report.txt. Files that are missing are skipped.
+
+    Args:
+        takeoutPath (Path): path to the takeout folder
+        dir (Path): directory to save the report to
+    """
+    lines = []
+    for name, filePath, elementClass in _SOURCES:
+        try:
+            plain = _retainedMemory(lambda: _parseElements(takeoutPath, filePath, elementClass))
+            symbols = SymbolTable()
+            withSymbols = _retainedMemory(lambda: _parseElements(takeoutPath, filePath, elementClass,
+                                                                 symbols))
+        except FileNotFoundError:
+            print("Could not find {} data".format(name))
+            continue
+        saved = plain[0] - withSymbols[0]
+        lines.append("{}: {} elements, {} distinct interned strings\n".format(
+            name, plain[1], len(symbols)))
+        lines.append("    Without interning: {:.2f} MiB ({:.1f}s)\n".format(plain[0] / 2**20, plain[2]))
+        lines.append("    With interning:    {:.2f} MiB ({:.1f}s)\n".format(
+            withSymbols[0] / 2**20, withSymbols[2]))
+        lines.append("    Saved:             {:.2f} MiB ({:.0%}), {:.0f} bytes per element\n".format(
+            saved / 2**20, saved / plain[0] if plain[0] else 0, saved / plain[1] if plain[1] else 0))
+    with dir.joinpath("Memory_Report.txt").open("w") as f:
+        f.write("Memory held by parsed elements\n")
+        f.writelines(lines)
+    print("".join(lines), end="")
+
+
+def backendSpeedReport(takeoutPath: Path, dir: Path) -> None:
+    """Compare the speed of parsing with each available HTML backend.
+
+    Every file is fully parsed with each backend, and the elements per second
+    are written to Backend_Report.txt. Files that are missing are skipped.
+
+    Args:
+        takeoutPath (Path): path to the takeout folder
+        dir (Path): directory to save the report to
+    """
+    lines = []
+    for name, filePath, elementClass in _SOURCES:
+        results = []
+        try:
+            for backend in availableBackends():
+                start = time.time()
+                elements = _parseElements(takeoutPath, filePath, elementClass, SymbolTable(), backend)
+                results.append((backend, len(elements), time.time() - start))
+        except FileNotFoundError:
+            print("Could not find {} data".format(name))
+            continue
+        lines.append("{}:\n".format(name))
+        for backend, count, seconds in results:
+            lines.append("    {:<10} {:>8} elements in {:6.2f}s, {:>10.0f} elements/s\n".format(
+                backend, count, seconds, count / seconds if seconds else 0))
+    with dir.joinpath("Backend_Report.txt").open("w") as f:
+        f.write("Parsing speed of each HTML backend\n")
+        f.writelines(lines)
+    print("".join(lines), end="")
@@ -0,0 +1,239 @@
+"""Checkpoints of parse progress, and quarantine of elements that fail to parse.
+
+While a file is parsed, a checkpoint is saved every CHECKPOINT_BYTES of the
+file, so a run that is interrupted resumes from the last checkpoint instead of
+the start of the file. Each checkpoint is a chunk of the elements (and
+failures) since the one before, and a small index of the byte offset that
+parsing has reached and the number of chunks, so every element is only saved
+once. A checkpoint is only resumed if the file and the settings of the parse
+are unchanged, and it is removed once the file is done.
+
+Elements that can't be parsed are skipped, and the byte span and error of each
+one is written to a quarantine file next to the checkpoints.
+
+Classes:
+    ParseProgress
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple, Type
+
+import numpy as np
+
+from .columns import HistoryColumns, FIELDS, decodeStrings, encodeStrings, encodeColumns
+from .filters import ElementFilter
+from .historyElements import HistoryElement
+
+"""Bytes of a file that are parsed between checkpoints."""
+CHECKPOINT_BYTES = 32 * 1024 * 1024
+
+
+def _settingsKey(path: Path, elementClass: Type[HistoryElement],
+                 elementFilter: Optional[ElementFilter], backend: Optional[str]) -> str:
+    """Get a key that changes if the file or the settings of a parse change."""
+    stat = path.stat()
+    settings = [str(path.resolve()), stat.st_size, stat.st_mtime_ns, elementClass.__name__, backend]
+    if elementFilter is not None:
+        settings += [elementFilter.since, elementFilter.until,
+                     sorted(elementFilter.products) if elementFilter.products is not None else None,
+                     sorted(elementFilter.actions) if elementFilter.actions is not None else None]
+    return hashlib.sha1(repr(settings).encode("UTF-8")).hexdigest()
+
+
+class ParseProgress:
+    """Elements parsed from a file so far, and the elements that failed.
+
+    Attributes:
+        offset (int): byte offset of the file that every element before has
+            been parsed (or skipped) up to
+        elements (List[HistoryElement]): elements parsed so far, in order
+        failures (List[Tuple[int, int, str]]): (start, end, error) of each
+            element that could not be parsed
+    """
+
+    def __init__(self, path: Path, filePath: str, elementClass: Type[HistoryElement],
+                 key: str, checkpointDir: Optional[Path] = None) -> None:
+        """Create ParseProgress at the start of a file. See ParseProgress.resume.
+
+        Args:
+            path (Path): path of the file
+            filePath (str): path of the file within Takeout, used in messages
+            elementClass (Type[HistoryElement]): class of the elements
+            key (str): key of the file and settings of the parse
+            checkpointDir (Path) (optional): directory of checkpoints and
+                quarantine files. Nothing is saved if this is None.
+        """
+        self.offset = 0
+        self.elements: List[HistoryElement] = []
+        self.failures: List[Tuple[int, int, str]] = []
+        self._filePath = filePath
+        self._elementClass = elementClass
+        self._key = key
+        self._lastSave = 0
+        # elements and failures that are already in chunks, and the number of chunks
+        self._savedElements = 0
+        self._savedFailures = 0
+        self._chunks = 0
+        self._checkpointPath = None
+        self._quarantinePath = None
+        if checkpointDir is not None:
+            # the hash keeps files of the same name in different takeouts apart
+            name = "{}-{}".format(filePath.replace("/", "_"),
+                                  hashlib.sha1(str(path.resolve()).encode("UTF-8")).hexdigest()[:8])
+            self._checkpointPath = checkpointDir.joinpath(name + ".checkpoint.npz")
+            self._chunkName = name + ".checkpoint.{:05d}.npz"
+            self._quarantinePath = checkpointDir.joinpath(name + ".quarantine.txt")
+
+    @classmethod
+    def resume(cls, takeoutPath: Path, filePath: str, elementClass: Type[HistoryElement],
+               elementFilter: Optional[ElementFilter] = None, backend: Optional[str] = None,
+               checkpointDir: Optional[Path] = None) -> "ParseProgress":
+        """Get the progress of a parse, from its checkpoint if there is one.
+
+        Args:
+            takeoutPath (Path): the path to the Takeout folder
+            filePath (str): the path to the file from within Takeout
+            elementClass (Type[HistoryElement]): class of the elements
+            elementFilter (ElementFilter) (optional): filter of the parse
+            backend (str) (optional): HTML backend of the parse
+            checkpointDir (Path) (optional): directory of checkpoints. It is
+                created if it doesn't exist. Nothing is saved if this is None.
+
+        Returns:
+            ParseProgress of the checkpoint if it is of the same file and
+            settings, or else at the start of the file
+        """
+        path = takeoutPath.joinpath(filePath)
+        key = _settingsKey(path, elementClass, elementFilter, backend)
+        if elementClass not in FIELDS:
+            checkpointDir = None
+        if checkpointDir is not None:
+            checkpointDir.mkdir(parents=True, exist_ok=True)
+        progress = cls(path, filePath, elementClass, key, checkpointDir)
+        if progress._checkpointPath is not None and progress._checkpointPath.exists():
+            try:
+                progress._load()
+            except (OSError, ValueError, KeyError):
+                print("Could not read the checkpoint of {}, parsing from the start".format(filePath))
+                progress.offset, progress.elements, progress.failures = 0, [], []
+                progress._lastSave = progress._savedElements = progress._savedFailures = 0
+                progress._chunks = 0
+        return progress
+
+    def _chunkPath(self, chunk: int) -> Path:
+        """Get the path of a chunk of the checkpoint."""
+        return self._checkpointPath.with_name(self._chunkName.format(chunk))
+
+    def _load(self) -> None:
+        """Load the checkpoint if its key matches."""
+        with np.load(self._checkpointPath) as arrays:
+            if arrays["key"].tobytes().decode("UTF-8") != self._key:
+                return
+            offset = int(arrays["offset"])
+            chunks = int(arrays["chunks"])
+        elements = []
+        failures = []
+        for chunk in range(chunks):
+            with np.load(self._chunkPath(chunk)) as arrays:
+                columns = HistoryColumns(self._elementClass,
+                                         {name[len("columns/"):]: arrays[name] for name in arrays.files
+                                          if name.startswith("columns/")})
+                errors = decodeStrings(arrays["failureErrorOffsets"], arrays["failureErrors"])
+                failures += zip(arrays["failureStarts"].tolist(), arrays["failureEnds"].tolist(), errors)
+            elements += columns
+        self.elements, self.failures = elements, failures
+        self.offset = self._lastSave = offset
+        self._savedElements, self._savedFailures, self._chunks = len(elements), len(failures), chunks
+        print("Resuming {} from byte {} ({} elements)".format(self._filePath, self.offset,
+                                                              len(self.elements)))
+
+    def add(self, element: HistoryElement, end: int) -> None:
+        """Record a parsed element.
+
+        Args:
+            element (HistoryElement): the element
+            end (int): byte offset of the end of the element
+        """
+        self.elements.append(element)
+        self.skip(end)
+
+    def fail(self, start: int, end: int, error: Exception) -> None:
+        """Record an element that could not be parsed.
+
+        Args:
+            start (int): byte offset of the start of the element
+            end (int): byte offset of the end of the element
+            error (Exception): the error it raised
+        """
+        self.failures.append((start, end, "{}: {}".format(type(error).__name__, error)))
+        self.skip(end)
+
+    def skip(self, end: int) -> None:
+        """Record that parsing has reached a byte offset, and save a checkpoint if it is due.
+
+        Args:
+            end (int): byte offset of the end of the last element handled
+        """
+        self.offset = end
+        if self._checkpointPath is not None and self.offset - self._lastSave >= CHECKPOINT_BYTES:
+            self.save()
+
+    def save(self) -> None:
+        """Save a checkpoint of the elements since the last one, and the quarantine file."""
+        elements = self.elements[self._savedElements:]
+        failures = self.failures[self._savedFailures:]
+        columns = encodeColumns(elements, self._elementClass)
+        errorOffsets, errors = encodeStrings(x[2] for x in failures)
+        arrays = {"columns/" + name: array for name, array in columns.arrays.items()}
+        _saveArrays(self._chunkPath(self._chunks),
+                    failureStarts=np.array([x[0] for x in failures], dtype=np.int64),
+                    failureEnds=np.array([x[1] for x in failures], dtype=np.int64),
+                    failureErrorOffsets=errorOffsets, failureErrors=errors, **arrays)
+        # the chunk is only part of the checkpoint once the index counts it
+        _saveArrays(self._checkpointPath, key=np.frombuffer(self._key.encode("UTF-8"), dtype=np.uint8),
+                    offset=np.int64(self.offset), chunks=np.int64(self._chunks + 1))
+        self._chunks += 1
+        self._savedElements += len(elements)
+        self._savedFailures += len(failures)
+        self._lastSave = self.offset
+        self._writeQuarantine()
+
+    def _writeQuarantine(self) -> None:
+        """Write the span and error of each failed element, or remove an old file if none failed."""
+        if not self.failures:
+            if self._quarantinePath.exists():
+                self._quarantinePath.unlink()
+            return
+        with self._quarantinePath.open("w", encoding="UTF-8") as f:
+            f.write("Elements of {} that could not be parsed (start byte, end byte, error):\n"
+                    .format(self._filePath))
+            for start, end, error in self.failures:
+                f.write("{}\t{}\t{}\n".format(start, end, error))
+
+    def finish(self) -> List[HistoryElement]:
+        """Finish the parse, removing the checkpoint.
+
+        Returns:
+            every parsed element, in order
+        """
+        if self.failures:
+            print("Skipped {} elements of {} that could not be parsed{}".format(
+                len(self.failures), self._filePath,
+                ", see " + str(self._quarantinePath) if self._quarantinePath is not None else ""))
+        if self._checkpointPath is not None:
+            self._writeQuarantine()
+            if self._checkpointPath.exists():
+                self._checkpointPath.unlink()
+            # as are chunks left by an interrupted save or an older checkpoint
+            for chunkPath in self._checkpointPath.parent.glob(self._chunkName.replace("{:05d}", "[0-9]" * 5)):
+                chunkPath.unlink()
+        return self.elements
+
+
+def _saveArrays(path: Path, **arrays: np.ndarray) -> None:
+    """Save arrays to an .npz file, replacing it in one step so an interrupted save leaves the old file."""
+    temporaryPath = path.with_name(path.name + ".tmp")
+    with temporaryPath.open("wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temporaryPath, path)
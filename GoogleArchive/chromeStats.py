@@ -0,0 +1,203 @@
+"""Per-domain analytics of Chrome history.
+
+Visited URLs are decoded from Google's redirect links and reduced to their
+registrable domain (e.g. 'news.bbc.co.uk' -> 'bbc.co.uk'). Domains are stored
+once in a SymbolTable and every count is keyed by the integer code of the
+domain, so memory depends on the number of distinct domains rather than on the
+number of visits.
+
+Functions:
+    decodeURL
+    registrableDomain
+    domainStats
+    logDomainStats
+"""
+import datetime
+import html
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from . import manifest
+from .historyElements import ChromeElement
+from .symbols import SymbolTable
+
+"""Second level labels that are used as public suffixes under country codes.
+
+Without a copy of the public suffix list this covers the common cases, such as
+co.uk, com.au and ac.jp.
+"""
+_SECOND_LEVEL_LABELS = {'ac', 'co', 'com', 'edu', 'gov', 'ltd', 'me', 'mil',
+                        'ne', 'net', 'nic', 'or', 'org', 'plc', 'sch'}
+
+
+def decodeURL(url: str) -> str:
+    """Decode a URL as stored by a ChromeElement.
+
+    ChromeElement removes the 'https://www.google.com/url?q=' prefix, which
+    leaves the escaped target URL followed by Google's own parameters (e.g.
+    'https%3A%2F%2Fexample.com%2F&amp;usg=AFQ...').
+
+    Args:
+        url (str): the url of a ChromeElement
+
+    Returns:
+        the target URL, unescaped. The empty string if url is empty.
+    """
+    if not url:
+        return ""
+    values = parse_qs("q=" + html.unescape(url)).get("q")
+    return values[0] if values else ""
+
+
+@lru_cache(maxsize=4096)
+def _domainFromHost(host: str) -> str:
+    """Reduce a host name to its registrable domain."""
+    if host.startswith("[") or host.replace(".", "").isdigit():
+        # IP addresses have no registrable domain
+        return host
+    labels = host.split(".")
+    keep = 2
+    if len(labels) > 2 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL_LABELS:
+        keep = 3
+    return ".".join(labels[-keep:])
+
+
+def registrableDomain(url: str) -> str:
+    """Get the registrable domain of a URL.
+
+    Args:
+        url (str): an absolute URL (e.g. 'https://news.bbc.co.uk/sport')
+
+    Returns:
+        the registrable domain in lowercase (e.g. 'bbc.co.uk'), or the empty
+        string if the URL has no host
+    """
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return ""
+    if not host:
+        return ""
+    return _domainFromHost(host)
+
+
+class DomainStats:
+    """Counts of Chrome visits grouped by registrable domain.
+
+    Attributes:
+        domains (SymbolTable): every domain that has been seen
+        total (int): number of visits counted
+    """
+
+    def __init__(self) -> None:
+        """Create empty DomainStats."""
+        self.domains = SymbolTable()
+        self.total = 0
+        self._visits = Counter()
+        # keyed by code * 24 + hour
+        self._hours = Counter()
+        # keyed by (code, year * 12 + month - 1)
+        self._months = Counter()
+
+    def add(self, element: ChromeElement) -> None:
+        """Count a single Chrome element.
+
+        Elements without a URL (e.g. 'Used Chrome') are ignored.
+
+        Args:
+            element (ChromeElement): element to count
+        """
+        domain = registrableDomain(decodeURL(element.url))
+        if not domain:
+            return
+        code = self.domains.code(domain)
+        timeStamp = element.timeStamp
+        self.total += 1
+        self._visits[code] += 1
+        self._hours[code * 24 + timeStamp.hour] += 1
+        self._months[code, timeStamp.year * 12 + timeStamp.monthNumber - 1] += 1
+
+    def topDomains(self, numDomains: int) -> Sequence[Tuple[str, int]]:
+        """Get the most visited domains.
+
+        Args:
+            numDomains (int): number of domains to return
+
+        Returns:
+            Sequence of (domain, visits), most visited first
+        """
+        return [(self.domains[code], count)
+                for code, count in self._visits.most_common(numDomains)]
+
+    def hourlyProfile(self, domain: str) -> Sequence[int]:
+        """Get the number of visits to a domain for each hour of the day.
+
+        Args:
+            domain (str): the registrable domain
+
+        Returns:
+            Sequence of 24 counts, where index 0 is midnight
+        """
+        if domain not in self.domains:
+            return [0] * 24
+        code = self.domains.code(domain)
+        return [self._hours[code * 24 + hour] for hour in range(24)]
+
+    def timeSeries(self, domain: str) -> Sequence[Tuple[datetime.datetime, int]]:
+        """Get the number of visits to a domain for each month.
+
+        Args:
+            domain (str): the registrable domain
+
+        Returns:
+            Sequence of (first day of the month, visits), oldest first. Months
+            without visits are left out.
+        """
+        if domain not in self.domains:
+            return []
+        code = self.domains.code(domain)
+        months = sorted((month, count) for (key, month), count in self._months.items()
+                        if key == code)
+        return [(datetime.datetime(month // 12, month % 12 + 1, 1), count)
+                for month, count in months]
+
+
+def domainStats(data: Iterable[ChromeElement]) -> DomainStats:
+    """Compute DomainStats in a single pass over Chrome history.
+
+    Args:
+        data (Iterable[ChromeElement]): the Chrome history. Can be any iterable,
+            so elements can be streamed from a parse without holding them all.
+
+    Returns:
+        DomainStats of the given data
+    """
+    stats = DomainStats()
+    for element in data:
+        stats.add(element)
+    return stats
+
+
+def logDomainStats(stats: DomainStats, numDomains: int, dir: Path) -> None:
+    """Save the most visited domains to Chrome_Domains.txt.
+
+    For each of the top domains the file lists its hourly profile and its
+    visits per month.
+
+    Args:
+        stats (DomainStats): stats to save
+        numDomains (int): number of domains to save
+        dir (Path): directory to save the file to
+    """
+    with manifest.textOutput(dir.joinpath("Chrome_Domains.txt")) as f:
+        f.write("Top Domains ({} visits, {} domains):\n".format(stats.total, len(stats.domains)))
+        for domain, count in stats.topDomains(numDomains):
+            f.write("{} , Frequency:{}\n".format(domain, count))
+        for domain, count in stats.topDomains(numDomains):
+            f.write("\n{}\n".format(domain))
+            f.write("    By hour: {}\n".format(" ".join(str(x) for x in stats.hourlyProfile(domain))))
+            for month, monthCount in stats.timeSeries(domain):
+                f.write("    {}: {}\n".format(month.strftime("%Y-%m"), monthCount))
@@ -0,0 +1,375 @@
+"""Columnar history that is handed between processes through shared memory.
+
+A parsed file is encoded as columns instead of a list of objects:
+    an int64 column of the epoch of each element
+    fields that repeat (product, action, channel) as int32 codes into a
+        dictionary of their distinct values
+    every other string field as an int64 column of offsets into one column of
+        UTF-8 bytes
+
+A parser process writes every column into one block of
+multiprocessing.shared_memory and only sends back a small ColumnLayout. The
+parent maps numpy arrays onto the block, so the columns are never pickled or
+copied. HistoryColumns is a Sequence of elements that read their fields from
+the columns when they are used.
+
+Classes:
+    HistoryColumns
+    ColumnLayout
+    ColumnElement, and a column version of each HistoryElement class
+
+Functions:
+    encodeColumns
+    encodeStrings
+    decodeStrings
+    toSharedMemory
+    fromSharedMemory
+"""
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from .historyElements import HistoryElement, ChromeElement, DeferredHistoryElement, SearchHistoryElement, WatchHistoryElement
+from .symbols import SymbolTable
+from .timeConvert import TimeStamp
+
+"""Dictionary encoded and plain string fields of each element class."""
+FIELDS = {HistoryElement: (('product', 'action'), ()),
+           ChromeElement: (('product', 'action'), ('name', 'url')),
+           SearchHistoryElement: (('product', 'action'), ('query',)),
+           WatchHistoryElement: (('product', 'action', 'channelLink', 'channelName'),
+                                 ('videoLink', 'videoName'))}
+
+"""Byte alignment of each column in a shared memory block."""
+_ALIGNMENT = 8
+
+
+def encodeStrings(strings: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode strings as an offsets column and a bytes column.
+
+    Args:
+        strings (Iterable[str]): the strings to encode
+
+    Returns:
+        Tuple of an int64 offsets column and a uint8 column of UTF-8 bytes.
+        The string at index i is data[offsets[i]:offsets[i + 1]].
+    """
+    encoded = [x.encode("UTF-8") for x in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def decodeStrings(offsets: np.ndarray, data: np.ndarray) -> List[str]:
+    """Decode every string of an offsets column and a bytes column.
+
+    Args:
+        offsets (np.ndarray): offsets column given by encodeStrings
+        data (np.ndarray): bytes column given by encodeStrings
+
+    Returns:
+        List of the strings
+    """
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return [raw[start:end].decode("UTF-8") for start, end in zip(bounds, bounds[1:])]
+
+
+class HistoryColumns(Sequence):
+    """Sequence of HistoryElements that is stored as columns.
+
+    Indexing gives a ColumnElement of the element class, which has all of its
+    properties and __getitem__ keys. Dictionary encoded fields are decoded
+    once, when the columns are created, and shared by every element.
+
+    Attributes:
+        elementClass (Type[HistoryElement]): class of the elements
+        epochs (np.ndarray): epoch of each element (see TimeStamp.epoch)
+    """
+
+    def __init__(self, elementClass: Type[HistoryElement], arrays: Dict[str, np.ndarray],
+                 sharedMemory: Optional[shared_memory.SharedMemory] = None) -> None:
+        """Create HistoryColumns.
+
+        Args:
+            elementClass (Type[HistoryElement]): class of the elements
+            arrays (Dict[str, np.ndarray]): every column, by name (see
+                encodeColumns)
+            sharedMemory (SharedMemory) (optional): block that the arrays are
+                mapped onto. It is kept open for as long as the columns are.
+        """
+        self.elementClass = elementClass
+        self._arrays = arrays
+        self._sharedMemory = sharedMemory
+        self._columnClass = getColumnClass(elementClass)
+        self._symbols = {field: decodeStrings(arrays[field + ".symbols.offsets"],
+                                               arrays[field + ".symbols.bytes"])
+                         for field in FIELDS[elementClass][0]}
+
+    @property
+    def epochs(self) -> np.ndarray:
+        return self._arrays["epochs"]
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Every column, by name."""
+        return self._arrays
+
+    def __len__(self) -> int:
+        return len(self._arrays["epochs"])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("HistoryColumns index out of range")
+        return self._columnClass(self, index)
+
+    def value(self, field: str, index: int):
+        """Decode one field of one element.
+
+        Args:
+            field (str): name of the field (e.g. 'product' or 'query')
+            index (int): index of the element
+
+        Returns:
+            the value of the field
+
+        Raises:
+            KeyError: if the elements have no such field
+        """
+        if field == "timeStamp":
+            return TimeStamp.fromEpoch(self._arrays["epochs"][index])
+        if field in self._symbols:
+            return self._symbols[field][self._arrays[field + ".codes"][index]]
+        offsets = self._arrays[field + ".offsets"]
+        data = self._arrays[field + ".bytes"]
+        return data[offsets[index]:offsets[index + 1]].tobytes().decode("UTF-8")
+
+    def column(self, field: str) -> Sequence:
+        """Decode one field of every element.
+
+        Args:
+            field (str): name of the field (e.g. 'product' or 'query')
+
+        Returns:
+            Sequence of the values of the field, elementwise to the columns
+
+        Raises:
+            KeyError: if the elements have no such field
+        """
+        if field in self._symbols:
+            symbols = self._symbols[field]
+            return [symbols[code] for code in self._arrays[field + ".codes"].tolist()]
+        return decodeStrings(self._arrays[field + ".offsets"], self._arrays[field + ".bytes"])
+
+    def codes(self, field: str) -> Tuple[np.ndarray, Sequence[str]]:
+        """Get the dictionary encoding of a field that repeats, without decoding it.
+
+        Args:
+            field (str): name of a dictionary encoded field (e.g. 'product')
+
+        Returns:
+            Tuple of the code of each element and the value of each code
+
+        Raises:
+            KeyError: if the field is not dictionary encoded
+        """
+        return self._arrays[field + ".codes"], self._symbols[field]
+
+    def close(self) -> None:
+        """Release the shared memory that the columns are mapped onto.
+
+        The columns can't be used after they are closed.
+        """
+        self._arrays = {}
+        if self._sharedMemory is not None:
+            self._sharedMemory.close()
+            self._sharedMemory = None
+
+
+class _SharedBlock(shared_memory.SharedMemory):
+    """SharedMemory that stays mapped for as long as arrays of it are alive."""
+
+    def close(self) -> None:
+        try:
+            super().close()
+        except BufferError:
+            # an array of the block is still used, and the mapping is released
+            # along with the last one
+            pass
+
+
+def encodeColumns(elements: Sequence[HistoryElement],
+                  elementClass: Type[HistoryElement]) -> HistoryColumns:
+    """Encode elements as columns.
+
+    Args:
+        elements (Sequence[HistoryElement]): elements to encode
+        elementClass (Type[HistoryElement]): class of the elements. Must be
+            HistoryElement, ChromeElement, SearchHistoryElement or
+            WatchHistoryElement.
+
+    Returns:
+        HistoryColumns of the elements, in the same order
+
+    Raises:
+        ValueError: if elementClass can't be stored as columns
+    """
+    if elementClass not in FIELDS:
+        raise ValueError("{} can't be stored as columns".format(elementClass.__name__))
+    symbolFields, stringFields = FIELDS[elementClass]
+    arrays = {"epochs": np.fromiter((x.timeStamp.epoch for x in elements),
+                                    dtype=np.int64, count=len(elements))}
+    for field in symbolFields:
+        symbols = SymbolTable()
+        arrays[field + ".codes"] = np.fromiter((symbols.code(getattr(x, field)) for x in elements),
+                                               dtype=np.int32, count=len(elements))
+        offsets, data = encodeStrings(symbols.symbols)
+        arrays[field + ".symbols.offsets"] = offsets
+        arrays[field + ".symbols.bytes"] = data
+    for field in stringFields:
+        offsets, data = encodeStrings(getattr(x, field) for x in elements)
+        arrays[field + ".offsets"] = offsets
+        arrays[field + ".bytes"] = data
+    return HistoryColumns(elementClass, arrays)
+
+
+class ColumnLayout:
+    """Where each column of HistoryColumns is in a shared memory block.
+
+    This is all that is pickled to send columns to another process.
+
+    Attributes:
+        name (str): name of the shared memory block
+        elementClass (Type[HistoryElement]): class of the elements
+        columns (Sequence[Tuple[str, str, int, int]]): name, dtype, byte offset
+            and length of each column
+    """
+
+    def __init__(self, name: str, elementClass: Type[HistoryElement],
+                 columns: Sequence[Tuple[str, str, int, int]]) -> None:
+        """Create a ColumnLayout. See toSharedMemory."""
+        self.name = name
+        self.elementClass = elementClass
+        self.columns = columns
+
+
+def toSharedMemory(columns: HistoryColumns) -> ColumnLayout:
+    """Copy columns into a new shared memory block.
+
+    The block is closed in this process but not unlinked, so it stays until
+    fromSharedMemory is called with the layout in another process.
+
+    Args:
+        columns (HistoryColumns): columns to share
+
+    Returns:
+        ColumnLayout to pass to fromSharedMemory
+    """
+    layout = []
+    size = 0
+    for name, array in columns.arrays.items():
+        size += -size % _ALIGNMENT
+        layout.append((name, array.dtype.str, size, len(array)))
+        size += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for (name, dtype, offset, length) in layout:
+            target = np.ndarray(length, dtype=dtype, buffer=block.buf, offset=offset)
+            target[:] = columns.arrays[name]
+            del target
+    finally:
+        block.close()
+    return ColumnLayout(block.name, columns.elementClass, layout)
+
+
+def fromSharedMemory(layout: ColumnLayout) -> HistoryColumns:
+    """Map the columns of a shared memory block without copying them.
+
+    The block is unlinked once it is mapped, so it is freed when the returned
+    columns are closed or garbage collected.
+
+    Args:
+        layout (ColumnLayout): layout given by toSharedMemory
+
+    Returns:
+        HistoryColumns backed by the block
+    """
+    block = _SharedBlock(name=layout.name)
+    block.unlink()
+    arrays = {}
+    for (name, dtype, offset, length) in layout.columns:
+        # frombuffer holds an export of the mapping, so it can't be unmapped
+        # while the array is alive
+        array = np.frombuffer(block.buf, dtype=dtype, count=length, offset=offset)
+        array.flags.writeable = False
+        arrays[name] = array
+    return HistoryColumns(layout.elementClass, arrays, block)
+
+
+class ColumnElement(DeferredHistoryElement):
+    """HistoryElement that reads its fields from HistoryColumns.
+
+    Attributes:
+        product
+        action
+        timeStamp
+    """
+
+    _SOURCE = '_columns'
+
+    _KIND = 'column'
+
+    def __init__(self, columns: HistoryColumns, index: int) -> None:
+        """Create a ColumnElement.
+
+        Args:
+            columns (HistoryColumns): columns of the element
+            index (int): index of the element in the columns
+        """
+        self._columns = columns
+        self._index = index
+
+    def _decode(self, name: str) -> None:
+        try:
+            value = self._columns.value(name[1:], self._index)
+        except KeyError:
+            raise AttributeError(name) from None
+        setattr(self, name, value)
+
+
+class ColumnChromeElement(ColumnElement, ChromeElement):
+    """ChromeElement that reads its fields from HistoryColumns."""
+
+    _eagerClass = ChromeElement
+
+
+class ColumnSearchHistoryElement(ColumnElement, SearchHistoryElement):
+    """SearchHistoryElement that reads its fields from HistoryColumns."""
+
+    _eagerClass = SearchHistoryElement
+
+
+class ColumnWatchHistoryElement(ColumnElement, WatchHistoryElement):
+    """WatchHistoryElement that reads its fields from HistoryColumns."""
+
+    _eagerClass = WatchHistoryElement
+
+
+def getColumnClass(elementClass: Type[HistoryElement]) -> Type[ColumnElement]:
+    """Get the column version of a HistoryElement class.
+
+    Args:
+        elementClass (Type[HistoryElement]): an eager HistoryElement class
+
+    Returns:
+        the ColumnElement subclass with the same fields
+
+    Raises:
+        ValueError: if the class has no column version
+    """
+    return ColumnElement.versionOf(elementClass)
@@ -0,0 +1,143 @@
+"""Correlation of searches with the videos watched after them.
+
+Both histories are reduced to sorted columns of epoch seconds once. Because
+both columns are sorted, the watches in the window after each search are
+found with a merge of the two columns (done by np.searchsorted on the sorted
+searches), instead of comparing every search with every watch.
+
+Functions:
+    correlate
+    logCorrelation
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from . import manifest, timeConvert
+from .historyElements import SearchHistoryElement, WatchHistoryElement
+from .symbols import SymbolTable
+
+
+class Correlation:
+    """Counts of searches that were followed by a watch.
+
+    Attributes:
+        windowMinutes (int): how long after a search a watch is counted
+        searches (int): number of searches
+        followed (int): number of searches with at least one watch in the window
+        pairs (int): number of (search, watch) pairs within the window
+        firstLags (np.ndarray): number of searches whose first watch came after
+            each number of whole minutes (index 0 is less than a minute)
+        allLags (np.ndarray): number of (search, watch) pairs at each number of
+            whole minutes apart
+    """
+
+    def __init__(self, windowMinutes: int, searches: int, followed: int, pairs: int,
+                 firstLags: np.ndarray, allLags: np.ndarray,
+                 topPairs: Sequence[Tuple[str, str, int]]) -> None:
+        """Create a Correlation. See correlate."""
+        self.windowMinutes = windowMinutes
+        self.searches = searches
+        self.followed = followed
+        self.pairs = pairs
+        self.firstLags = firstLags
+        self.allLags = allLags
+        self._topPairs = topPairs
+
+    def topPairs(self, numPairs: int) -> Sequence[Tuple[str, str, int]]:
+        """Get the most common search and first watch pairs.
+
+        Args:
+            numPairs (int): number of pairs to return
+
+        Returns:
+            Sequence of (query, video name, count), most common first
+        """
+        return self._topPairs[:numPairs]
+
+
+def _sortedColumn(data: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the sorted epochs of data and the order that sorts data."""
+    epochs = timeConvert.getEpochs(data)
+    order = np.argsort(epochs, kind='stable')
+    return epochs[order], order
+
+
+def correlate(searches: Sequence[SearchHistoryElement],
+              watches: Sequence[WatchHistoryElement],
+              windowMinutes: int = 30,
+              numPairs: int = 100) -> Correlation:
+    """Find the watches that happened within a window after each search.
+
+    Args:
+        searches (Sequence[SearchHistoryElement]): searches, from Youtube or
+            Google, in any order
+        watches (Sequence[WatchHistoryElement]): watched videos, in any order
+        windowMinutes (int) (optional): minutes after a search that a watch
+            is counted as following it
+        numPairs (int) (optional): number of top pairs to keep
+
+    Returns:
+        Correlation of the searches and watches
+
+    Raises:
+        ValueError: if windowMinutes is less than 1
+    """
+    if windowMinutes < 1:
+        raise ValueError("windowMinutes must be at least 1")
+    window = windowMinutes * 60
+    searchTimes, searchOrder = _sortedColumn(searches)
+    watchTimes, watchOrder = _sortedColumn(watches)
+
+    # [first, last) are the watches in [search, search + window] of each search
+    first = np.searchsorted(watchTimes, searchTimes, side='left')
+    last = np.searchsorted(watchTimes, searchTimes + window, side='right')
+    counts = last - first
+    isFollowed = counts > 0
+
+    firstLags = np.bincount((watchTimes[first[isFollowed]] - searchTimes[isFollowed]) // 60,
+                            minlength=windowMinutes + 1)
+    # count the pairs of each minute of lag from the watch positions at each
+    # minute boundary, so the pairs themselves are never built
+    boundaries = [np.searchsorted(watchTimes, searchTimes + minute * 60, side='left')
+                  for minute in range(windowMinutes + 1)]
+    boundaries.append(last)
+    allLags = np.array([int((end - start).sum()) for start, end in zip(boundaries, boundaries[1:])])
+
+    queries = SymbolTable()
+    videos = SymbolTable()
+    pairCounts = Counter()
+    for searchIndex, watchIndex in zip(searchOrder[isFollowed], watchOrder[first[isFollowed]]):
+        query = searches[searchIndex].query.lower()
+        video = watches[watchIndex].videoName
+        pairCounts[queries.code(query), videos.code(video)] += 1
+    topPairs = [(queries[query], videos[video], count)
+                for (query, video), count in pairCounts.most_common(numPairs)]
+
+    return Correlation(windowMinutes, len(searchTimes), int(isFollowed.sum()), int(counts.sum()),
+                       firstLags, allLags, topPairs)
+
+
+def logCorrelation(correlation: Correlation, numPairs: int, dir: Path) -> None:
+    """Save a Correlation to Search_Watch_Correlation.txt.
+
+    Args:
+        correlation (Correlation): the correlation to save
+        numPairs (int): number of top pairs to save
+        dir (Path): directory to save the file to
+    """
+    with manifest.textOutput(dir.joinpath("Search_Watch_Correlation.txt")) as f:
+        share = correlation.followed / correlation.searches if correlation.searches else 0
+        f.write("Searches followed by a watch within {} minutes: {} of {} ({:.1%})\n".format(
+            correlation.windowMinutes, correlation.followed, correlation.searches, share))
+        f.write("Search and watch pairs within {} minutes: {}\n".format(
+            correlation.windowMinutes, correlation.pairs))
+        f.write("\nMinutes after search, searches with their first watch, all watches:\n")
+        for minute, (firstCount, allCount) in enumerate(zip(correlation.firstLags,
+                                                            correlation.allLags)):
+            f.write("{} , {} , {}\n".format(minute, firstCount, allCount))
+        f.write("\nTop Searches and the Video Watched Next:\n")
+        for query, video, count in correlation.topPairs(numPairs):
+            f.write("{} -> {} , Frequency:{}\n".format(query, video, count))
@@ -0,0 +1,289 @@
+"""Export of parsed history as columnar files, for pandas, DuckDB or Spark.
+
+A history file is exported while it is parsed: every ROW_GROUP_SIZE elements,
+the elements parsed so far are encoded as HistoryColumns and written out as one
+chunk, then dropped. Only one chunk of elements is held in memory, however
+long the history is.
+
+Each file is exported to any of these formats:
+    csv: one CSV file, with a header row and a row for each element
+    npz: one NumPy .npz file per chunk (name.00000.npz, name.00001.npz, ...)
+        of the arrays of HistoryColumns, which loadColumns reads back
+    parquet: one Parquet file, with a row group per chunk (needs pyarrow)
+    arrow: one Arrow IPC file, with a record batch per chunk (needs pyarrow)
+Every format has the columns epoch (see TimeStamp.epoch), time (the same time,
+with no time zone) and then the fields of the element class (e.g. product,
+action and query).
+
+Can be run as:
+    python -m GoogleArchive.export path/to/Takeout --format csv --format parquet
+
+Functions:
+    exportFile
+    exportHistory
+    loadColumns
+    availableFormats
+"""
+import argparse
+import csv
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Type
+
+import numpy as np
+
+from . import parse
+from .columns import HistoryColumns, FIELDS, encodeColumns
+from .filters import ElementFilter
+from .historyElements import HistoryElement
+from .symbols import SymbolTable
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+"""Elements written at a time, which is the size of each row group or chunk."""
+ROW_GROUP_SIZE = 100000
+
+_ELEMENT_CLASSES = {elementClass.__name__: elementClass for elementClass in FIELDS}
+
+
+def _fieldNames(elementClass: Type[HistoryElement]) -> List[str]:
+    """Get the names of the fields of an element class, in the order they are exported."""
+    symbolFields, stringFields = FIELDS[elementClass]
+    return list(symbolFields) + list(stringFields)
+
+
+class _CsvWriter:
+    """Writes chunks as rows of one CSV file."""
+
+    def __init__(self, path: Path, elementClass: Type[HistoryElement]) -> None:
+        self._fields = _fieldNames(elementClass)
+        self._file = path.open("w", newline="", encoding="UTF-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["epoch", "time"] + self._fields)
+
+    def write(self, columns: HistoryColumns) -> None:
+        times = columns.epochs.astype("datetime64[s]").astype(str).tolist()
+        self._writer.writerows(zip(columns.epochs.tolist(), times,
+                                   *[columns.column(field) for field in self._fields]))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _NpzWriter:
+    """Writes each chunk as its own .npz file of the arrays of HistoryColumns."""
+
+    def __init__(self, path: Path, elementClass: Type[HistoryElement]) -> None:
+        self._path = path
+        self._elementClass = elementClass
+        self._chunks = 0
+        # chunks of an earlier export would be read as part of this one
+        for oldChunk in path.parent.glob(path.stem + ".[0-9][0-9][0-9][0-9][0-9].npz"):
+            oldChunk.unlink()
+
+    def write(self, columns: HistoryColumns) -> None:
+        chunkPath = self._path.with_name("{}.{:05d}.npz".format(self._path.stem, self._chunks))
+        np.savez(chunkPath, elementClass=np.array(self._elementClass.__name__), **columns.arrays)
+        self._chunks += 1
+
+    def close(self) -> None:
+        pass
+
+
+class _ArrowWriter:
+    """Writes chunks as the row groups of a Parquet file, or the record batches of an Arrow file."""
+
+    def __init__(self, path: Path, elementClass: Type[HistoryElement], parquet: bool) -> None:
+        self._fields = _fieldNames(elementClass)
+        self._schema = pyarrow.schema([("epoch", pyarrow.int64()), ("time", pyarrow.timestamp("s"))] +
+                                      [(field, pyarrow.string()) for field in self._fields])
+        self._parquet = parquet
+        if parquet:
+            self._writer = pyarrow.parquet.ParquetWriter(str(path), self._schema)
+        else:
+            self._writer = pyarrow.ipc.new_file(str(path), self._schema)
+
+    def write(self, columns: HistoryColumns) -> None:
+        arrays = [pyarrow.array(columns.epochs, pyarrow.int64()),
+                  pyarrow.array(columns.epochs.astype("datetime64[s]"), pyarrow.timestamp("s"))]
+        arrays += [pyarrow.array(columns.column(field), pyarrow.string()) for field in self._fields]
+        table = pyarrow.Table.from_arrays(arrays, schema=self._schema)
+        if self._parquet:
+            self._writer.write_table(table, row_group_size=len(table))
+        else:
+            self._writer.write_table(table)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+_WRITERS = {"csv": (".csv", _CsvWriter),
+            "npz": (".npz", _NpzWriter),
+            "parquet": (".parquet", lambda path, elementClass: _ArrowWriter(path, elementClass, True)),
+            "arrow": (".arrow", lambda path, elementClass: _ArrowWriter(path, elementClass, False))}
+
+
+def availableFormats() -> Sequence[str]:
+    """Get the names of the formats that can be exported to."""
+    return tuple(name for name in _WRITERS if name in ("csv", "npz") or pyarrow is not None)
+
+
+def _checkFormats(formats: Optional[Sequence[str]]) -> Sequence[str]:
+    """Get the formats to export to, every available format by default."""
+    if formats is None:
+        return availableFormats()
+    for name in formats:
+        if name not in _WRITERS:
+            raise ValueError("Unknown export format {}, must be one of {}".format(name, list(_WRITERS)))
+        if name not in availableFormats():
+            raise ValueError("The {} export format needs pyarrow, which is not installed".format(name))
+    return formats
+
+
+def exportFile(takeoutPath: Path, filePath: str, elementClass: Type[HistoryElement],
+               outputPath: Path, formats: Optional[Sequence[str]] = None,
+               elementFilter: Optional[ElementFilter] = None, backend: Optional[str] = None,
+               rowGroupSize: int = ROW_GROUP_SIZE) -> int:
+    """Parse a history file and export its elements, one chunk at a time.
+
+    Elements are written as parse.iterElements parses them, and elements that
+    fail to parse are skipped, as in parsing.
+
+    Args:
+        takeoutPath (Path): the path to the Takeout folder
+        filePath (str): the path to the file from within Takeout
+        elementClass (Type[HistoryElement]): class of the elements of the file
+        outputPath (Path): path of the exported files, without a suffix (e.g.
+            dir/Google_Search_History). Each format adds its own suffix.
+        formats (Sequence[str]) (optional): formats to export to (see
+            availableFormats). Every available format by default.
+        elementFilter (ElementFilter) (optional): only export elements that
+            match the filter
+        backend (str) (optional): HTML backend to generate Tags with
+        rowGroupSize (int) (optional): elements of each chunk
+
+    Returns:
+        number of elements exported
+
+    Raises:
+        ValueError: if a format is unknown or needs pyarrow, which is not
+            installed, or if the file is not an html file
+        FileNotFoundError: if the given paths do not lead to a valid file
+    """
+    formats = _checkFormats(formats)
+    if rowGroupSize < 1:
+        raise ValueError("rowGroupSize must be at least 1")
+    source = parse.openFile(takeoutPath, filePath)
+    writers = [_WRITERS[name][1](outputPath.with_name(outputPath.name + _WRITERS[name][0]), elementClass)
+               for name in formats]
+    chunk = []
+    exported = 0
+    failures = 0
+    try:
+        for _, _, element, error in (parse.iterElements(source, elementClass, elementFilter, backend,
+                                                        SymbolTable())
+                                     if source is not None else ()):
+            if error is not None:
+                failures += 1
+            if element is None:
+                continue
+            chunk.append(element)
+            if len(chunk) == rowGroupSize:
+                exported += _writeChunk(writers, chunk, elementClass)
+                chunk = []
+        if chunk:
+            exported += _writeChunk(writers, chunk, elementClass)
+    finally:
+        for writer in writers:
+            writer.close()
+        if source is not None:
+            source.close()
+    if failures:
+        print("Skipped {} elements of {} that could not be parsed".format(failures, filePath))
+    return exported
+
+
+def _writeChunk(writers: Sequence, chunk: Sequence[HistoryElement],
+                elementClass: Type[HistoryElement]) -> int:
+    """Write one chunk of elements with every writer, and get its number of elements."""
+    columns = encodeColumns(chunk, elementClass)
+    for writer in writers:
+        writer.write(columns)
+    return len(columns)
+
+
+def exportHistory(takeoutPath: Path, dir: Path, formats: Optional[Sequence[str]] = None,
+                  elementFilter: Optional[ElementFilter] = None,
+                  rowGroupSize: int = ROW_GROUP_SIZE) -> Dict[str, int]:
+    """Export every history file and every product of My Activity.
+
+    Files are named after their history (e.g. Google_Search_History.csv, or
+    Maps_Activity.parquet for a product of My Activity).
+
+    Args:
+        takeoutPath (Path): path to your takeout folder
+        dir (Path): directory to export to. It is created if it doesn't exist.
+        formats (Sequence[str]) (optional): formats to export to (see
+            availableFormats). Every available format by default.
+        elementFilter (ElementFilter) (optional): only export elements that
+            match the filter
+        rowGroupSize (int) (optional): elements of each chunk
+
+    Returns:
+        number of elements exported of each file that exists, by name
+
+    Raises:
+        ValueError: if a format is unknown or needs pyarrow, which is not
+            installed
+    """
+    formats = _checkFormats(formats)
+    dir.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for name, filePath, elementClass, _ in parse.historyFiles(takeoutPath):
+        if not takeoutPath.joinpath(filePath).exists():
+            continue
+        start = time.time()
+        counts[name] = exportFile(takeoutPath, filePath, elementClass,
+                                  dir.joinpath(name.replace(" ", "_")), formats, elementFilter,
+                                  rowGroupSize=rowGroupSize)
+        print("Took {}s to export {} elements of {}".format(time.time() - start, counts[name], name))
+    return counts
+
+
+def loadColumns(path: Path) -> HistoryColumns:
+    """Load one .npz chunk of an export.
+
+    Args:
+        path (Path): path of the chunk (e.g. dir/Google_Search_History.00000.npz)
+
+    Returns:
+        HistoryColumns of the elements of the chunk
+    """
+    with np.load(path) as arrays:
+        elementClass = _ELEMENT_CLASSES[str(arrays["elementClass"])]
+        return HistoryColumns(elementClass, {name: arrays[name] for name in arrays.files
+                                             if name != "elementClass"})
+
+
+def main() -> None:
+    """Export the history of the Takeout given on the command line."""
+    parser = argparse.ArgumentParser(description="Export Google Takeout history as columnar files.")
+    parser.add_argument("takeoutPath", type=Path, help="path of the Takeout folder")
+    parser.add_argument("--output", type=Path, default=Path.cwd().joinpath('GoogleArchiveData', 'Export'),
+                        help="directory to export to (GoogleArchiveData/Export by default)")
+    parser.add_argument("--format", dest="formats", action="append", choices=list(_WRITERS),
+                        help="format to export to, may be given more than once "
+                             "(every available format by default)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE,
+                        help="elements written at a time")
+    args = parser.parse_args()
+    exportHistory(args.takeoutPath, args.output, args.formats, rowGroupSize=args.row_group_size)
+
+
+if __name__ == '__main__':
+    main()
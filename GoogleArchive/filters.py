@@ -0,0 +1,117 @@
+"""Filters that are applied while parsing, before elements are built.
+
+Classes:
+    ElementFilter
+"""
+import calendar
+import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .timeConvert import TimeStamp
+
+
+class ElementFilter:
+    """Selects elements by time range, product and action.
+
+    Parse functions check the filter against the raw fields of each element
+    (see HistoryElement.getRawFields), so elements that don't match never have
+    Tags or HistoryElements built for them.
+
+    Attributes:
+        since (datetime.datetime): earliest time to keep, or None for no limit
+        until (datetime.datetime): time to keep elements before, or None for no
+            limit
+        products (frozenset): products to keep, or None to keep every product
+        actions (frozenset): actions to keep, or None to keep every action
+    """
+
+    def __init__(self, since: Optional[datetime.datetime] = None,
+                 until: Optional[datetime.datetime] = None,
+                 products: Optional[Iterable[str]] = None,
+                 actions: Optional[Iterable[str]] = None) -> None:
+        """Create an ElementFilter.
+
+        Times are compared with the time written in the Google documents, with
+        the time zone ignored (see TimeStamp.epoch).
+
+        Args:
+            since (datetime.datetime) (optional): keep elements at or after this
+                time
+            until (datetime.datetime) (optional): keep elements before this time
+            products (Iterable[str]) (optional): keep only these products
+                (e.g. 'YouTube', 'Search')
+            actions (Iterable[str]) (optional): keep only these actions
+                (e.g. 'Searched for', 'Watched')
+
+        Raises:
+            ValueError: if since is not before until
+        """
+        if since is not None and until is not None and since >= until:
+            raise ValueError("since must be before until")
+        self.since = since
+        self.until = until
+        self.products = frozenset(products) if products is not None else None
+        self.actions = frozenset(actions) if actions is not None else None
+        self._sinceEpoch = calendar.timegm(since.timetuple()) if since is not None else None
+        self._untilEpoch = calendar.timegm(until.timetuple()) if until is not None else None
+
+    @property
+    def usesTime(self) -> bool:
+        """If the filter has a time range."""
+        return self.since is not None or self.until is not None
+
+    def matches(self, product: str, action: str, timeStamp: Optional[TimeStamp]) -> bool:
+        """Check if an element with the given fields should be kept.
+
+        Args:
+            product (str): product of the element
+            action (str): action of the element
+            timeStamp (TimeStamp): time of the element. May be None if the
+                filter has no time range.
+
+        Returns:
+            True if the element passes every part of the filter
+        """
+        if self.products is not None and product not in self.products:
+            return False
+        if self.actions is not None and action not in self.actions:
+            return False
+        if self.usesTime:
+            epoch = timeStamp.epoch
+            if self._sinceEpoch is not None and epoch < self._sinceEpoch:
+                return False
+            if self._untilEpoch is not None and epoch >= self._untilEpoch:
+                return False
+        return True
+
+    def matchesEpochs(self, epochs: np.ndarray) -> np.ndarray:
+        """Check which epochs are in the time range of the filter.
+
+        Args:
+            epochs (np.ndarray): epoch seconds (see TimeStamp.epoch)
+
+        Returns:
+            boolean array, True for each epoch in the time range
+        """
+        keep = np.ones(len(epochs), dtype=bool)
+        if self._sinceEpoch is not None:
+            keep &= epochs >= self._sinceEpoch
+        if self._untilEpoch is not None:
+            keep &= epochs < self._untilEpoch
+        return keep
+
+    def isBefore(self, timeStamp: TimeStamp) -> bool:
+        """Check if a time is before the start of the time range.
+
+        Google files list elements newest first, so once this is True no later
+        element of the file can match.
+
+        Args:
+            timeStamp (TimeStamp): time of an element
+
+        Returns:
+            True if the filter has a start time and timeStamp is before it
+        """
+        return self._sinceEpoch is not None and timeStamp.epoch < self._sinceEpoch
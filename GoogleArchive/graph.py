@@ -1,17 +1,36 @@
-"""Functions for graphing data."""
+"""Functions for graphing data.
+
+Plots are only drawn if their data or settings changed since they were last
+saved to the directory (see manifest).
+"""
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
 import datetime
+import functools
 import os
 from pathlib import Path
 from collections import Counter
-from typing import Sequence, Optional
+from typing import Callable, List, Mapping, Sequence, Optional, Tuple
+
+import numpy as np
 
-from . import timeConvert
+from . import manifest, timeConvert, timeSeries
 from .historyElements import HistoryElement
 
 
+def _plotPath(dir: Path, name: str) -> Path:
+    """Get the path a plot of the given name is saved to."""
+    return Path(str(dir) + '/' + name + '.png')
+
+
+def _savePlot(path: Path, key: str):
+    """Save the current plot and record the key of its inputs in the manifest."""
+    plt.savefig(str(path))
+    plt.close()
+    manifest.record(path, key)
+
+
 def freqHours(data: Sequence[int], title: str, dir: Path):
     """Save a histogram for the frequency of the given data binned by each hour.
 
@@ -20,45 +39,56 @@ def freqHours(data: Sequence[int], title: str, dir: Path):
         title: String for use in title. Title will be 'Frequency of [Title] (by hour)'
         dir: Directory to save output to.
     """
-    times = timeConvert.getHours(data)
-    plt.hist(times, bins = 24, range = (1,24))
+    counts = timeConvert.getWeekdayHourCounts(timeConvert.getEpochs(data))
+    _hourHistogram(counts.sum(axis=0), title, dir)
+
+
+def _hourHistogram(counts: np.ndarray, title: str, dir: Path):
+    """Save the histogram of freqHours from the count of each hour."""
+    path = _plotPath(dir, 'Frequency of ' + title + ' (by hour)')
+    key = manifest.outputKey('hourHistogram', np.asarray(counts), title)
+    if manifest.isCurrent(path, key):
+        return
+    # weighted by count, each hour falls in the same bin as its elements would
+    plt.hist(np.arange(24), bins = 24, range = (1,24), weights = counts)
     plt.title('Frequency of ' + title + ' (by hour)')
     plt.margins(x = 0, y = .15)
     plt.xlabel('Time of Day (24 Hour)')
     plt.ylabel('Frequency(Cumulative, All Time)')
     plt.tight_layout()
-    plt.savefig(str(dir) + '/Frequency of ' + title + ' (by hour)')
-    plt.close()
+    _savePlot(path, key)
 
 
 def freqPlot(data: Sequence[HistoryElement], interval: str, title: str, dir: Path):
     """Save a scatterplot of the given data.
     
     The value at each point specified by the sum of data for that given interval
-    (e.g. number of searches a month for each month)
+    (e.g. number of searches a month for each month). Intervals with no data are
+    plotted as 0.
 
     Args:
         data: A Sequence of HistoryElements
-        interval: String representing time to group data by. Can be day, month, or year (case insensitive)
+        interval: String representing time to group data by. Can be any interval
+            of timeSeries (e.g. 'day', 'month', 'year', '2 weeks' or 'quarter')
         title: String to be used in title of the output plot. Title will be '[Title] Usage Per [Interval]'
         dir: Directory to save output to.
     """
+    _intervalPlot(timeConvert.getEpochs(data), interval, title, dir)
+
+
+def _intervalPlot(epochs: np.ndarray, interval: str, title: str, dir: Path):
+    """Save the scatterplot of freqPlot for the epochs of the data."""
     interval = interval.lower()
-    dates = Counter()
-    month = {'Jan':1, 'Feb':2, 'Mar':3, 'Apr':4,'May':5,'Jun':6,'Jul':7,
-             'Aug':8,'Sep':9,'Oct':10,'Nov':11,'Dec':12}
-    for item in data:
-        if (item.timeStamp != None):
-            date = item['TimeStamp'].toDateTime(interval)
-        dates[date] += 1
-    xs = [date for date in dates]
-    ys = [dates[date] for date in dates]
-    plt.plot_date(xs, ys)
+    series = timeSeries.resample(epochs, interval)
+    path = _plotPath(dir, title + ' Usage Per ' + interval)
+    key = manifest.outputKey('intervalPlot', series.starts, series.values, title)
+    if manifest.isCurrent(path, key):
+        return
+    plt.plot(series.starts, series.values, 'o')
     plt.xticks(rotation = 60)
     plt.title(title + ' Usage Per ' + interval)
     plt.tight_layout()
-    plt.savefig(str(dir) + "/" + title + ' Usage Per ' + interval)
-    plt.close()
+    _savePlot(path, key)
 
 
 def freqDays(data: Sequence[HistoryElement], title: str, dir: Path):
@@ -70,29 +100,166 @@ def freqDays(data: Sequence[HistoryElement], title: str, dir: Path):
             (by day of week)'
         dir: Directory to save output to.
     """
-    weeks = timeConvert.getWeeks(data)
-    plt.hist(weeks, bins=7)
+    counts = timeConvert.getWeekdayHourCounts(timeConvert.getEpochs(data))
+    _dayHistogram(counts.sum(axis=1), title, dir)
+
+
+def _dayHistogram(counts: np.ndarray, title: str, dir: Path):
+    """Save the histogram of freqDays from the count of each day of the week."""
+    path = _plotPath(dir, 'Frequency of ' + title + ' (by day of the week)')
+    key = manifest.outputKey('dayHistogram', np.asarray(counts), title)
+    if manifest.isCurrent(path, key):
+        return
+    # the range is that of plt.hist for weekdays 0 to 6, so the bins are the same
+    plt.hist(np.arange(7), bins=7, range=(0, 6), weights=counts)
     plt.title('Frequency of ' + title + ' (by day of the week)')
     plt.xlabel('Day of the Week')
     plt.ylabel('Frequency(Cumulative, All Time)')
     plt.tight_layout()
-    plt.savefig(str(dir) + '/Frequency of ' + title + ' (by day of the week)')
-    plt.close()
+    _savePlot(path, key)
+
+
+def weekdayHourPlot(counts: np.ndarray, title: str, dir: Path):
+    """Save a heatmap of counts by day of the week and time of day.
+
+    Args:
+        counts: counts of shape (7, bins per day), as given by
+            timeConvert.getWeekdayHourCounts
+        title: String to be used in title. Title will be 'Frequency of [title]
+            (by day of the week and time of day)'
+        dir: Directory to save output to.
+    """
+    path = _plotPath(dir, 'Frequency of ' + title + ' (by day of the week and time of day)')
+    key = manifest.outputKey('weekdayHourPlot', np.asarray(counts), title)
+    if manifest.isCurrent(path, key):
+        return
+    plt.imshow(counts, aspect='auto', cmap='hot', interpolation='nearest',
+               extent=(0, 24, 6.5, -0.5))
+    plt.colorbar(label='Frequency(Cumulative, All Time)')
+    plt.yticks(range(7), ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+    plt.xticks(range(0, 25, 3))
+    plt.title('Frequency of ' + title + ' (by day of the week and time of day)')
+    plt.xlabel('Time of Day (24 Hour)')
+    plt.tight_layout()
+    _savePlot(path, key)
+
+
+def gridPlot(counts: np.ndarray, bounds: Tuple[float, float, float, float], title: str, dir: Path):
+    """Save a heatmap of counts on a grid of latitude and longitude.
+
+    Colors are on a log scale, so places with few visits are still visible.
+
+    Args:
+        counts: 2D counts, with rows from south to north and columns from west
+            to east (see location.gridHeatmap)
+        bounds: (west, east, south, north) of the grid in degrees
+        title: String to be used in title. Title will be '[title] Heatmap'
+        dir: Directory to save output to.
+    """
+    path = _plotPath(dir, title + ' Heatmap')
+    key = manifest.outputKey('gridPlot', np.asarray(counts), tuple(bounds), title)
+    if manifest.isCurrent(path, key):
+        return
+    plt.imshow(np.log1p(counts), origin='lower', extent=bounds, cmap='hot', aspect='auto')
+    plt.colorbar(label='log(1 + Frequency)')
+    plt.title(title + ' Heatmap')
+    plt.xlabel('Longitude')
+    plt.ylabel('Latitude')
+    plt.tight_layout()
+    _savePlot(path, key)
+
+
+def profilePlot(counts: Sequence[int], labels: Sequence[str], xlabel: str, title: str, dir: Path,
+                errors: Optional[Sequence[float]] = None):
+    """Save a bar chart of counts, such as counts for each hour of the day.
+
+    Args:
+        counts: count of each bar
+        labels: label of each bar
+        xlabel: label of the x axis (e.g. 'Time of Day (24 Hour)')
+        title: String to be used in title. Title will be 'Frequency of [title]'
+        dir: Directory to save output to.
+        errors: (optional) half width of the error bar of each count, such as
+            a confidence interval of an estimate
+    """
+    path = _plotPath(dir, 'Frequency of ' + title)
+    key = manifest.outputKey('profilePlot', np.asarray(counts), list(labels), xlabel, title,
+                             None if errors is None else np.asarray(errors))
+    if manifest.isCurrent(path, key):
+        return
+    plt.bar(range(len(counts)), counts, tick_label=labels, yerr=errors, capsize=2)
+    plt.title('Frequency of ' + title)
+    plt.xlabel(xlabel)
+    plt.ylabel('Frequency(Cumulative, All Time)')
+    plt.tight_layout()
+    _savePlot(path, key)
+
+
+def comparePlot(series: Mapping[str, timeSeries.TimeSeries], title: str, dir: Path):
+    """Save a line plot of several time series, such as the usage of several accounts.
+
+    Args:
+        series: series to plot by label, all of the same interval
+        title: String to be used in title. Title will be '[title] Per [interval]'
+        dir: Directory to save output to.
+    """
+    interval = next(iter(series.values())).interval if series else ''
+    path = _plotPath(dir, title + ' Per ' + interval)
+    key = manifest.outputKey('comparePlot', [(label, values.interval, values.starts, values.values)
+                                             for label, values in series.items()], title)
+    if manifest.isCurrent(path, key):
+        return
+    for label, values in series.items():
+        plt.plot(values.starts, values.values, label=label)
+    plt.legend()
+    plt.xticks(rotation = 60)
+    plt.title(title + ' Per ' + interval)
+    plt.tight_layout()
+    _savePlot(path, key)
+
+
+def estimatePlot(starts: Sequence[datetime.datetime], values: Sequence[float],
+                 errors: Sequence[float], interval: str, title: str, dir: Path):
+    """Save a scatterplot of estimated usage per interval, with error bars.
+
+    This is the estimated version of freqPlot, saved under the same name.
+
+    Args:
+        starts: start of each interval
+        values: estimated count of each interval
+        errors: half width of the confidence interval of each count
+        interval: name of the interval (e.g. 'month')
+        title: String to be used in title of the output plot. Title will be
+            '[Title] Usage Per [Interval]'
+        dir: Directory to save output to.
+    """
+    path = _plotPath(dir, title + ' Usage Per ' + interval)
+    key = manifest.outputKey('estimatePlot', list(starts), np.asarray(values), np.asarray(errors),
+                             title)
+    if manifest.isCurrent(path, key):
+        return
+    plt.errorbar(starts, values, yerr=errors, fmt='o', capsize=2)
+    plt.xticks(rotation = 60)
+    plt.title(title + ' Usage Per ' + interval + ' (estimated)')
+    plt.tight_layout()
+    _savePlot(path, key)
 
 
 def displayDataPlots(data: Sequence[HistoryElement], freq: Optional[str] = 'month',
-                     title: Optional[str] = None, dir: Optional[Path] = None) -> None:
+                     title: Optional[str] = None, dir: Optional[Path] = None,
+                     minutesPerBin: int = 60) -> None:
     """Save plots for the given data.
     
     Plots frequency by hour histogram, frequency by day of the week histogram,
-    and a scatterplot of the frequency of the data over time.
+    a heatmap of frequency by day of the week and time of day, and a
+    scatterplot of the frequency of the data over time.
     Prints information about data totals to console while running
 
     Args:
         data (Sequence[HistoryElements]) : elements to be plotted.
         freq (str) (optional): String, default 'month'. Frequency to be used for the
-            frequency plot of data over time. Can be 'day', 'month', or 'year'
-            (case insensitive)
+            frequency plot of data over time. Can be any interval of timeSeries,
+            such as 'day', 'month', 'year', 'week' or '3 days' (case insensitive)
         title (str) (optional): Title to be used in graphs. None by default.
             If this is None, it will label the graphs according to the product
             and action associated with it. If title is None, all HistoryElements
@@ -101,12 +268,30 @@ def displayDataPlots(data: Sequence[HistoryElement], freq: Optional[str] = 'mont
             (e.g. 'Frequency of [title] (by day of week)').
         dir (Path) (optional): Directory to save output to. Current working
             directory if None.
+        minutesPerBin (int) (optional): minutes of each bin of the day in the
+            heatmap, which must divide 60 (e.g. 15 or 1). 60 by default.
 
     Raises:
         ValueError: if title is None but all HistoryElemtents are not of the same
-            product and action, or if freq is not one of 'day', 'month', or 'year'
+            product and action, if freq is not a valid interval, or if
+            minutesPerBin doesn't divide 60
         TypeError: if any of the given arguments do not match the type hints
     """
+    for draw in dataPlots(data, freq, title, dir, minutesPerBin):
+        draw()
+
+
+def dataPlots(data: Sequence[HistoryElement], freq: Optional[str] = 'month',
+              title: Optional[str] = None, dir: Optional[Path] = None,
+              minutesPerBin: int = 60) -> List[Callable[[], None]]:
+    """Count the data for the plots of displayDataPlots, without drawing them.
+
+    Takes the same arguments, and raises the same errors, as displayDataPlots.
+
+    Returns:
+        a call that draws each plot, so that plots can be drawn later on
+        another thread (see pipeline)
+    """
     if dir is None:
         dir = Path.cwd()
     if not all(isinstance(x, HistoryElement) for x in data):
@@ -127,9 +312,48 @@ def displayDataPlots(data: Sequence[HistoryElement], freq: Optional[str] = 'mont
         title =  data[0]['Product'] + ' ' + data[0]['Action']
     if not isinstance(title, str):
         raise TypeError("title must be of type str")
-    if freq not in {'day', 'month', 'year'}:
-        raise ValueError("Freq must be either 'day', 'month', or 'year'")
-    print("Total " + title + ": " + str(len(data)))
-    freqHours(data, title = title + ' Data', dir = dir)
-    freqDays(data, title = title, dir = dir)
-    freqPlot(data, freq, title = title, dir=dir)
\ No newline at end of file
+    return epochPlots(timeConvert.getEpochs(data), freq, title, dir, minutesPerBin)
+
+
+def displayEpochPlots(epochs: np.ndarray, freq: str, title: str, dir: Path,
+                      minutesPerBin: int = 60) -> None:
+    """Save the plots of displayDataPlots for data given only by its times.
+
+    This is for data that isn't made of HistoryElements, such as mail.
+
+    Args:
+        epochs (np.ndarray): epoch of each element (see TimeStamp.epoch)
+        freq (str): frequency to be used for the frequency plot of data over
+            time. Can be any interval of timeSeries (e.g. 'month')
+        title (str): title to be used in graphs
+        dir (Path): directory to save output to
+        minutesPerBin (int) (optional): minutes of each bin of the day in the
+            heatmap, which must divide 60. 60 by default.
+
+    Raises:
+        ValueError: if freq is not a valid interval or minutesPerBin doesn't
+            divide 60
+    """
+    for draw in epochPlots(epochs, freq, title, dir, minutesPerBin):
+        draw()
+
+
+def epochPlots(epochs: np.ndarray, freq: str, title: str, dir: Path,
+               minutesPerBin: int = 60) -> List[Callable[[], None]]:
+    """Count the data for the plots of displayEpochPlots, without drawing them.
+
+    Takes the same arguments, and raises the same errors, as displayEpochPlots.
+
+    Returns:
+        a call that draws each plot
+    """
+    timeSeries.parseInterval(freq)
+    epochs = np.asarray(epochs, dtype=np.int64)
+    counts = timeConvert.getWeekdayHourCounts(epochs, minutesPerBin)
+    print("Total " + title + ": " + str(len(epochs)))
+    # the histograms by hour and by day are the sums of the heatmap
+    return [functools.partial(weekdayHourPlot, counts, title, dir),
+            functools.partial(_hourHistogram, counts.reshape(7, 24, -1).sum(axis=(0, 2)),
+                              title + ' Data', dir),
+            functools.partial(_dayHistogram, counts.sum(axis=1), title, dir),
+            functools.partial(_intervalPlot, epochs, freq, title, dir)]
\ No newline at end of file
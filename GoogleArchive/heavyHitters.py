@@ -0,0 +1,209 @@
+"""Most frequent items per period of time, in bounded memory.
+
+Each period (such as a month) keeps a Misra-Gries sketch of at most a fixed
+number of counters instead of a full Counter, so memory doesn't grow with the
+number of distinct items. Sketches are mergeable: merging the sketches of a
+range of periods gives a sketch of the whole range with the same guarantee.
+
+Every count of a sketch is a lower bound of the true count, and is at most
+the error of the sketch below it. The error is never more than the number of
+items counted divided by (capacity + 1).
+
+Classes:
+    FrequentItems
+    PeriodHeavyHitters
+
+Functions:
+    logPeriodTopSearches
+"""
+import datetime
+from pathlib import Path
+from typing import Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import manifest, timeSeries
+
+
+class FrequentItems:
+    """Misra-Gries sketch of the most frequent items of a stream.
+
+    Attributes:
+        capacity (int): most counters that are kept
+        total (int): number of items counted
+        error (int): most that any count may be below the true count
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Create an empty FrequentItems.
+
+        Args:
+            capacity (int): most counters to keep
+
+        Raises:
+            ValueError: if capacity is less than 1
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.error = 0
+        self._counts: Dict[Hashable, int] = {}
+
+    def add(self, item: Hashable, count: int = 1) -> None:
+        """Count an item.
+
+        Args:
+            item (Hashable): the item
+            count (int) (optional): number of times to count it
+        """
+        self.total += count
+        self._counts[item] = self._counts.get(item, 0) + count
+        if len(self._counts) > self.capacity:
+            self._prune()
+
+    def merge(self, other: "FrequentItems") -> "FrequentItems":
+        """Merge two sketches.
+
+        Args:
+            other (FrequentItems): sketch to merge with this one
+
+        Returns:
+            new FrequentItems of both streams, with the capacity of this one
+        """
+        merged = FrequentItems(self.capacity)
+        merged.total = self.total + other.total
+        merged.error = self.error + other.error
+        merged._counts = dict(self._counts)
+        for item, count in other._counts.items():
+            merged._counts[item] = merged._counts.get(item, 0) + count
+        if len(merged._counts) > merged.capacity:
+            merged._prune()
+        return merged
+
+    def _prune(self) -> None:
+        """Subtract the (capacity + 1)th largest count from every counter.
+
+        This leaves at most capacity counters, and adds to the error at most
+        the number of items counted divided by (capacity + 1).
+        """
+        counts = np.fromiter(self._counts.values(), dtype=np.int64, count=len(self._counts))
+        cut = int(np.partition(counts, -(self.capacity + 1))[-(self.capacity + 1)])
+        self.error += cut
+        self._counts = {item: count - cut for item, count in self._counts.items() if count > cut}
+
+    def top(self, numItems: int) -> Sequence[Tuple[Hashable, int]]:
+        """Get the items with the largest counts.
+
+        Args:
+            numItems (int): number of items to return
+
+        Returns:
+            Sequence of (item, count), largest count first
+        """
+        return sorted(self._counts.items(), key=lambda x: -x[1])[:numItems]
+
+    def __len__(self) -> int:
+        """Number of counters kept."""
+        return len(self._counts)
+
+
+class PeriodHeavyHitters:
+    """FrequentItems for each period of time.
+
+    Attributes:
+        interval (str): the period of each sketch (see timeSeries)
+        capacity (int): most counters kept for each period
+    """
+
+    def __init__(self, interval: str = 'month', capacity: int = 100) -> None:
+        """Create an empty PeriodHeavyHitters.
+
+        Args:
+            interval (str) (optional): period of each sketch, any interval of
+                timeSeries (e.g. 'month' or 'week')
+            capacity (int) (optional): most counters to keep for each period
+
+        Raises:
+            ValueError: if the interval is not valid or capacity is less than 1
+        """
+        timeSeries.parseInterval(interval)
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.interval = interval
+        self.capacity = capacity
+        self._sketches: Dict[int, FrequentItems] = {}
+
+    def addAll(self, epochs: np.ndarray, items: Sequence[Hashable]) -> None:
+        """Count items, each in the period of its time.
+
+        Args:
+            epochs (np.ndarray): epoch of each item (see TimeStamp.epoch)
+            items (Sequence[Hashable]): the items, elementwise to epochs
+        """
+        for bucket, item in zip(timeSeries.bucketIndices(epochs, self.interval).tolist(), items):
+            sketch = self._sketches.get(bucket)
+            if sketch is None:
+                sketch = self._sketches[bucket] = FrequentItems(self.capacity)
+            sketch.add(item)
+
+    def periods(self) -> Sequence[Tuple[datetime.datetime, FrequentItems]]:
+        """Get the sketch of every period that has items.
+
+        Returns:
+            Sequence of (start of the period, sketch), oldest first
+        """
+        return [(timeSeries.bucketStart(bucket, self.interval), self._sketches[bucket])
+                for bucket in sorted(self._sketches)]
+
+    def range(self, since: Optional[datetime.datetime] = None,
+              until: Optional[datetime.datetime] = None) -> FrequentItems:
+        """Merge the sketches of the periods in a range of time.
+
+        Periods are included if they start in the range, so the range should
+        start and end at the start of a period.
+
+        Args:
+            since (datetime.datetime) (optional): start of the range
+            until (datetime.datetime) (optional): end of the range
+
+        Returns:
+            FrequentItems of every period in the range
+
+        Raises:
+            ValueError: if since is not before until
+        """
+        if since is not None and until is not None and since >= until:
+            raise ValueError("since must be before until")
+        merged = FrequentItems(self.capacity)
+        for start, sketch in self.periods():
+            if (since is None or start >= since) and (until is None or start < until):
+                merged = merged.merge(sketch)
+        return merged
+
+
+def logPeriodTopSearches(heavyHitters: PeriodHeavyHitters, numTerms: int, dir: Path) -> None:
+    """Save the top searches of each year and each period to Searches_By_Period.txt.
+
+    Args:
+        heavyHitters (PeriodHeavyHitters): sketches of the searches
+        numTerms (int): number of searches to save for each period
+        dir (Path): directory to save the file to
+    """
+    periods = heavyHitters.periods()
+    with manifest.textOutput(dir.joinpath("Searches_By_Period.txt")) as f:
+        f.write("Counts are at most the error below the true count.\n")
+        if not periods:
+            return
+        for year in range(periods[0][0].year, periods[-1][0].year + 1):
+            sketch = heavyHitters.range(datetime.datetime(year, 1, 1), datetime.datetime(year + 1, 1, 1))
+            _writeTop(f, str(year), sketch, numTerms)
+        for start, sketch in periods:
+            _writeTop(f, "{} of {}".format(heavyHitters.interval, start.date()), sketch, numTerms)
+
+
+def _writeTop(f, title: str, sketch: FrequentItems, numTerms: int) -> None:
+    """Write the top items of a sketch under a title."""
+    f.write("\nTop Searches, {} ({} searches, error {}):\n".format(title, sketch.total, sketch.error))
+    for search, count in sketch.top(numTerms):
+        f.write("{} , Frequency:{}\n".format(search, count))
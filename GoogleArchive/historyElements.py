@@ -4,19 +4,32 @@ Every class is an implementation of HistoryElement.
 
 Classes:
     HistoryElement (abstract class)
+    ChromeElement
     SearchHistoryElement
     WatchHistoryElement
+    DeferredHistoryElement, the base of the lazy and column versions
+    LazyHistoryElement, and a lazy version of each class above
 """
+import re
 from abc import ABC
-from typing import Sequence, Tuple
+from html import unescape
+from typing import Iterator, Optional, Sequence, Tuple, Type
 
 from . import timeConvert
-from ._htmlParse import Tag
+from ._htmlParse import Tag, generateTags, iterElementSpans
+from .symbols import SymbolTable
 
 _ELEMENT_DIV_CLASS = 'outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp'
 _TITLE_CLASS = 'mdl-typography--title'
 _ACTION_CLASS =  'content-cell mdl-cell mdl-cell--6-col mdl-typography--body-1'
 
+"""Redirect prefix that Google puts in front of every Chrome URL."""
+_URL_PREFIX = 'https://www.google.com/url?q='
+
+"""Raw HTML of the title and the action cell, used to read fields without Tags."""
+_RAW_TITLE_REGEX = re.compile('class="{}">([^<]*)'.format(_TITLE_CLASS))
+_RAW_ACTION_REGEX = re.compile('class="{}">(.*?)</div>'.format(_ACTION_CLASS), re.DOTALL)
+
 """Holds information such as prodcut, location, etc."""
 # TODO - add parsing for informatin class
 _INFORMATION_CLASS = 'content-cell mdl-cell mdl-cell--12-col mdl-typography--caption'
@@ -33,11 +46,14 @@ class HistoryElement(ABC):
         timeStamp
     """
 
-    def __init__(self, tag: Tag):
+    def __init__(self, tag: Tag, symbols: Optional[SymbolTable] = None):
         """Create a HistoryElement.
         
         Args:
             tag (Tag): the head tag of the element.
+            symbols (SymbolTable) (optional): table that low cardinality fields
+                (product, action) are interned through. Elements of the same
+                parse should share one table so repeated values are stored once.
 
         Raises:
             ValueError: if the given tag is not of the proper class. The desired
@@ -46,9 +62,9 @@ class HistoryElement(ABC):
         if tag.className != _ELEMENT_DIV_CLASS:
             raise ValueError("element is not of the class {}".format(_ELEMENT_DIV_CLASS))
 
-        self._action = HistoryElement._getAction(tag)
+        self._action = HistoryElement._intern(HistoryElement._getAction(tag), symbols)
         self._timeStamp = HistoryElement._getTimeStamp(tag)
-        self._product = HistoryElement._getProduct(tag)
+        self._product = HistoryElement._intern(HistoryElement._getProduct(tag), symbols)
 
     @property
     def product(self) -> str:
@@ -86,6 +102,53 @@ class HistoryElement(ABC):
     def getElementDivClass(headTag: Tag) -> Sequence[Tag]:
         return headTag.getTagsByClass(_ELEMENT_DIV_CLASS)
 
+    @staticmethod
+    def getElementSpans(source: bytes, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """Get the byte spans of every element in the raw HTML of a file.
+
+        Args:
+            source (bytes): raw HTML, such as a mmap of the file
+            start (int) (optional): byte offset to start looking from
+
+        Returns:
+            Iterator of (start, end) offsets of each element
+        """
+        return iterElementSpans(source, _ELEMENT_DIV_CLASS, start)
+
+    @staticmethod
+    def getRawFields(html: str) -> Tuple[str, str, str]:
+        """Read the cheap fields of an element directly from its HTML.
+
+        This gives the same values as the product, action and timeStamp of
+        the element, without generating any Tags.
+
+        Args:
+            html (str): HTML of a single element
+
+        Returns:
+            Tuple of product, action and the string of the time stamp
+
+        Raises:
+            ValueError: if the HTML does not contain a title and an action
+        """
+        title = _RAW_TITLE_REGEX.search(html)
+        action = _RAW_ACTION_REGEX.search(html)
+        if title is None or action is None:
+            raise ValueError("The given HTML is missing the title or action of an element")
+        content = action.group(1)
+        # character references are converted, as every HTML backend does
+        product = unescape(title.group(1)).strip()
+        actionText = unescape(content.split("<", 1)[0]).strip().split("\xa0")[0]
+        timeString = unescape(content[content.rfind(">") + 1:]).strip()
+        return product, actionText, timeString
+
+    @staticmethod
+    def _intern(value: str, symbols: Optional[SymbolTable]) -> str:
+        """Intern value through symbols, or return it as is if symbols is None."""
+        if symbols is None:
+            return value
+        return symbols.intern(value)
+
     @staticmethod
     def _getProduct(tag: Tag) -> str:
         """Get a product name from a tag.
@@ -149,17 +212,18 @@ class ChromeElement(HistoryElement):
         url
     """
 
-    def __init__(self, tag: Tag):
+    def __init__(self, tag: Tag, symbols: Optional[SymbolTable] = None):
         """Create a ChromeElement.
 
         Args:
             tag (Tag): the head tag of the element.
+            symbols (SymbolTable) (optional): table to intern fields through
 
         Raises:
             ValueError: if the given tag is not of the porper class. The desired
                 class is the elementDivClass attribute of the class
         """
-        super().__init__(tag)
+        super().__init__(tag, symbols)
         self._name, self._url = ChromeElement._getNameAndURL(tag)
 
     @property
@@ -208,8 +272,8 @@ class ChromeElement(HistoryElement):
             name = linkTag.text
             url = Tag.getLink(linkTag)
             # google puts this prefix on every URL, but we don't want it
-            urlPrefix = 'https://www.google.com/url?q'
-            url = url[len(urlPrefix):]
+            if url.startswith(_URL_PREFIX):
+                url = url[len(_URL_PREFIX):]
         elif data.text == "Used Chrome":
             name, url = "", ""
         else:
@@ -227,17 +291,18 @@ class SearchHistoryElement(HistoryElement):
         query
     """
 
-    def __init__(self, tag: Tag):
+    def __init__(self, tag: Tag, symbols: Optional[SymbolTable] = None):
         """Create a SearchHistoryElement.
         
         Args:
             tag (Tag): the head tag of the element.
+            symbols (SymbolTable) (optional): table to intern fields through
 
         Raises:
             ValueError: if the given tag is not of the proper class. The desired
                 class is the elementDivClass attribute of the class.
         """
-        super().__init__(tag)
+        super().__init__(tag, symbols)
         self._query = SearchHistoryElement._getQuery(tag)
 
     @property
@@ -295,15 +360,28 @@ class WatchHistoryElement(HistoryElement):
         ChannelName
     """
 
-    def __init__(self, tag: Tag):
-        super().__init__(tag)
+    def __init__(self, tag: Tag, symbols: Optional[SymbolTable] = None):
+        """Create a WatchHistoryElement.
+
+        Channel names and links repeat for every video of a channel, so they
+        are interned along with the product and action.
+
+        Args:
+            tag (Tag): the head tag of the element.
+            symbols (SymbolTable) (optional): table to intern fields through
+
+        Raises:
+            ValueError: if the given tag is not of the proper class. The desired
+                class is the elementDivClass attribute of the class.
+        """
+        super().__init__(tag, symbols)
         tags = tag.getTagsByName('a')
         # TODO - check what info we can get if this tag lenght isn't 2
         if len(tags) == 2:
             self._videoLink = Tag.getLink(tags[0])
             self._videoName = tags[0].text
-            self._channelLink = tags[1].text
-            self._channelName = Tag.getLink(tags[1])
+            self._channelLink = HistoryElement._intern(Tag.getLink(tags[1]), symbols)
+            self._channelName = HistoryElement._intern(tags[1].text, symbols)
         else:
             self._videoLink = ""
             self._videoName = ""
@@ -346,4 +424,153 @@ class WatchHistoryElement(HistoryElement):
         if item.lower() in itemToValue:
             return itemToValue[item.lower()]
         else:
-            return super().__getitem__(item)
\ No newline at end of file
+            return super().__getitem__(item)
+
+class DeferredHistoryElement(HistoryElement):
+    """HistoryElement whose fields are decoded the first time they are used.
+
+    Decoded fields are cached on the element. Subclasses mix a deferred class
+    with an eager class, and keep all of its properties and __getitem__ keys.
+    Each deferred class sets the attribute of its source and decodes fields
+    in _decode.
+    """
+
+    """Eager class that the element stands in for."""
+    _eagerClass = HistoryElement
+
+    """Attribute of the source that fields are decoded from, set in __init__."""
+    _SOURCE = '_source'
+
+    """Name of the kind of deferred class, for errors."""
+    _KIND = 'deferred'
+
+    @classmethod
+    def versionOf(cls, elementClass: Type[HistoryElement]) -> Type['DeferredHistoryElement']:
+        """Get the version of an eager class among this class and its subclasses.
+
+        Args:
+            elementClass (Type[HistoryElement]): an eager HistoryElement class
+
+        Returns:
+            the subclass with the same fields
+
+        Raises:
+            ValueError: if the class has no version
+        """
+        for deferredClass in (cls, *cls.__subclasses__()):
+            if deferredClass._eagerClass is elementClass:
+                return deferredClass
+        raise ValueError("There is no {} version of {}".format(cls._KIND, elementClass.__name__))
+
+    def __getattr__(self, name: str):
+        """Decode a field that hasn't been accessed yet.
+
+        Only called when normal attribute lookup fails, so cached fields are
+        returned directly.
+        """
+        if not name.startswith("_") or name.startswith("__") or self._SOURCE not in self.__dict__:
+            raise AttributeError(name)
+        self._decode(name)
+        return object.__getattribute__(self, name)
+
+    def _decode(self, name: str) -> None:
+        """Decode a field and cache it on the element.
+
+        Raises:
+            AttributeError: if the element has no such field
+        """
+        raise AttributeError(name)
+
+
+class LazyHistoryElement(DeferredHistoryElement):
+    """HistoryElement that is decoded from its source on first access.
+
+    Only the byte span of the element in the source (usually a mmap of the
+    file) is stored when it is created. The product, action and timeStamp are
+    read together from the raw HTML the first time any of them is used. Every
+    other field is extracted the same way as the eager class, by generating the
+    Tags of the element, the first time one of them is used.
+
+    Attributes:
+        product
+        action
+        timeStamp
+        span
+    """
+
+    _KIND = 'lazy'
+
+    """Fields that can be read from the raw HTML without Tags."""
+    _RAW_FIELDS = frozenset(('_product', '_action', '_timeStamp'))
+
+    def __init__(self, source: bytes, start: int, end: int,
+                 symbols: Optional[SymbolTable] = None, backend: Optional[str] = None):
+        """Create a LazyHistoryElement.
+
+        Args:
+            source (bytes): raw HTML of the file, such as a mmap. It must stay
+                open for as long as the element is used.
+            start (int): byte offset of the start of the element in source
+            end (int): byte offset of the end of the element in source
+            symbols (SymbolTable) (optional): table to intern fields through
+            backend (str) (optional): HTML backend to generate Tags with
+        """
+        self._source = source
+        self._start = start
+        self._end = end
+        self._symbols = symbols
+        self._backend = backend
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        """Byte offsets (start, end) of the element in its source."""
+        return self._start, self._end
+
+    def _getHTML(self) -> str:
+        return self._source[self._start:self._end].decode("UTF-8")
+
+    def _decode(self, name: str) -> None:
+        if name in self._RAW_FIELDS:
+            product, action, timeString = HistoryElement.getRawFields(self._getHTML())
+            self._product = HistoryElement._intern(product, self._symbols)
+            self._action = HistoryElement._intern(action, self._symbols)
+            self._timeStamp = timeConvert.TimeStamp(timeString)
+        elif "_extracted" not in self.__dict__:
+            tag = generateTags(self._getHTML(), self._backend)
+            self._eagerClass.__init__(self, tag, self._symbols)
+            self._extracted = True
+        else:
+            raise AttributeError(name)
+
+
+class LazyChromeElement(LazyHistoryElement, ChromeElement):
+    """ChromeElement that is decoded from its source on first access."""
+
+    _eagerClass = ChromeElement
+
+
+class LazySearchHistoryElement(LazyHistoryElement, SearchHistoryElement):
+    """SearchHistoryElement that is decoded from its source on first access."""
+
+    _eagerClass = SearchHistoryElement
+
+
+class LazyWatchHistoryElement(LazyHistoryElement, WatchHistoryElement):
+    """WatchHistoryElement that is decoded from its source on first access."""
+
+    _eagerClass = WatchHistoryElement
+
+
+def getLazyClass(elementClass: Type[HistoryElement]) -> Type[LazyHistoryElement]:
+    """Get the lazy version of a HistoryElement class.
+
+    Args:
+        elementClass (Type[HistoryElement]): an eager HistoryElement class
+
+    Returns:
+        the LazyHistoryElement subclass with the same fields
+
+    Raises:
+        ValueError: if the class has no lazy version
+    """
+    return LazyHistoryElement.versionOf(elementClass)
@@ -0,0 +1,384 @@
+"""Streaming parser and aggregation of Location History.
+
+Records.json is often several GB, so it is never loaded whole. The array of
+locations is read in chunks, and each record is decoded on its own with
+json.JSONDecoder.raw_decode, so only the record being decoded is ever a Python
+object. Records are appended to compact arrays of int32 E7 latitudes and
+longitudes and int64 epoch seconds.
+
+Times in Location History are UTC, unlike the times of the HTML activity
+files, which are the local time they are written in.
+
+Classes:
+    LocationHistory
+
+Functions:
+    recordsHistory
+    semanticHistory
+    iterJSONArray
+    gridHeatmap
+    hourProfile
+    weekdayProfile
+    weekdayHourProfile
+    logLocationHistory
+"""
+import array
+import datetime
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TextIO, Tuple
+
+import numpy as np
+
+from . import manifest, timeConvert
+from .filters import ElementFilter
+
+"""Paths of Records.json within Takeout, newest name first."""
+_RECORDS_PATHS = ('Location History/Records.json', 'Location History/Location History.json')
+
+_SEMANTIC_PATH = 'Location History/Semantic Location History'
+
+"""Number of characters read from a file at a time."""
+_CHUNK_SIZE = 1 << 20
+
+"""Characters between the values of a JSON array."""
+_SEPARATORS = " \t\n\r,"
+
+"""Largest latitude and longitude, in degrees times 10^7. Some records of
+Takeout have values above these that overflowed a signed 32 bit int, and are
+wrapped back around."""
+_MAX_LATITUDE_E7 = 900000000
+_MAX_LONGITUDE_E7 = 1800000000
+
+
+class LocationHistory:
+    """Compact arrays of locations and their times.
+
+    Attributes:
+        latitudeE7 (np.ndarray): int32 latitude of each location, in degrees
+            times 10^7
+        longitudeE7 (np.ndarray): int32 longitude of each location, in degrees
+            times 10^7
+        epochs (np.ndarray): int64 UTC epoch seconds of each location
+    """
+
+    def __init__(self, latitudeE7: np.ndarray, longitudeE7: np.ndarray, epochs: np.ndarray) -> None:
+        """Create a LocationHistory.
+
+        Args:
+            latitudeE7 (np.ndarray): latitude of each location, in degrees
+                times 10^7
+            longitudeE7 (np.ndarray): longitude of each location, in degrees
+                times 10^7
+            epochs (np.ndarray): UTC epoch seconds of each location
+        """
+        self.latitudeE7 = np.asarray(latitudeE7, dtype=np.int32)
+        self.longitudeE7 = np.asarray(longitudeE7, dtype=np.int32)
+        self.epochs = np.asarray(epochs, dtype=np.int64)
+
+    def __len__(self) -> int:
+        """Number of locations."""
+        return len(self.epochs)
+
+
+class _Builder:
+    """Appends locations to typed arrays, without keeping Python objects."""
+
+    def __init__(self) -> None:
+        self._latitudes = array.array('i')
+        self._longitudes = array.array('i')
+        self._epochs = array.array('q')
+
+    def add(self, latitudeE7: Optional[int], longitudeE7: Optional[int],
+            epoch: Optional[int]) -> None:
+        """Add a location, unless any part of it is missing or out of range."""
+        if latitudeE7 is None or longitudeE7 is None or epoch is None:
+            return
+        if latitudeE7 > _MAX_LATITUDE_E7:
+            latitudeE7 -= 2 ** 32
+        if longitudeE7 > _MAX_LONGITUDE_E7:
+            longitudeE7 -= 2 ** 32
+        if abs(latitudeE7) > _MAX_LATITUDE_E7 or abs(longitudeE7) > _MAX_LONGITUDE_E7:
+            return
+        self._latitudes.append(latitudeE7)
+        self._longitudes.append(longitudeE7)
+        self._epochs.append(epoch)
+
+    def build(self, elementFilter: Optional[ElementFilter] = None) -> LocationHistory:
+        """Get the added locations that are in the time range of a filter."""
+        history = LocationHistory(np.frombuffer(self._latitudes, dtype=np.int32),
+                                  np.frombuffer(self._longitudes, dtype=np.int32),
+                                  np.frombuffer(self._epochs, dtype=np.int64))
+        if elementFilter is None or not elementFilter.usesTime:
+            return history
+        keep = elementFilter.matchesEpochs(history.epochs)
+        return LocationHistory(history.latitudeE7[keep], history.longitudeE7[keep],
+                               history.epochs[keep])
+
+
+def iterJSONArray(f: TextIO, key: str, chunkSize: int = _CHUNK_SIZE) -> Iterator:
+    """Decode the values of a JSON array one at a time.
+
+    Only the part of the file that holds the value being decoded is kept in
+    memory.
+
+    Args:
+        f (TextIO): the open JSON file
+        key (str): key of the array (e.g. 'locations'). The first array with
+            this key in the file is read.
+        chunkSize (int) (optional): number of characters to read at a time
+
+    Returns:
+        Iterator of each value of the array, in order
+
+    Raises:
+        ValueError: if the file has no such array, or ends inside of it
+    """
+    decoder = json.JSONDecoder()
+    marker = '"{}"'.format(key)
+    buffer = ""
+    position = -1
+    # find the start of the array, keeping enough of the buffer for a marker
+    # that is split between two chunks
+    while position < 0:
+        chunk = f.read(chunkSize)
+        if not chunk:
+            raise ValueError("The file has no array {}".format(key))
+        buffer = buffer[-len(marker) - 8:] + chunk
+        found = buffer.find(marker)
+        if found >= 0:
+            start = buffer.find("[", found)
+            while start < 0:
+                chunk = f.read(chunkSize)
+                if not chunk:
+                    raise ValueError("The file has no array {}".format(key))
+                buffer += chunk
+                start = buffer.find("[", found)
+            position = start + 1
+
+    atEnd = False
+    while True:
+        while position < len(buffer) and buffer[position] in _SEPARATORS:
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            if position >= len(buffer):
+                raise json.JSONDecodeError("Reached the end of the buffer", buffer, position)
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if atEnd:
+                raise ValueError("The file ended inside of the array {}".format(key))
+            chunk = f.read(chunkSize)
+            atEnd = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield value
+
+
+def _parseEpoch(milliseconds: Optional[str], isoTime: Optional[str]) -> Optional[int]:
+    """Get UTC epoch seconds from a time in milliseconds or an ISO 8601 string."""
+    if milliseconds is not None:
+        return int(milliseconds) // 1000
+    if isoTime is not None:
+        time = datetime.datetime.fromisoformat(isoTime.replace("Z", "+00:00"))
+        if time.tzinfo is None:
+            time = time.replace(tzinfo=datetime.timezone.utc)
+        return int(time.timestamp())
+    return None
+
+
+def _readRecords(path: Path, builder: _Builder) -> None:
+    """Add the locations of a Records.json file to a builder."""
+    with path.open("r", encoding="UTF-8") as f:
+        for record in iterJSONArray(f, "locations"):
+            builder.add(record.get("latitudeE7"), record.get("longitudeE7"),
+                        _parseEpoch(record.get("timestampMs"), record.get("timestamp")))
+
+
+def _readSemanticFile(path: Path, builder: _Builder) -> None:
+    """Add the place visits of a Semantic Location History file to a builder."""
+    with path.open("r", encoding="UTF-8") as f:
+        for timelineObject in iterJSONArray(f, "timelineObjects"):
+            visit = timelineObject.get("placeVisit")
+            if visit is None:
+                continue
+            location = visit.get("location", {})
+            duration = visit.get("duration", {})
+            builder.add(location.get("latitudeE7"), location.get("longitudeE7"),
+                        _parseEpoch(duration.get("startTimestampMs"),
+                                    duration.get("startTimestamp")))
+
+
+def recordsHistory(takeoutPath: Path,
+                   elementFilter: Optional[ElementFilter] = None) -> LocationHistory:
+    """Get every location of Records.json.
+
+    Args:
+        takeoutPath (Path): path to your takeout folder (e.g.
+            my/relative/path/to/Takeout/)
+        elementFilter (ElementFilter) (optional): only locations in the time
+            range of the filter are kept. Times are compared in UTC.
+
+    Returns:
+        LocationHistory of every record with a latitude, longitude and time
+
+    Raises:
+        FileNotFoundError: if Records.json cannot be found
+        ValueError: if the file has no array of locations
+    """
+    for recordsPath in _RECORDS_PATHS:
+        path = takeoutPath.joinpath(recordsPath)
+        if path.exists():
+            builder = _Builder()
+            _readRecords(path, builder)
+            return builder.build(elementFilter)
+    raise FileNotFoundError("The path {} does not exist".format(takeoutPath.joinpath(_RECORDS_PATHS[0])))
+
+
+def semanticHistory(takeoutPath: Path,
+                    elementFilter: Optional[ElementFilter] = None) -> LocationHistory:
+    """Get the place visits of Semantic Location History.
+
+    Each visit is located at its place and timed at its start.
+
+    Args:
+        takeoutPath (Path): path to your takeout folder
+        elementFilter (ElementFilter) (optional): only visits in the time
+            range of the filter are kept. Times are compared in UTC.
+
+    Returns:
+        LocationHistory of the visits, in order of the files (by year and month)
+
+    Raises:
+        FileNotFoundError: if the Semantic Location History folder cannot be
+            found
+    """
+    folder = takeoutPath.joinpath(_SEMANTIC_PATH)
+    if not folder.is_dir():
+        raise FileNotFoundError("The path {} does not exist".format(folder))
+    builder = _Builder()
+    for path in sorted(folder.glob("*/*.json")):
+        _readSemanticFile(path, builder)
+    return builder.build(elementFilter)
+
+
+def gridHeatmap(history: LocationHistory, cellDegrees: float = 0.01,
+                maxCells: int = 1000000) -> Tuple[np.ndarray, Tuple[float, float, float, float]]:
+    """Count the locations in each cell of a grid of latitude and longitude.
+
+    Args:
+        history (LocationHistory): the locations
+        cellDegrees (float) (optional): size of each cell, in degrees
+        maxCells (int) (optional): most cells in the grid. Cells are made
+            larger than cellDegrees if the locations span too many of them.
+
+    Returns:
+        Tuple of the 2D counts (rows from south to north, columns from west to
+        east), and the (west, east, south, north) bounds of the grid in degrees
+
+    Raises:
+        ValueError: if there are no locations
+    """
+    if len(history) == 0:
+        raise ValueError("There are no locations")
+    latitudes = history.latitudeE7.astype(np.int64)
+    longitudes = history.longitudeE7.astype(np.int64)
+    south, west = int(latitudes.min()), int(longitudes.min())
+    cell = max(int(cellDegrees * 1e7), 1)
+    rows = int(latitudes.max() - south) // cell + 1
+    columns = int(longitudes.max() - west) // cell + 1
+    if rows * columns > maxCells:
+        scale = int(np.ceil(np.sqrt(rows * columns / maxCells)))
+        cell *= scale
+        rows = int(latitudes.max() - south) // cell + 1
+        columns = int(longitudes.max() - west) // cell + 1
+    cells = ((latitudes - south) // cell) * columns + (longitudes - west) // cell
+    counts = np.bincount(cells, minlength=rows * columns).reshape(rows, columns)
+    bounds = (west / 1e7, (west + columns * cell) / 1e7, south / 1e7, (south + rows * cell) / 1e7)
+    return counts, bounds
+
+
+def hourProfile(history: LocationHistory, utcOffsetHours: int = 0) -> np.ndarray:
+    """Count the locations in each hour of the day.
+
+    Args:
+        history (LocationHistory): the locations
+        utcOffsetHours (int) (optional): hours to add to UTC for local time
+
+    Returns:
+        array of 24 counts, from midnight
+    """
+    return weekdayHourProfile(history, utcOffsetHours).sum(axis=0)
+
+
+def weekdayProfile(history: LocationHistory, utcOffsetHours: int = 0) -> np.ndarray:
+    """Count the locations in each day of the week.
+
+    Args:
+        history (LocationHistory): the locations
+        utcOffsetHours (int) (optional): hours to add to UTC for local time
+
+    Returns:
+        array of 7 counts, from Monday
+    """
+    return weekdayHourProfile(history, utcOffsetHours).sum(axis=1)
+
+
+def weekdayHourProfile(history: LocationHistory, utcOffsetHours: int = 0,
+                       minutesPerBin: int = 60) -> np.ndarray:
+    """Count the locations by day of the week and time of day.
+
+    Args:
+        history (LocationHistory): the locations
+        utcOffsetHours (int) (optional): hours to add to UTC for local time
+        minutesPerBin (int) (optional): minutes of each bin of the day, which
+            must divide 60
+
+    Returns:
+        array of shape (7, 1440 // minutesPerBin) (see
+        timeConvert.getWeekdayHourCounts)
+    """
+    return timeConvert.getWeekdayHourCounts(history.epochs + utcOffsetHours * 3600, minutesPerBin)
+
+
+def _topCells(counts: np.ndarray, bounds: Tuple[float, float, float, float],
+              numCells: int) -> Iterable[Tuple[float, float, int]]:
+    """Get the center and count of the cells with the most locations."""
+    west, east, south, north = bounds
+    rows, columns = counts.shape
+    cellHeight, cellWidth = (north - south) / rows, (east - west) / columns
+    flat = counts.ravel()
+    top = np.argsort(-flat, kind='stable')[:numCells]
+    for index in top[flat[top] > 0].tolist():
+        row, column = divmod(index, columns)
+        yield south + (row + 0.5) * cellHeight, west + (column + 0.5) * cellWidth, int(flat[index])
+
+
+def logLocationHistory(history: LocationHistory, title: str, numCells: int, dir: Path) -> None:
+    """Save a summary of locations to [title].txt.
+
+    Args:
+        history (LocationHistory): the locations
+        title (str): name of the locations, used as the name of the file
+            (e.g. 'Location_History')
+        numCells (int): number of the most visited grid cells to save
+        dir (Path): directory to save the file to
+    """
+    with manifest.textOutput(dir.joinpath(title + ".txt")) as f:
+        f.write("Locations: {}\n".format(len(history)))
+        if len(history) == 0:
+            return
+        epoch = datetime.datetime(1970, 1, 1)
+        first = epoch + datetime.timedelta(seconds=int(history.epochs.min()))
+        last = epoch + datetime.timedelta(seconds=int(history.epochs.max()))
+        f.write("From {} to {} (UTC)\n".format(first, last))
+        counts, bounds = gridHeatmap(history)
+        cellDegrees = (bounds[3] - bounds[2]) / counts.shape[0]
+        f.write("\nMost Visited Places (center of {:.4f} degree cells):\n".format(cellDegrees))
+        for latitude, longitude, count in _topCells(counts, bounds, numCells):
+            f.write("{:.4f}, {:.4f} , Frequency:{}\n".format(latitude, longitude, count))
+        f.write("\nHour (UTC), Frequency:\n")
+        for hour, count in enumerate(hourProfile(history).tolist()):
+            f.write("{} , {}\n".format(hour, count))
@@ -0,0 +1,279 @@
+"""Statistics of Gmail from the mbox file in Takeout.
+
+The mbox is often tens of GB, so it is memory mapped and never read whole.
+Messages start at lines that begin with "From ", and only the header block of
+each message (up to the first empty line) is parsed, for its Date, From, To and
+X-Gmail-Labels headers. The file is split into byte ranges that start at
+message boundaries, and the ranges are scanned in parallel processes.
+
+Dates are counted as the time written in the message, with the time zone
+ignored, the same as TimeStamp.epoch.
+
+Classes:
+    MailStats
+
+Functions:
+    mailStats
+    logMailStats
+"""
+import calendar
+import mmap
+import os
+import re
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from email.header import decode_header, make_header
+from email.utils import getaddresses, parseaddr, parsedate_tz
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import manifest
+from .filters import ElementFilter
+from .symbols import SymbolTable
+
+_MBOX_PATH = 'Mail/All mail Including Spam and Trash.mbox'
+
+_MESSAGE_START = b"\nFrom "
+
+_HEADER_END_REGEX = re.compile(rb"\r?\n\r?\n")
+
+"""Headers that are read from each message, in lower case."""
+_HEADERS = frozenset((b"date", b"from", b"to", b"x-gmail-labels"))
+
+"""Most bytes of a header block that are read, for messages without an end."""
+_MAX_HEADER_SIZE = 1 << 16
+
+
+class MailStats:
+    """Counts of messages by time, sender, recipient and label.
+
+    Attributes:
+        epochs (np.ndarray): epoch of each message with a valid Date, in order
+            of the file
+        senders (SymbolTable): address of every sender
+        senderCodes (np.ndarray): code of the sender of each message in
+            epochs, or -1 if it has none
+        recipients (Counter): number of messages to each address
+        labels (Counter): number of messages with each Gmail label
+        messages (int): number of messages, including those without a Date
+    """
+
+    def __init__(self) -> None:
+        """Create empty MailStats."""
+        self.epochs = np.zeros(0, dtype=np.int64)
+        self.senders = SymbolTable()
+        self.senderCodes = np.zeros(0, dtype=np.int32)
+        self.recipients = Counter()
+        self.labels = Counter()
+        self.messages = 0
+
+    def __len__(self) -> int:
+        """Number of messages with a valid Date."""
+        return len(self.epochs)
+
+    def merge(self, part: "_RangeStats") -> None:
+        """Add the counts of one byte range of the mbox."""
+        codes = np.array([self.senders.code(x) for x in part.senders] + [-1], dtype=np.int32)
+        self.epochs = np.concatenate((self.epochs, part.epochs))
+        self.senderCodes = np.concatenate((self.senderCodes, codes[part.senderCodes]))
+        self.recipients.update(part.recipients)
+        self.labels.update(part.labels)
+        self.messages += part.messages
+
+    def topSenders(self, numSenders: int) -> Sequence[Tuple[str, int]]:
+        """Get the senders of the most messages.
+
+        Args:
+            numSenders (int): number of senders to return
+
+        Returns:
+            Sequence of (address, number of messages), most messages first
+        """
+        counts = np.bincount(self.senderCodes[self.senderCodes >= 0], minlength=len(self.senders))
+        top = np.argsort(-counts, kind='stable')[:numSenders]
+        return [(self.senders[code], int(counts[code])) for code in top.tolist() if counts[code] > 0]
+
+
+class _RangeStats:
+    """Counts of the messages of one byte range, as sent back by a worker.
+
+    Sender codes index the senders list of the range, with -1 for no sender.
+    """
+
+    def __init__(self) -> None:
+        self.epochs: List[int] = []
+        self.senders: List[str] = []
+        self.senderCodes: List[int] = []
+        self.recipients = Counter()
+        self.labels = Counter()
+        self.messages = 0
+
+
+def _decode(value: bytes) -> str:
+    """Decode a raw header value, including RFC 2047 encoded words."""
+    text = value.decode("UTF-8", errors="replace")
+    try:
+        return str(make_header(decode_header(text)))
+    except (ValueError, LookupError):
+        return text
+
+
+def _parseHeaders(block: bytes) -> dict:
+    """Get the wanted headers of a header block, with folded lines joined."""
+    headers = {}
+    name = None
+    for line in block.splitlines()[1:]:  # the first line is the "From " line
+        if line[:1] in (b" ", b"\t"):
+            if name is not None:
+                headers[name] += b" " + line.strip()
+            continue
+        key, separator, value = line.partition(b":")
+        name = key.strip().lower() if separator else None
+        if name in _HEADERS and name not in headers:
+            headers[name] = value.strip()
+        else:
+            name = None
+    return headers
+
+
+def _parseDate(value: Optional[bytes]) -> Optional[int]:
+    """Get the epoch of a Date header, with the time zone ignored."""
+    if value is None:
+        return None
+    parsed = parsedate_tz(value.decode("ASCII", errors="replace"))
+    if parsed is None:
+        return None
+    try:
+        return calendar.timegm(parsed[:6])
+    except (ValueError, OverflowError):
+        return None
+
+
+def _messageStarts(source: mmap.mmap, start: int, end: int):
+    """Get the offset of every message that starts in [start, end)."""
+    if start == 0 and source[:5] == b"From ":
+        yield 0
+    position = source.find(_MESSAGE_START, max(start - 1, 0), end)
+    while position >= 0:
+        yield position + 1
+        position = source.find(_MESSAGE_START, position + 1, end)
+
+
+def _scanRange(path: Path, start: int, end: int,
+               elementFilter: Optional[ElementFilter]) -> _RangeStats:
+    """Count the messages that start in a byte range of an mbox. Runs in a worker."""
+    stats = _RangeStats()
+    senders = SymbolTable()
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        for messageStart in _messageStarts(source, start, end):
+            stats.messages += 1
+            limit = min(messageStart + _MAX_HEADER_SIZE, len(source))
+            headerEnd = _HEADER_END_REGEX.search(source, messageStart, limit)
+            headers = _parseHeaders(source[messageStart:headerEnd.start() if headerEnd else limit])
+            epoch = _parseDate(headers.get(b"date"))
+            if epoch is None:
+                continue
+            if elementFilter is not None and not elementFilter.matchesEpochs(np.array([epoch]))[0]:
+                stats.messages -= 1
+                continue
+            stats.epochs.append(epoch)
+            sender = parseaddr(_decode(headers.get(b"from", b"")))[1].lower()
+            stats.senderCodes.append(senders.code(sender) if sender else -1)
+            for _, recipient in getaddresses([_decode(headers.get(b"to", b""))]):
+                if recipient:
+                    stats.recipients[recipient.lower()] += 1
+            for label in _decode(headers.get(b"x-gmail-labels", b"")).split(","):
+                if label.strip():
+                    stats.labels[label.strip()] += 1
+    stats.senders = list(senders.symbols)
+    return stats
+
+
+def _splitRanges(source: mmap.mmap, numRanges: int) -> Sequence[Tuple[int, int]]:
+    """Split an mbox into byte ranges that each start at a message."""
+    size = len(source)
+    bounds = [0]
+    for i in range(1, numRanges):
+        position = source.find(_MESSAGE_START, max(size * i // numRanges, bounds[-1]))
+        if position < 0:
+            break
+        bounds.append(position + 1)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def _scanRanges(executor: Executor, path: Path, ranges: Sequence[Tuple[int, int]],
+                elementFilter: Optional[ElementFilter]) -> List[_RangeStats]:
+    """Scan byte ranges of an mbox on a pool of processes."""
+    starts, ends = zip(*ranges)
+    return list(executor.map(_scanRange, [path] * len(ranges), starts, ends,
+                             [elementFilter] * len(ranges)))
+
+
+def mailStats(takeoutPath: Path, elementFilter: Optional[ElementFilter] = None,
+              processes: Optional[int] = None, executor: Optional[Executor] = None) -> MailStats:
+    """Count the messages of the Gmail mbox.
+
+    Args:
+        takeoutPath (Path): path to your takeout folder (e.g.
+            my/relative/path/to/Takeout/)
+        elementFilter (ElementFilter) (optional): only the time range of the
+            filter is used, since messages have no product or action. Messages
+            without a valid Date are kept.
+        processes (int) (optional): number of processes to scan with. The
+            number of CPUs by default. If this is 1, the mbox is scanned in
+            this process.
+        executor (Executor) (optional): pool of processes to scan on, such
+            as one shared with other parsers, instead of a pool of its own.
+            processes should be its number of workers.
+
+    Returns:
+        MailStats of every message
+
+    Raises:
+        FileNotFoundError: if the mbox cannot be found
+    """
+    path = takeoutPath.joinpath(_MBOX_PATH)
+    if not path.exists():
+        raise FileNotFoundError("The path {} does not exist".format(path))
+    stats = MailStats()
+    if path.stat().st_size == 0:
+        return stats
+    processes = processes or os.cpu_count() or 1
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        # a few ranges per process, so that a slow range doesn't hold up the rest
+        ranges = _splitRanges(source, processes * 4)
+    if processes == 1 or len(ranges) == 1:
+        parts = [_scanRange(path, start, end, elementFilter) for start, end in ranges]
+    elif executor is not None:
+        parts = _scanRanges(executor, path, ranges, elementFilter)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            parts = _scanRanges(executor, path, ranges, elementFilter)
+    for part in parts:
+        stats.merge(part)
+    return stats
+
+
+def logMailStats(stats: MailStats, numItems: int, dir: Path) -> None:
+    """Save the top senders, recipients and labels to Mail_Stats.txt.
+
+    Args:
+        stats (MailStats): stats to save
+        numItems (int): number of senders, recipients and labels to save
+        dir (Path): directory to save the file to
+    """
+    with manifest.textOutput(dir.joinpath("Mail_Stats.txt")) as f:
+        f.write("Messages: {} ({} without a valid Date)\n".format(
+            stats.messages, stats.messages - len(stats)))
+        f.write("\nTop Senders:\n")
+        for sender, count in stats.topSenders(numItems):
+            f.write("{} , Frequency:{}\n".format(sender, count))
+        f.write("\nTop Recipients:\n")
+        for recipient, count in stats.recipients.most_common(numItems):
+            f.write("{} , Frequency:{}\n".format(recipient, count))
+        f.write("\nTop Labels:\n")
+        for label, count in stats.labels.most_common(numItems):
+            f.write("{} , Frequency:{}\n".format(label, count))
@@ -0,0 +1,135 @@
+"""Manifest of the output files of a directory, so unchanged files are skipped.
+
+Each output file (a plot or a text file) is given a key: a hash of the data it
+is made from, such as the counts of a histogram, and of the settings it is
+drawn with. The key of each file is kept in Manifest.json of its directory. If
+a file still exists and its key is the same as when it was saved, it is not
+drawn or written again.
+
+A text report is made from counts that are already reduced to what it lists,
+so the key of a report written with textOutput is the hash of its text.
+
+Deleting Manifest.json makes every file be saved again on the next run.
+
+Functions:
+    outputKey
+    isCurrent
+    record
+    textOutput
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, Mapping, TextIO
+
+import numpy as np
+
+MANIFEST_NAME = 'Manifest.json'
+
+"""Changed when the way outputs are drawn or written changes, so old files are saved again."""
+_VERSION = 1
+
+_lock = threading.Lock()
+
+
+def _update(digest, value) -> None:
+    """Add a value to a hash, with its type and shape so different values never run together."""
+    if isinstance(value, np.ndarray):
+        digest.update(repr(("array", value.dtype.str, value.shape)).encode("UTF-8"))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, Mapping):
+        digest.update(repr(("mapping", len(value))).encode("UTF-8"))
+        for name, item in value.items():
+            _update(digest, name)
+            _update(digest, item)
+    elif isinstance(value, (list, tuple)):
+        digest.update(repr(("sequence", len(value))).encode("UTF-8"))
+        for item in value:
+            _update(digest, item)
+    else:
+        digest.update(repr(value).encode("UTF-8"))
+
+
+def outputKey(*inputs) -> str:
+    """Get the key of an output from everything it is made from.
+
+    Args:
+        inputs: the kind of output (e.g. 'hourHistogram'), its data and its
+            settings. Arrays, mappings, sequences and values with a stable
+            repr (such as str, int or datetime) can be given.
+
+    Returns:
+        hex digest that changes if any of the inputs change
+    """
+    digest = hashlib.sha1()
+    _update(digest, (_VERSION,) + inputs)
+    return digest.hexdigest()
+
+
+def _load(dir: Path) -> Dict[str, str]:
+    """Get the key of each file of a directory's manifest, or none if it can't be read."""
+    try:
+        with dir.joinpath(MANIFEST_NAME).open("r", encoding="UTF-8") as f:
+            keys = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return keys if isinstance(keys, dict) else {}
+
+
+def isCurrent(path: Path, key: str) -> bool:
+    """Check if an output file exists and was saved from the same inputs.
+
+    Args:
+        path (Path): path of the output file
+        key (str): key of the inputs it would be saved from (see outputKey)
+
+    Returns:
+        True if the file doesn't need to be saved again
+    """
+    with _lock:
+        return _load(path.parent).get(path.name) == key and path.exists()
+
+
+def record(path: Path, key: str) -> None:
+    """Record the key of an output file once it is saved.
+
+    Args:
+        path (Path): path of the output file
+        key (str): key of the inputs it was saved from (see outputKey)
+    """
+    with _lock:
+        keys = _load(path.parent)
+        keys[path.name] = key
+        temporaryPath = path.parent.joinpath(MANIFEST_NAME + ".tmp")
+        with temporaryPath.open("w", encoding="UTF-8") as f:
+            json.dump(keys, f, indent=1, sort_keys=True)
+        # replaced in one step, so an interrupted save leaves the last manifest
+        os.replace(temporaryPath, path.parent.joinpath(MANIFEST_NAME))
+
+
+@contextlib.contextmanager
+def textOutput(path: Path) -> Iterator[TextIO]:
+    """Write a text report, unless the file already has the same text.
+
+    The report is written to a buffer, and only saved once it is complete if
+    it has changed since it was last saved.
+
+    Args:
+        path (Path): path of the report
+
+    Returns:
+        context manager of the text file to write the report to
+    """
+    buffer = io.StringIO()
+    yield buffer
+    text = buffer.getvalue()
+    key = outputKey('text', text)
+    if isCurrent(path, key):
+        return
+    with path.open("w", encoding="UTF-8") as f:
+        f.write(text)
+    record(path, key)
@@ -4,22 +4,73 @@ Functions:
     YoutubeSearchHistory
     YoutubeWatchHistory
     GoogleSearchHistory
+    chromeHistory
+    parseInParallel
+    findActivityFiles
+    historyFiles
+    parseActivity
+    iterElements
+    openFile
 """
+import mmap
 import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
 from pathlib import Path
-from typing import Sequence
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Type
 
 from . import timeConvert #Used to convert times found in files to TimeStamp objects
-from ._htmlParse import Tag, loadHTML
-from .historyElements import HistoryElement, SearchHistoryElement, WatchHistoryElement, ChromeElement 
+from ._htmlParse import generateTags
+from .checkpoint import ParseProgress
+from .columns import ColumnLayout, HistoryColumns, encodeColumns, fromSharedMemory, toSharedMemory
+from .filters import ElementFilter
+from .historyElements import HistoryElement, SearchHistoryElement, WatchHistoryElement, ChromeElement, getLazyClass
+from .symbols import SymbolTable
 
-def YoutubeSearchHistory(takeoutPath: Path) -> Sequence[SearchHistoryElement]:
+"""Name, path within Takeout and element class of each history file."""
+HISTORY_FILES = (("Youtube Search History", 'YouTube and Youtube Music/history/search-history.html',
+                  SearchHistoryElement),
+                 ("Youtube Watch History", 'YouTube and Youtube Music/history/watch-history.html',
+                  WatchHistoryElement),
+                 ("Google Search History", 'My Activity/Search/MyActivity.html',
+                  SearchHistoryElement),
+                 ("Google Chrome History", 'My Activity/Chrome/MyActivity.html',
+                  ChromeElement))
+
+"""Errors of a single malformed element, which skip the element instead of the file.
+
+Other errors, such as an AttributeError, are bugs and are raised."""
+_ELEMENT_ERRORS = (ValueError, IndexError, KeyError)
+
+"""Folder of My Activity within Takeout, with a folder for each product."""
+ACTIVITY_FOLDER = 'My Activity'
+
+"""Name of the activity file in the folder of each product."""
+ACTIVITY_FILE = 'MyActivity.html'
+
+def YoutubeSearchHistory(takeoutPath: Path,
+                         elementFilter: Optional[ElementFilter] = None,
+                         lazy: bool = False,
+                         backend: Optional[str] = None,
+                         checkpointDir: Optional[Path] = None
+                         ) -> Sequence[SearchHistoryElement]:
     """Get Youtube Search History.
 
     Args:
         takeoutPath (Path): path to your takeout folder (e.g.
             my/relative/path/to/Takeout/)
-    
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        lazy (bool) (optional): if True, return lazy elements that keep the
+            file memory mapped and only decode fields when they are used
+        backend (str) (optional): HTML backend to generate Tags with, one of
+            'regex', 'htmlparser' or 'lxml'. By default lxml is used if it is
+            installed, and regex otherwise.
+        checkpointDir (Path) (optional): directory to save checkpoints of the
+            parse to, and to resume from. Elements that fail to parse are
+            listed in a quarantine file there. Lazy parses are not
+            checkpointed.
+
     Returns:
         Sequence of SearchHistoryElements for each one of your searches in
         your YoutubeSearchHistory
@@ -31,15 +82,31 @@ def YoutubeSearchHistory(takeoutPath: Path) -> Sequence[SearchHistoryElement]:
             changed the name of a folder/file since I last updated this
     """
     youtubeSearchPath = 'YouTube and Youtube Music/history/search-history.html'
-    return _getSearchHistoryElements(takeoutPath, youtubeSearchPath)
+    return _getSearchHistoryElements(takeoutPath, youtubeSearchPath, elementFilter, lazy, backend, checkpointDir)
 
-def YoutubeWatchHistory(takeoutPath: Path) -> Sequence[WatchHistoryElement]:
+def YoutubeWatchHistory(takeoutPath: Path,
+                        elementFilter: Optional[ElementFilter] = None,
+                        lazy: bool = False,
+                        backend: Optional[str] = None,
+                        checkpointDir: Optional[Path] = None
+                        ) -> Sequence[WatchHistoryElement]:
     """Get Youtube Watch History.
 
     Args:
         takeoutPath (Path): path to your takeout folder (e.g.
             my/relative/path/to/Takeout/)
-    
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        lazy (bool) (optional): if True, return lazy elements that keep the
+            file memory mapped and only decode fields when they are used
+        backend (str) (optional): HTML backend to generate Tags with, one of
+            'regex', 'htmlparser' or 'lxml'. By default lxml is used if it is
+            installed, and regex otherwise.
+        checkpointDir (Path) (optional): directory to save checkpoints of the
+            parse to, and to resume from. Elements that fail to parse are
+            listed in a quarantine file there. Lazy parses are not
+            checkpointed.
+
     Returns:
         Sequence of WatchHistoryElements for each one of your videos in your
         Youtube Watch History
@@ -51,16 +118,31 @@ def YoutubeWatchHistory(takeoutPath: Path) -> Sequence[WatchHistoryElement]:
             changed the name of a folder/file since I last updated this
     """
     youtubeWatchPath = 'YouTube and Youtube Music/history/watch-history.html'
-    elements = _getElementsFromFile(takeoutPath, youtubeWatchPath)
-    return [WatchHistoryElement(x) for x in elements]
+    return _parseFile(takeoutPath, youtubeWatchPath, WatchHistoryElement, elementFilter, lazy, backend, checkpointDir)
 
-def GoogleSearchHistory(takeoutPath: Path) -> Sequence[SearchHistoryElement]:
+def GoogleSearchHistory(takeoutPath: Path,
+                        elementFilter: Optional[ElementFilter] = None,
+                        lazy: bool = False,
+                        backend: Optional[str] = None,
+                        checkpointDir: Optional[Path] = None
+                        ) -> Sequence[SearchHistoryElement]:
     """Get Google Search History.
 
     Args:
         takeoutPath (Path): path to your takeout folder (e.g.
             my/relative/path/to/Takeout/)
-    
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        lazy (bool) (optional): if True, return lazy elements that keep the
+            file memory mapped and only decode fields when they are used
+        backend (str) (optional): HTML backend to generate Tags with, one of
+            'regex', 'htmlparser' or 'lxml'. By default lxml is used if it is
+            installed, and regex otherwise.
+        checkpointDir (Path) (optional): directory to save checkpoints of the
+            parse to, and to resume from. Elements that fail to parse are
+            listed in a quarantine file there. Lazy parses are not
+            checkpointed.
+
     Returns:
         Sequence of SearchHistoryElement for each one of your searches in your
         Google Search History
@@ -72,15 +154,31 @@ def GoogleSearchHistory(takeoutPath: Path) -> Sequence[SearchHistoryElement]:
             of a folder/file since I last updated this
     """
     googleSearchPath = 'My Activity/Search/MyActivity.html'
-    return _getSearchHistoryElements(takeoutPath, googleSearchPath)
+    return _getSearchHistoryElements(takeoutPath, googleSearchPath, elementFilter, lazy, backend, checkpointDir)
 
-def chromeHistory(takeoutPath: Path) -> Sequence[HistoryElement]:
+def chromeHistory(takeoutPath: Path,
+                  elementFilter: Optional[ElementFilter] = None,
+                  lazy: bool = False,
+                  backend: Optional[str] = None,
+                  checkpointDir: Optional[Path] = None
+                  ) -> Sequence[HistoryElement]:
     """Get chrome history.
 
     Args:
         takeoutPath (Path): path to your takeout folder (e.g.
             my/relative/path/to/Takeout/)
-    
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        lazy (bool) (optional): if True, return lazy elements that keep the
+            file memory mapped and only decode fields when they are used
+        backend (str) (optional): HTML backend to generate Tags with, one of
+            'regex', 'htmlparser' or 'lxml'. By default lxml is used if it is
+            installed, and regex otherwise.
+        checkpointDir (Path) (optional): directory to save checkpoints of the
+            parse to, and to resume from. Elements that fail to parse are
+            listed in a quarantine file there. Lazy parses are not
+            checkpointed.
+
     Returns:
         Sequence of HistoryElement for each entry of Chrome activity.
 
@@ -91,10 +189,209 @@ def chromeHistory(takeoutPath: Path) -> Sequence[HistoryElement]:
             folder/file since I last updated this
     """
     chromePath = "My Activity/Chrome/MyActivity.html"
-    elements = _getElementsFromFile(takeoutPath, chromePath)
-    return [ChromeElement(x) for x in elements]
+    return _parseFile(takeoutPath, chromePath, ChromeElement, elementFilter, lazy, backend, checkpointDir)
+
+def parseInParallel(takeoutPath: Path,
+                    names: Optional[Sequence[str]] = None,
+                    elementFilter: Optional[ElementFilter] = None,
+                    backend: Optional[str] = None,
+                    processes: Optional[int] = None,
+                    checkpointDir: Optional[Path] = None
+                    ) -> Dict[str, HistoryColumns]:
+    """Parse history files in separate processes.
+
+    Each process encodes the elements of its file as columns in shared memory
+    (see columns.toSharedMemory), so only the small layout of the columns is
+    pickled back, and the columns are mapped here without being copied.
+
+    Args:
+        takeoutPath (Path): path to your takeout folder (e.g.
+            my/relative/path/to/Takeout/)
+        names (Sequence[str]) (optional): names of the files to parse, from
+            historyFiles. Every file of HISTORY_FILES is parsed by default.
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        backend (str) (optional): HTML backend to generate Tags with
+        processes (int) (optional): number of processes to use. The number
+            of CPUs by default. If this is 1, files are parsed in this process.
+        checkpointDir (Path) (optional): directory to save checkpoints of
+            each parse to, and to resume from
+
+    Returns:
+        HistoryColumns of each file that exists, by name
+
+    Raises:
+        ValueError: if a name is not in historyFiles
+    """
+    files = {name: (filePath, elementClass, size)
+             for name, filePath, elementClass, size in historyFiles(takeoutPath)}
+    if names is None:
+        names = [name for name, _, _ in HISTORY_FILES]
+    for name in names:
+        if name not in files:
+            raise ValueError("There is no history file named {}".format(name))
+    jobs = [(name, *files[name]) for name in names if takeoutPath.joinpath(files[name][0]).exists()]
+    return _parseFilesInParallel(takeoutPath, jobs, elementFilter, backend, processes,
+                                 checkpointDir)
+
+def findActivityFiles(takeoutPath: Path) -> Sequence[Tuple[str, str, int]]:
+    """Find the activity file of every product in My Activity.
+
+    Every product (e.g. Maps, Play Store, Assistant) has its own folder with a
+    file of the same markup, so each can be parsed into HistoryElements. The
+    folder is only listed once, and the files are not opened.
+
+    Args:
+        takeoutPath (Path): path to your takeout folder (e.g.
+            my/relative/path/to/Takeout/)
+
+    Returns:
+        Sequence of (product, path within Takeout, size in bytes) of each
+        file, largest first. Empty if there is no My Activity folder.
+    """
+    activityPath = takeoutPath.joinpath(ACTIVITY_FOLDER)
+    if not activityPath.is_dir():
+        return []
+    files = []
+    with os.scandir(activityPath) as entries:
+        for entry in entries:
+            filePath = os.path.join(entry.path, ACTIVITY_FILE)
+            if entry.is_dir() and os.path.isfile(filePath):
+                files.append((entry.name, "{}/{}/{}".format(ACTIVITY_FOLDER, entry.name, ACTIVITY_FILE),
+                              os.path.getsize(filePath)))
+    return sorted(files, key=lambda x: (-x[2], x[0]))
+
+def historyFiles(takeoutPath: Path) -> Sequence[Tuple[str, str, Type[HistoryElement], int]]:
+    """Get every history file of a Takeout folder.
+
+    These are the files of HISTORY_FILES, then the activity file of every
+    other product of My Activity (see findActivityFiles), named after its
+    product (e.g. 'Maps Activity').
+
+    Args:
+        takeoutPath (Path): path to your takeout folder (e.g.
+            my/relative/path/to/Takeout/)
+
+    Returns:
+        Sequence of (name, path within Takeout, element class, size in bytes)
+        of each file. The files of HISTORY_FILES are listed even if they
+        don't exist, with a size of 0.
+    """
+    files = []
+    for name, filePath, elementClass in HISTORY_FILES:
+        path = takeoutPath.joinpath(filePath)
+        files.append((name, filePath, elementClass, path.stat().st_size if path.is_file() else 0))
+    knownFiles = {filePath for _, filePath, _ in HISTORY_FILES}
+    files += [(product + " Activity", filePath, HistoryElement, size)
+              for product, filePath, size in findActivityFiles(takeoutPath)
+              if filePath not in knownFiles]
+    return files
+
+def parseActivity(takeoutPath: Path,
+                  elementFilter: Optional[ElementFilter] = None,
+                  files: Optional[Sequence[Tuple[str, str, int]]] = None,
+                  backend: Optional[str] = None,
+                  processes: Optional[int] = None,
+                  checkpointDir: Optional[Path] = None
+                  ) -> Dict[str, HistoryColumns]:
+    """Parse the activity file of every product into HistoryElements, in parallel.
+
+    Args:
+        takeoutPath (Path): path to your takeout folder (e.g.
+            my/relative/path/to/Takeout/)
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        files (Sequence[Tuple[str, str, int]]) (optional): the files to
+            parse, as given by findActivityFiles. Every file is found and
+            parsed by default.
+        backend (str) (optional): HTML backend to generate Tags with
+        processes (int) (optional): number of processes to use. The number
+            of CPUs by default. If this is 1, files are parsed in this process.
+        checkpointDir (Path) (optional): directory to save checkpoints of
+            each parse to, and to resume from
+
+    Returns:
+        HistoryColumns of HistoryElements of each product, by product name
+    """
+    if files is None:
+        files = findActivityFiles(takeoutPath)
+    jobs = [(product, filePath, HistoryElement, size) for product, filePath, size in files]
+    return _parseFilesInParallel(takeoutPath, jobs, elementFilter, backend, processes,
+                                 checkpointDir)
+
+def _parseFilesInParallel(takeoutPath: Path,
+                          jobs: Sequence[Tuple[str, str, Type[HistoryElement], int]],
+                          elementFilter: Optional[ElementFilter],
+                          backend: Optional[str],
+                          processes: Optional[int],
+                          checkpointDir: Optional[Path] = None
+                          ) -> Dict[str, HistoryColumns]:
+    """Parse files into HistoryColumns on a process pool.
+
+    The largest files are started first, so that the time of a run is not
+    set by a large file that only starts once the small ones are done. If
+    processes is 1, the files are parsed in this process instead.
 
-def _getSearchHistoryElements(takeoutPath: Path, filePath: str) -> Sequence[SearchHistoryElement]:
+    Args:
+        jobs: (name, path within Takeout, element class, size) of each file
+
+    Returns:
+        HistoryColumns of each file by name, in the order of jobs
+    """
+    if not jobs:
+        return {}
+    if processes == 1:
+        return {name: encodeColumns(_parseFile(takeoutPath, filePath, elementClass, elementFilter,
+                                               backend=backend, checkpointDir=checkpointDir),
+                                    elementClass)
+                for name, filePath, elementClass, _ in jobs}
+    if os.name == 'posix':
+        # the workers must share this process's tracker, or the tracker of a
+        # worker would unlink its shared memory when the worker exits
+        resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {name: executor.submit(_parseToSharedMemory, takeoutPath, filePath, elementClass,
+                                         elementFilter, backend, checkpointDir)
+                   for name, filePath, elementClass, _ in sorted(jobs, key=lambda x: -x[3])}
+        # every file is waited for, so none of their shared memory is left behind if one fails
+        layouts = {}
+        errors = []
+        for name, future in futures.items():
+            try:
+                layouts[name] = future.result()
+            except Exception as e:
+                errors.append(e)
+    columns = {}
+    try:
+        if errors:
+            raise errors[0]
+        for name, *_ in jobs:
+            columns[name] = fromSharedMemory(layouts.pop(name))
+    finally:
+        # mapping a block unlinks it, and closing it frees it
+        for layout in layouts.values():
+            fromSharedMemory(layout).close()
+    return columns
+
+def _parseToSharedMemory(takeoutPath: Path, filePath: str, elementClass: Type[HistoryElement],
+                         elementFilter: Optional[ElementFilter] = None,
+                         backend: Optional[str] = None,
+                         checkpointDir: Optional[Path] = None) -> ColumnLayout:
+    """Parse a file into columns in shared memory. Runs in a worker process.
+
+    Returns:
+        ColumnLayout of the shared columns, for fromSharedMemory
+    """
+    elements = _parseFile(takeoutPath, filePath, elementClass, elementFilter, backend=backend,
+                          checkpointDir=checkpointDir)
+    return toSharedMemory(encodeColumns(elements, elementClass))
+
+def _getSearchHistoryElements(takeoutPath: Path, filePath: str,
+                              elementFilter: Optional[ElementFilter] = None,
+                              lazy: bool = False,
+                              backend: Optional[str] = None,
+                              checkpointDir: Optional[Path] = None
+                              ) -> Sequence[SearchHistoryElement]:
     """Get Search History Elements.
 
     Intended to handle either Google or Youtube Search history.
@@ -104,6 +401,17 @@ def _getSearchHistoryElements(takeoutPath: Path, filePath: str) -> Sequence[Sear
             'Takeout' folder (e.g. 'some/path/to/Takeout/')
         filePath (str): the path to the file from within Takeout. Should end
             with the file, which must be a ".html" file
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        lazy (bool) (optional): if True, return lazy elements that keep the
+            file memory mapped and only decode fields when they are used
+        backend (str) (optional): HTML backend to generate Tags with, one of
+            'regex', 'htmlparser' or 'lxml'. By default lxml is used if it is
+            installed, and regex otherwise.
+        checkpointDir (Path) (optional): directory to save checkpoints of the
+            parse to, and to resume from. Elements that fail to parse are
+            listed in a quarantine file there. Lazy parses are not
+            checkpointed.
 
     Returns:
         Sequence of SearchHistoryElement for the given file containing the
@@ -113,40 +421,189 @@ def _getSearchHistoryElements(takeoutPath: Path, filePath: str) -> Sequence[Sear
         ValueError: if the file is not an html file
         FileNotFoundError: if the given paths do not lead to a valid file
     """
-    elements = _getElementsFromFile(takeoutPath, filePath)
-    return [SearchHistoryElement(x) for x in elements]
+    return _parseFile(takeoutPath, filePath, SearchHistoryElement, elementFilter, lazy, backend, checkpointDir)
 
-def _getElementsFromFile(takeoutPath: Path, filePath: str) -> Sequence[Tag]:
-    """Get the head element of an HTML document at the given path.
+def _parseFile(takeoutPath: Path, filePath: str, elementClass: Type[HistoryElement],
+               elementFilter: Optional[ElementFilter] = None,
+               lazy: bool = False,
+               backend: Optional[str] = None,
+               checkpointDir: Optional[Path] = None) -> Sequence[HistoryElement]:
+    """Parse every element of a file into the given HistoryElement class.
+
+    All elements of the parse share one SymbolTable. Lazy elements share the
+    memory map of the file, which is closed once none of them are left.
+
+    An element that fails to parse is skipped, and the rest of the file is
+    still parsed. The error of a lazy element is only raised when its fields
+    are used.
 
     Args:
-        takeoutPath (Path): the path to the Takeout folder. Should end with
-            'Takeout' folder (e.g. 'some/path/to/Takeout/')
-        filePath (str): the path to the file from within Takeout. Should end
-            with the file, which must be a ".html" file
-    
+        takeoutPath (Path): the path to the Takeout folder
+        filePath (str): the path to the file from within Takeout
+        elementClass (Type[HistoryElement]): class to create for each element
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        lazy (bool) (optional): if True, return lazy elements that keep the
+            file memory mapped and only decode fields when they are used
+        backend (str) (optional): HTML backend to generate Tags with, one of
+            'regex', 'htmlparser' or 'lxml'. By default lxml is used if it is
+            installed, and regex otherwise.
+        checkpointDir (Path) (optional): directory to save checkpoints of the
+            parse to, and to resume from. Elements that fail to parse are
+            listed in a quarantine file there. Lazy parses are not
+            checkpointed.
+
+    Returns:
+        Sequence of elementClass (or its lazy version) for each element of the
+        file
+
+    Raises:
+        ValueError: if the file is not an html file
+        FileNotFoundError: if the given paths do not lead to a valid file
+    """
+    symbols = SymbolTable()
+    if lazy:
+        source = openFile(takeoutPath, filePath)
+        if source is None:
+            return []
+        lazyClass = getLazyClass(elementClass)
+        return [lazyClass(source, start, end, symbols, backend)
+                for start, end in _iterElementSpans(source, elementFilter)]
+    source = openFile(takeoutPath, filePath)
+    if source is None:
+        return []
+    progress = ParseProgress.resume(takeoutPath, filePath, elementClass, elementFilter, backend,
+                                    checkpointDir)
+    with source:
+        for start, end, element, error in iterElements(source, elementClass, elementFilter, backend,
+                                                       symbols, progress.offset):
+            if element is not None:
+                progress.add(element, end)
+            elif error is not None:
+                progress.fail(start, end, error)
+            else:
+                progress.skip(end)
+    return progress.finish()
+
+def iterElements(source: bytes, elementClass: Type[HistoryElement],
+                 elementFilter: Optional[ElementFilter] = None,
+                 backend: Optional[str] = None,
+                 symbols: Optional[SymbolTable] = None,
+                 start: int = 0
+                 ) -> Iterator[Tuple[int, int, Optional[HistoryElement], Optional[Exception]]]:
+    """Parse the elements of a file one at a time.
+
+    Every element is yielded, including those that don't match the filter or
+    fail to parse, so the caller knows how far into the file the parse is.
+    When a filter is given, it is checked against the raw fields of each
+    element before any Tags are generated, and because elements are listed
+    newest first, iteration stops at the first element before the start of
+    the filter's time range.
+
+    Args:
+        source (bytes): raw HTML of the file, such as a mmap from openFile
+        elementClass (Type[HistoryElement]): class to create for each element
+        elementFilter (ElementFilter) (optional): only elements that match
+            the filter are parsed
+        backend (str) (optional): HTML backend to generate Tags with
+        symbols (SymbolTable) (optional): table to intern the fields of
+            every element through. Fields are not interned by default.
+        start (int) (optional): byte offset to start from, such as the start
+            of an element
+
+    Returns:
+        Iterator of (start, end, element, error) of each element. element is
+        None if the element doesn't match the filter or fails to parse, and
+        error is the error of an element that failed to parse.
+    """
+    for elementStart, end in HistoryElement.getElementSpans(source, start):
+        try:
+            html = source[elementStart:end].decode("UTF-8")
+            if elementFilter is not None:
+                matches, isBefore = _checkFilter(html, elementFilter)
+                if isBefore:
+                    return
+                if not matches:
+                    yield elementStart, end, None, None
+                    continue
+            element = elementClass(generateTags(html, backend), symbols)
+        except _ELEMENT_ERRORS as e:
+            yield elementStart, end, None, e
+            continue
+        yield elementStart, end, element, None
+
+def _iterElementSpans(source: mmap.mmap, elementFilter: Optional[ElementFilter] = None
+                      ) -> Iterator[Tuple[int, int]]:
+    """Get the byte spans of the elements of a file that match a filter.
+
+    Args:
+        source (mmap.mmap): the memory mapped file
+        elementFilter (ElementFilter) (optional): only spans of elements that
+            match the filter are returned
+
+    Returns:
+        Iterator of (start, end) byte offsets of each element
+    """
+    for start, end in HistoryElement.getElementSpans(source):
+        if elementFilter is not None:
+            matches, isBefore = _checkFilter(source[start:end].decode("UTF-8"), elementFilter)
+            if isBefore:
+                break
+            if not matches:
+                continue
+        yield start, end
+
+def _checkFilter(html: str, elementFilter: ElementFilter) -> Tuple[bool, bool]:
+    """Check the raw fields of an element against a filter.
+
+    Args:
+        html (str): HTML of a single element
+        elementFilter (ElementFilter): the filter
+
+    Returns:
+        Tuple of whether the element matches, and whether it is before the
+        start of the filter's time range, so no later element can match
+
+    Raises:
+        ValueError: if the raw fields of the element can't be read
+    """
+    product, action, timeString = HistoryElement.getRawFields(html)
+    timeStamp = timeConvert.TimeStamp(timeString) if elementFilter.usesTime else None
+    if timeStamp is not None and elementFilter.isBefore(timeStamp):
+        return False, True
+    return elementFilter.matches(product, action, timeStamp), False
+
+def openFile(takeoutPath: Path, filePath: str) -> Optional[mmap.mmap]:
+    """Memory map an HTML document in the Takeout folder.
+
+    Args:
+        takeoutPath (Path): the path to the Takeout folder
+        filePath (str): the path to the file from within Takeout
+
     Returns:
-        Sequence of tags which are all elements that can be turned into
-        HistoryElement objects
+        read only mmap of the file, or None if the file is empty
 
     Raises:
         ValueError: if the file is not an html file
         FileNotFoundError: if the given paths do not lead to a valid file
     """
-    head = _getHeadElementFromFile(takeoutPath, filePath)
-    return HistoryElement.getElementDivClass(head)
+    path = _getPathOfFile(takeoutPath, filePath)
+    if path.stat().st_size == 0:
+        return None
+    with path.open('rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-def _getHeadElementFromFile(takeoutPath: Path, filePath: str) -> Tag:
-    """Get the head element of an HTML document at the given path.
+def _getPathOfFile(takeoutPath: Path, filePath: str) -> Path:
+    """Get the path of an HTML document in the Takeout folder.
 
     Args:
         takeoutPath (Path): the path to the Takeout folder. Should end with
             'Takeout' folder
         filePath (str): the path to the file from within Takeout. Should end
             with the file, which must be a ".html" file
-    
+
     Returns:
-        head tag of the given html file
+        path of the given html file
 
     Raises:
         ValueError: if the file is not an html file
@@ -157,4 +614,4 @@ def _getHeadElementFromFile(takeoutPath: Path, filePath: str) -> Tag:
     path = takeoutPath.joinpath(filePath)
     if not os.path.exists(path):
         raise FileNotFoundError("The path {} does not exist".format(path))
-    return loadHTML(path)
\ No newline at end of file
+    return path
@@ -3,12 +3,16 @@ import os
 from pathlib import Path
 import json
 
+from . import manifest
+
 def photoURL(takeoutPath: Path, outputFolder: Path) -> None:
     """Output data on photo URLS, if present.
 
     Creates an output file, Photo_URLs.txt.
     File contains URLs of all photos on Google Photos.
     Prints out failure to find folder and number of file and folder errors encounters.
+    The photo files are only read if one of them changed since Photo_URLs.txt
+    was last written (see manifest).
 
     Args:
         takeoutPath (Path): path to takeout folder
@@ -22,17 +26,23 @@ def photoURL(takeoutPath: Path, outputFolder: Path) -> None:
         print("Photos folder does not exist. Skipping photos output.")
     if not photosFolder.is_dir():
         print("Photos folder is not a directory. Skipping photos output.")
-    with outputFolder.joinpath('Photo_URLs.txt').open('w') as f:
-        for folder in photosFolder.glob("*"):
-            for photoFile in folder.glob("*.json"):
-                if photoFile.name == "metadata.json":
-                    continue
-                with photoFile.open('r') as photoF:
-                    fileDict = json.loads(photoF.read())
-                    try:
-                        f.write(fileDict["url"] + '\n\n')
-                    except KeyError:
-                        urlErrors += 1
+    photoFiles = [photoFile for folder in photosFolder.glob("*") for photoFile in folder.glob("*.json")
+                  if photoFile.name != "metadata.json"]
+    outputPath = outputFolder.joinpath('Photo_URLs.txt')
+    # the size and time each file was modified stand in for its contents
+    key = manifest.outputKey('photoURL', [(str(x), x.stat().st_size, x.stat().st_mtime_ns)
+                                          for x in photoFiles])
+    if manifest.isCurrent(outputPath, key):
+        return
+    with outputPath.open('w') as f:
+        for photoFile in photoFiles:
+            with photoFile.open('r') as photoF:
+                fileDict = json.loads(photoF.read())
+                try:
+                    f.write(fileDict["url"] + '\n\n')
+                except KeyError:
+                    urlErrors += 1
 
+    manifest.record(outputPath, key)
     if(urlErrors > 0):
         print("Google Photos URLs not found: {}".format(urlErrors))
\ No newline at end of file
@@ -0,0 +1,388 @@
+"""Analysis of a Takeout as stages that run at the same time.
+
+analyzeData runs as three stages, joined by queues:
+    parse: files are parsed largest first, as many at a time as there are
+        processes. History and activity files are parsed on a pool of
+        processes into HistoryColumns in shared memory (see
+        parse.parseInParallel), or on a thread if there is one process.
+        Location History and mail are parsed on threads, since they have
+        parsers of their own. Each counts as one of the files parsed at a
+        time, and the ranges of the mbox are scanned on the pool of the files,
+        so no more processes run than were asked for.
+    aggregate: as soon as a source is parsed, its counts and text reports are
+        made on a thread, and the plots it needs are queued. The reports of
+        all search and watch history (such as sessions and common searches)
+        are made as soon as the four history files are parsed.
+    render: plots are drawn one at a time on the thread that runs the
+        pipeline, since pyplot is not thread safe.
+Google Photos is scanned on a thread alongside the stages.
+
+The queues hold at most QUEUE_SIZE items. A parser only starts its next file
+once the source it parsed is in the queue, so a slow stage holds up the ones
+before it instead of parsed sources piling up in memory.
+
+Several Takeouts can be analyzed at once by runPipelines, with their stages
+sharing one pool of processes.
+
+Functions:
+    runPipeline
+    runPipelines
+    locationPlots
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import resource_tracker
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Type, Union
+
+import numpy as np
+
+from . import chromeStats, correlation, graph, heavyHitters, location, mail, parse, photos
+from . import queryClusters, searchTerms, sessions, timeConvert, watchStats
+from .columns import HistoryColumns, fromSharedMemory
+from .filters import ElementFilter
+from .historyElements import HistoryElement, SearchHistoryElement
+from .searchIndex import SearchIndex
+
+"""Most parsed sources, and most sets of plots, that wait for the next stage."""
+QUEUE_SIZE = 2
+
+"""Name of the sessions of each history file in Sessions.txt."""
+_SESSION_NAMES = {"Youtube Search History": "Youtube Search",
+                  "Youtube Watch History": "Youtube Watch Data",
+                  "Google Search History": "Google Search",
+                  "Google Chrome History": "Google Chrome"}
+
+_LOCATION_SOURCES = (("Location History", location.recordsHistory, location._RECORDS_PATHS),
+                     ("Semantic Location History", location.semanticHistory, ()))
+
+
+def runPipeline(takeoutPath: Path, elementFilter: Optional[ElementFilter], checkpointDir: Path,
+                dir: Path, processes: Optional[int] = None,
+                memoryBudget: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """Parse, aggregate and save the output of a Takeout. See analyzeData.
+
+    Args:
+        takeoutPath (Path): path to the takeout folder
+        elementFilter (ElementFilter): only analyze elements that match the
+            filter, or None for every element
+        checkpointDir (Path): directory to save checkpoints of parsing to
+        dir (Path): directory to save output to
+        processes (int) (optional): most processes to parse with. The number
+            of CPUs by default. If this is 1, everything runs in this process.
+        memoryBudget (int) (optional): approximate bytes that counts of
+            searches may use before they are spilled to disk (see
+            searchTerms.commonSearchTerms)
+
+    Returns:
+        epochs of each kind of data that was analyzed, by name
+    """
+    result, = runPipelines([(takeoutPath, checkpointDir, dir)], elementFilter, processes, memoryBudget)
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def runPipelines(takeouts: Sequence[Tuple[Path, Path, Path]], elementFilter: Optional[ElementFilter],
+                 processes: Optional[int] = None,
+                 memoryBudget: Optional[int] = None) -> List[Union[Dict[str, np.ndarray], Exception]]:
+    """Parse, aggregate and save the output of several Takeouts at once. See analyzeBatch.
+
+    The pipelines of every Takeout share one pool of processes and the same
+    number of parse slots, so the files of all of them are parsed in
+    parallel, and no more processes run than were asked for. Files wait for
+    a slot in the order of takeouts, and then largest first within a Takeout.
+
+    Args:
+        takeouts (Sequence[Tuple[Path, Path, Path]]): path to each takeout
+            folder, the directory to save its checkpoints to and the
+            directory to save its output to
+        elementFilter (ElementFilter): only analyze elements that match the
+            filter, or None for every element
+        processes (int) (optional): most processes to parse with. The number
+            of CPUs by default. If this is 1, everything runs in this process.
+        memoryBudget (int) (optional): approximate bytes that counts of
+            searches may use before they are spilled to disk (see
+            searchTerms.commonSearchTerms)
+
+    Returns:
+        epochs of each kind of data that was analyzed by name, or the error
+        the pipeline raised, of each Takeout in order
+    """
+    run = _analyzeAll(takeouts, elementFilter, processes, memoryBudget)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run)
+    # an event loop already runs on this thread (such as in a notebook)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, run).result()
+
+
+class _Pools:
+    """The process pool, threads and parse slots that the pipelines of a run share.
+
+    Attributes:
+        workers (int): most files that are parsed at a time
+        parsers (Executor): pool that files are parsed on, of processes or,
+            if there is one worker, of one thread
+        threads (ThreadPoolExecutor): threads of the aggregate stage and of
+            the sources with parsers of their own
+        slots (asyncio.Semaphore): held while a file is parsed
+    """
+
+    def __init__(self, processes: Optional[int]) -> None:
+        """Create the pools. Must be called in the event loop that runs the pipelines."""
+        self.workers = processes or os.cpu_count() or 1
+        if self.workers == 1:
+            self.parsers = ThreadPoolExecutor(max_workers=1)
+        else:
+            if os.name == 'posix':
+                # the workers must share this process's tracker, or the tracker of
+                # a worker would unlink its shared memory when the worker exits
+                resource_tracker.ensure_running()
+            self.parsers = ProcessPoolExecutor(max_workers=self.workers)
+        self.threads = ThreadPoolExecutor()
+        self.slots = asyncio.Semaphore(self.workers)
+
+    def close(self) -> None:
+        """Wait for the pools to finish, and shut them down."""
+        self.parsers.shutdown()
+        self.threads.shutdown()
+
+
+async def _analyzeAll(takeouts: Sequence[Tuple[Path, Path, Path]], elementFilter: Optional[ElementFilter],
+                      processes: Optional[int],
+                      memoryBudget: Optional[int]) -> List[Union[Dict[str, np.ndarray], Exception]]:
+    """Run the pipeline of every Takeout on shared pools."""
+    pools = _Pools(processes)
+    try:
+        return await asyncio.gather(*[_analyze(takeoutPath, elementFilter, checkpointDir, dir, pools,
+                                               memoryBudget)
+                                      for takeoutPath, checkpointDir, dir in takeouts],
+                                    return_exceptions=True)
+    finally:
+        pools.close()
+
+
+async def _analyze(takeoutPath: Path, elementFilter: Optional[ElementFilter], checkpointDir: Path,
+                   dir: Path, pools: _Pools, memoryBudget: Optional[int]) -> Dict[str, np.ndarray]:
+    """Run the stages of the pipeline until every source is saved."""
+    loop = asyncio.get_running_loop()
+    workers, parsers, threads, slots = pools.workers, pools.parsers, pools.threads, pools.slots
+    files = parse.historyFiles(takeoutPath)
+    others = [(name, parseFunc, max([_fileSize(takeoutPath.joinpath(x)) for x in paths], default=0))
+              for name, parseFunc, paths in _LOCATION_SOURCES]
+    # sources are returned in this order, whatever order they finish in
+    names = [name for name, _, _ in parse.HISTORY_FILES] + [name for name, _, _ in _LOCATION_SOURCES] + \
+            [x[0] for x in files[len(parse.HISTORY_FILES):]] + ["Mail"]
+
+    parsed = asyncio.Queue(QUEUE_SIZE)
+    plots = asyncio.Queue(QUEUE_SIZE)
+    sources = {}
+    # the ranges of the mbox are scanned on the same pool as the files
+    others.append(("Mail", functools.partial(mail.mailStats, processes=workers,
+                                             executor=parsers if workers > 1 else None),
+                   _fileSize(takeoutPath.joinpath(mail._MBOX_PATH))))
+
+    async def parseFile(name: str, filePath: str, elementClass: Type[HistoryElement]) -> None:
+        async with slots:
+            parseFunc = functools.partial(_parseFile, filePath=filePath, elementClass=elementClass,
+                                          checkpointDir=checkpointDir, shared=workers > 1)
+            data = await _parse(parsers, parseFunc, takeoutPath, name, elementFilter, workers > 1)
+            await parsed.put((name, data))
+
+    async def parseOther(name: str, parseFunc: Callable) -> None:
+        async with slots:
+            data = await _parse(threads, parseFunc, takeoutPath, name, elementFilter)
+            await parsed.put((name, data))
+
+    async def produce() -> None:
+        jobs = [(size, parseFile(name, filePath, elementClass)) for name, filePath, elementClass, size in files]
+        jobs += [(size, parseOther(name, parseFunc)) for name, parseFunc, size in others]
+        # tasks wait for a slot in the order they start, so the largest files are parsed first
+        await asyncio.gather(*[job for _, job in sorted(jobs, key=lambda x: -x[0])])
+        await parsed.put(None)
+
+    async def aggregate() -> None:
+        history = {}
+        while True:
+            item = await parsed.get()
+            if item is None:
+                break
+            name, data = item
+            if len(data) > 0:
+                # a copy, since the epochs of columns in shared memory would keep the whole block mapped
+                sources[name] = np.array(await loop.run_in_executor(threads, timeConvert.getEpochs, data))
+            await plots.put(await loop.run_in_executor(threads, _sourceReports, name, data, dir))
+            if name in _SESSION_NAMES:
+                history[name] = data
+                if len(history) == len(_SESSION_NAMES):
+                    await plots.put(await loop.run_in_executor(threads, _historyReports, history, dir,
+                                                               memoryBudget))
+                    for historyData in history.values():
+                        _close(historyData)
+                    history = {}
+            else:
+                _close(data)
+            del item, data
+        await plots.put(None)
+
+    async def render() -> None:
+        while True:
+            draws = await plots.get()
+            if draws is None:
+                break
+            for draw in draws:
+                draw()
+                # lets parsed sources into the queue between plots
+                await asyncio.sleep(0)
+
+    photoScan = loop.run_in_executor(threads, photos.photoURL, takeoutPath, dir)
+    await asyncio.gather(produce(), aggregate(), render(), photoScan)
+    return {name: sources[name] for name in names if name in sources}
+
+
+def _close(data) -> None:
+    """Release the shared memory of parsed columns once their reports are made."""
+    if isinstance(data, HistoryColumns):
+        data.close()
+
+
+def _fileSize(path: Path) -> int:
+    """Get the size of a file, or 0 if it doesn't exist."""
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _parseFile(takeoutPath: Path, elementFilter: Optional[ElementFilter], filePath: str,
+               elementClass: Type[HistoryElement], checkpointDir: Path, shared: bool):
+    """Parse a file into elements, or into the ColumnLayout of columns in shared memory if shared.
+
+    Runs in a worker process if shared.
+    """
+    if shared:
+        return parse._parseToSharedMemory(takeoutPath, filePath, elementClass, elementFilter,
+                                          checkpointDir=checkpointDir)
+    return parse._parseFile(takeoutPath, filePath, elementClass, elementFilter,
+                            checkpointDir=checkpointDir)
+
+
+async def _parse(executor: Executor, parseFunc: Callable, takeoutPath: Path, dataName: str,
+                 elementFilter: Optional[ElementFilter], shared: bool = False):
+    """Run a parse function on an executor, with the messages of parseData.
+
+    Returns:
+        the parsed data, or an empty list if there was an error in parsing
+    """
+    start = time.time()
+    data = []
+    try:
+        data = await asyncio.get_running_loop().run_in_executor(executor, parseFunc, takeoutPath,
+                                                                elementFilter)
+        if shared:
+            data = fromSharedMemory(data)
+    except FileNotFoundError:
+        print("Could not find {} data".format(dataName))
+    except Exception as e:
+        print("An unexcepted exception, {}, occured in parsing {}".format(e, dataName))
+    finally:
+        print("Took {}s to parse {}".format(time.time() - start, dataName))
+    return data
+
+
+def _sourceReports(name: str, data, dir: Path) -> List[Callable[[], None]]:
+    """Save the text reports of one source, and count it for its plots.
+
+    Runs on a thread of the aggregate stage.
+
+    Returns:
+        a call that draws each plot of the source
+    """
+    if not data:
+        return []
+    if name == "Youtube Search History":
+        searchData = [x for x in data if x.action == "Searched for"]
+        return graph.dataPlots(searchData, dir=dir) if searchData else []
+    if name == "Youtube Watch History":
+        watchStats.logWatchStats(watchStats.watchStats(data), 25, dir)
+        return graph.dataPlots(data, title="Youtube Watch Data", dir=dir)
+    if name == "Google Search History":
+        return graph.dataPlots(data, title='Google Search', dir=dir)
+    if name == "Google Chrome History":
+        chromeStats.logDomainStats(chromeStats.domainStats(data), 25, dir)
+        return graph.dataPlots(data, title="Google Chrome", dir=dir)
+    if name in [x[0] for x in _LOCATION_SOURCES]:
+        return locationPlots(data, name, dir)
+    if name == "Mail":
+        mail.logMailStats(data, 25, dir)
+        return graph.epochPlots(data.epochs, 'month', 'Mail', dir)
+    # the activity of a product of My Activity
+    return graph.dataPlots(data, title=name, dir=dir)
+
+
+def _historyReports(history: Mapping[str, Sequence[HistoryElement]], dir: Path,
+                    memoryBudget: Optional[int] = None) -> List[Callable[[], None]]:
+    """Save the reports of all search and watch history, once every history file is parsed.
+
+    Runs on a thread of the aggregate stage.
+
+    Returns:
+        a call that draws each plot of all search and watch history
+    """
+    allData = []
+    allSessions = {}
+    for name, sessionName in _SESSION_NAMES.items():
+        if history[name]:
+            allData.extend(history[name])
+            allSessions[sessionName] = sessions.sessionize(history[name])
+    draws = []
+    if allData:
+        draws = graph.dataPlots(allData, title='All Search and Watch', dir=dir)
+        allSessions["All Search and Watch"] = sessions.sessionize(allData)
+        sessions.logSessions(allSessions, dir)
+
+    youtubeWatch = history["Youtube Watch History"]
+    searches = [x for x in list(history["Youtube Search History"]) + list(history["Google Search History"])
+                if isinstance(x, SearchHistoryElement) and x.action == "Searched for"]
+    if searches and youtubeWatch:
+        correlation.logCorrelation(correlation.correlate(searches, youtubeWatch), 25, dir)
+    searchTerms.commonSearchTerms(allData, 25, dir, memoryBudget)
+    SearchIndex.build({name: history[name] for name in _SESSION_NAMES}).save(dir.joinpath("Search_Index.npz"))
+    if searches:
+        clusters = queryClusters.clusterQueries(x.query for x in searches)
+        queryClusters.logSearchTopics(clusters, 25, dir)
+        searchesByPeriod = heavyHitters.PeriodHeavyHitters('month')
+        searchesByPeriod.addAll(timeConvert.getEpochs(searches), [x.query.lower() for x in searches])
+        heavyHitters.logPeriodTopSearches(searchesByPeriod, 10, dir)
+    return draws
+
+
+def locationPlots(locationData: location.LocationHistory, title: str,
+                  dir: Path) -> List[Callable[[], None]]:
+    """Save the summary of locations, and count them for their plots. See analyzeLocations.
+
+    Args:
+        locationData (LocationHistory): the locations
+        title (str): name of the locations (e.g. 'Location History')
+        dir (Path): directory to save output to
+
+    Returns:
+        a call that draws each plot of the locations
+    """
+    print("Total " + title + ": " + str(len(locationData)))
+    counts, bounds = location.gridHeatmap(locationData)
+    profile = location.weekdayHourProfile(locationData)
+    location.logLocationHistory(locationData, title.replace(" ", "_"), 25, dir)
+    return [functools.partial(graph.gridPlot, counts, bounds, title, dir),
+            functools.partial(graph.weekdayHourPlot, profile, title + ' (UTC)', dir),
+            functools.partial(graph.profilePlot, profile.sum(axis=0), [str(x) for x in range(24)],
+                              'Time of Day (24 Hour, UTC)', title + ' (by hour)', dir),
+            functools.partial(graph.profilePlot, profile.sum(axis=1),
+                              ['M', 'T', 'W', 'T', 'F', 'S', 'S'], 'Day of the Week (UTC)',
+                              title + ' (by day of the week)', dir)]
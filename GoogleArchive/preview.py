@@ -0,0 +1,245 @@
+"""Estimates of history from a random sample of elements, for a fast preview.
+
+Instead of parsing every element of a file, random byte offsets of the file
+are probed. Each probe finds the element whose slot (from its start to the
+start of the next element) contains the offset, using only a search of the
+nearby bytes. Long elements are more likely to be hit, so a probe is kept with
+probability (shortest slot seen / its slot), which makes every element equally
+likely to be kept. Only the kept elements are parsed.
+
+The number of elements of the file is estimated from every probe, as the
+length of the probed bytes times the mean of 1 / slot length. Counts (such as
+searches per hour) are the share of the sample in each bin times that
+estimate, with a confidence interval from both the sampling error of the share
+and the error of the estimated number of elements.
+
+Classes:
+    Sample
+
+Functions:
+    sampleFile
+    displayEstimatePlots
+    logEstimatedSearches
+"""
+import mmap
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Type
+
+import numpy as np
+
+from . import graph, manifest, parse, timeSeries
+from .filters import ElementFilter
+from .historyElements import HistoryElement, _ELEMENT_DIV_CLASS
+from .searchTerms import getSearch
+from .symbols import SymbolTable
+
+"""Z score of the confidence intervals (95%)."""
+Z_SCORE = 1.96
+
+_MARKER = '<div class="{}"'.format(_ELEMENT_DIV_CLASS).encode()
+
+"""Most probes for each element of the sample, for files of very uneven elements."""
+_MAX_PROBES_PER_ELEMENT = 50
+
+
+class Sample:
+    """Uniform random sample of the elements of a file.
+
+    Attributes:
+        elements (List[HistoryElement]): sampled elements that match the filter
+        draws (int): number of elements drawn, including those that didn't
+            match the filter or failed to parse
+        population (float): estimated number of elements in the file
+        populationError (float): standard error of population
+        exact (bool): True if every element was parsed, so estimates are exact
+    """
+
+    def __init__(self, elements: List[HistoryElement], draws: int, population: float,
+                 populationError: float, exact: bool) -> None:
+        """Create a Sample. See sampleFile."""
+        self.elements = elements
+        self.draws = draws
+        self.population = population
+        self.populationError = populationError
+        self.exact = exact
+
+    def __len__(self) -> int:
+        """Number of sampled elements that match the filter."""
+        return len(self.elements)
+
+    def estimateCounts(self, codes: np.ndarray, numBins: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Estimate the number of elements of the file in each bin.
+
+        Args:
+            codes (np.ndarray): bin of each element of the sample, or -1 for
+                elements in no bin
+            numBins (int): number of bins
+
+        Returns:
+            Tuple of the estimated count of each bin and its standard error
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        counts = np.bincount(codes[codes >= 0], minlength=numBins).astype(np.float64)
+        if self.exact or self.draws == 0:
+            return counts, np.zeros(numBins)
+        share = counts / self.draws
+        variance = (self.population ** 2 * share * (1 - share) / self.draws
+                    + share ** 2 * self.populationError ** 2)
+        return self.population * share, np.sqrt(variance)
+
+    @property
+    def total(self) -> Tuple[float, float]:
+        """Estimated number of elements that match the filter, and its standard error."""
+        estimates, errors = self.estimateCounts(np.zeros(len(self.elements)), 1)
+        return float(estimates[0]), float(errors[0])
+
+
+def sampleFile(takeoutPath: Path, filePath: str, elementClass: Type[HistoryElement],
+               sampleSize: int = 2000, elementFilter: Optional[ElementFilter] = None,
+               backend: Optional[str] = None, seed: Optional[int] = None) -> Sample:
+    """Parse a uniform random sample of the elements of a file.
+
+    Files with no more elements than the sample size are parsed in full.
+
+    Args:
+        takeoutPath (Path): the path to the Takeout folder
+        filePath (str): the path to the file from within Takeout
+        elementClass (Type[HistoryElement]): class to create for each element
+        sampleSize (int) (optional): number of elements to draw
+        elementFilter (ElementFilter) (optional): only sampled elements that
+            match the filter are kept, and estimates are of matching elements
+        backend (str) (optional): HTML backend to generate Tags with
+        seed (int) (optional): seed of the random probes
+
+    Returns:
+        Sample of the file
+
+    Raises:
+        ValueError: if the file is not an html file
+        FileNotFoundError: if the given paths do not lead to a valid file
+    """
+    source = parse.openFile(takeoutPath, filePath)
+    if source is None:
+        return Sample([], 0, 0.0, 0.0, True)
+    with source:
+        first = source.find(_MARKER)
+        if first < 0:
+            return Sample([], 0, 0.0, 0.0, True)
+        _, end = next(HistoryElement.getElementSpans(source, source.rfind(_MARKER)))
+        rng = np.random.default_rng(seed)
+        spans: List[Tuple[int, int]] = []
+        # the uniform draw of each probe is kept, so a probe is only dropped
+        # later if the shortest slot shrinks
+        draws = np.zeros(0)
+        while True:
+            spans.extend(_probe(source, rng.integers(first, end, size=sampleSize), first, end))
+            draws = np.concatenate((draws, rng.random(sampleSize)))
+            slots = np.array([x[1] - x[0] for x in spans], dtype=np.float64)
+            # every probe is an unbiased estimate of the number of elements
+            estimates = (end - first) / slots
+            population = float(estimates.mean())
+            if population <= sampleSize:
+                elements = [x for _, _, x, _ in parse.iterElements(source, elementClass, elementFilter,
+                                                                    backend, SymbolTable())
+                            if x is not None]
+                return Sample(elements, len(elements), len(elements), 0.0, True)
+            accepted = np.flatnonzero(draws < slots.min() / slots)
+            if len(accepted) >= sampleSize or len(spans) >= sampleSize * _MAX_PROBES_PER_ELEMENT:
+                break
+        populationError = float(estimates.std(ddof=1) / np.sqrt(len(estimates)))
+        symbols = SymbolTable()
+        elements = []
+        accepted = accepted[:sampleSize]
+        for index in accepted.tolist():
+            element = _parseElement(source, spans[index][0], elementClass, symbols, elementFilter,
+                                    backend)
+            if element is not None:
+                elements.append(element)
+    return Sample(elements, len(accepted), population, populationError, False)
+
+
+def _probe(source: mmap.mmap, offsets: np.ndarray, first: int, end: int
+           ) -> List[Tuple[int, int]]:
+    """Get the slot (start of an element to start of the next) that contains each offset."""
+    slots = []
+    for offset in offsets.tolist():
+        start = source.rfind(_MARKER, first, offset + len(_MARKER))
+        nextStart = source.find(_MARKER, offset + 1, end)
+        slots.append((start, nextStart if nextStart >= 0 else end))
+    return slots
+
+
+def _parseElement(source: mmap.mmap, start: int, elementClass: Type[HistoryElement],
+                  symbols: SymbolTable, elementFilter: Optional[ElementFilter],
+                  backend: Optional[str]) -> Optional[HistoryElement]:
+    """Parse the element that starts at an offset, or None if it fails or doesn't match."""
+    for _, _, element, _ in parse.iterElements(source, elementClass, elementFilter, backend, symbols,
+                                               start):
+        return element
+    return None
+
+
+def displayEstimatePlots(sample: Sample, freq: str, title: str, dir: Path) -> None:
+    """Save the plots of graph.displayDataPlots, estimated from a sample.
+
+    Each plot shows the estimated counts with their 95% confidence intervals.
+
+    Args:
+        sample (Sample): the sample
+        freq (str): frequency of the plot of the data over time. Can be any
+            interval of timeSeries (e.g. 'month')
+        title (str): title to be used in graphs
+        dir (Path): directory to save output to
+
+    Raises:
+        ValueError: if freq is not a valid interval
+    """
+    timeSeries.parseInterval(freq)
+    total, error = sample.total
+    print("Estimated total {}: {:.0f} (+/- {:.0f})".format(title, total, Z_SCORE * error))
+    if len(sample) == 0:
+        return
+    epochs = np.fromiter((x.timeStamp.epoch for x in sample.elements), dtype=np.int64,
+                         count=len(sample))
+    estimates, errors = sample.estimateCounts(epochs // 3600 % 24, 24)
+    graph.profilePlot(estimates, [str(x) for x in range(24)], 'Time of Day (24 Hour)',
+                      title + ' Data (by hour)', dir, Z_SCORE * errors)
+    estimates, errors = sample.estimateCounts((epochs // 86400 + 3) % 7, 7)
+    graph.profilePlot(estimates, ['M', 'T', 'W', 'T', 'F', 'S', 'S'], 'Day of the Week',
+                      title + ' (by day of the week)', dir, Z_SCORE * errors)
+    buckets = timeSeries.bucketIndices(epochs, freq)
+    estimates, errors = sample.estimateCounts(buckets - buckets.min(),
+                                              int(buckets.max() - buckets.min()) + 1)
+    starts = [timeSeries.bucketStart(x, freq)
+              for x in range(int(buckets.min()), int(buckets.max()) + 1)]
+    graph.estimatePlot(starts, estimates, Z_SCORE * errors, freq.lower(), title, dir)
+
+
+def logEstimatedSearches(samples: Iterable[Sample], numTerms: int, dir: Path) -> None:
+    """Save the estimated most common searches to Common_Searches.txt.
+
+    Counts of each sample are scaled to its file and added together.
+
+    Args:
+        samples (Iterable[Sample]): samples of search history files
+        numTerms (int): number of searches to save
+        dir (Path): directory to save the file to
+    """
+    estimates = {}
+    variances = {}
+    for sample in samples:
+        searches = [getSearch(x) for x in sample.elements]
+        distinct = sorted({x for x in searches if x})
+        codes = {x: i for i, x in enumerate(distinct)}
+        counts, errors = sample.estimateCounts([codes.get(x, -1) for x in searches], len(distinct))
+        for search, count, error in zip(distinct, counts.tolist(), errors.tolist()):
+            estimates[search] = estimates.get(search, 0.0) + count
+            variances[search] = variances.get(search, 0.0) + error ** 2
+    top = sorted(estimates, key=lambda x: -estimates[x])[:numTerms]
+    with manifest.textOutput(dir.joinpath("Common_Searches.txt")) as f:
+        f.write("Top Searches (estimated from a sample, with 95% confidence intervals):\n")
+        for search in top:
+            halfWidth = Z_SCORE * variances[search] ** 0.5
+            f.write("{} , Frequency:{:.0f} ({:.0f}-{:.0f})\n".format(
+                search, estimates[search], max(estimates[search] - halfWidth, 0),
+                estimates[search] + halfWidth))
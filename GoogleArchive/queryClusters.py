@@ -0,0 +1,249 @@
+"""Clusters of near duplicate search queries.
+
+Queries that are the same search written differently ("python list sort",
+"python sort list", "pyhton list sort") are grouped into one topic without
+comparing every pair of queries:
+    each query is normalized (lower case, words sorted) and split into
+        shingles of a few characters (bytes of its UTF-8)
+    a MinHash signature is computed for every query at once with numpy
+    signatures are split into bands, and queries that share the rows of any
+        band are candidates (locality sensitive hashing)
+    candidates are kept if their signatures agree on at least the threshold
+        share of hashes, which estimates the Jaccard similarity of their
+        shingles, and the kept pairs are merged into connected components
+
+The work is linear in the number of distinct queries for a fixed number of
+hashes.
+
+Classes:
+    QueryClusters
+
+Functions:
+    normalizeQuery
+    minHashSignatures
+    clusterQueries
+    logSearchTopics
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Sequence, Tuple
+
+import numpy as np
+
+from . import manifest
+
+"""Seed of the hash functions, so that clusters are the same on every run."""
+_SEED = 20200101
+
+"""Number of shingles hashed in one numpy operation, to bound its memory."""
+_CHUNK_SIZE = 1 << 16
+
+
+def normalizeQuery(query: str) -> str:
+    """Normalize a query so that the order and case of its words don't matter.
+
+    Args:
+        query (str): the query as it was searched
+
+    Returns:
+        the lower case words of the query, sorted and joined by single spaces
+    """
+    return " ".join(sorted(query.lower().split()))
+
+
+def _shingles(texts: Sequence[str], shingleSize: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the shingles of every text, with a space on each side of each text.
+
+    Each shingle is its bytes packed into one integer, so shingles don't need
+    to be hashed to be compared.
+
+    Returns:
+        Tuple of the uint64 shingles of every text, one text after another,
+        and the offset of the first shingle of each text
+    """
+    encoded = [" {} ".format(x).encode("UTF-8").ljust(shingleSize) for x in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    windows = np.zeros(len(data) - shingleSize + 1, dtype=np.uint64)
+    for i in range(shingleSize):
+        windows = (windows << np.uint64(8)) | data[i:len(windows) + i]
+    # shingles of a text are the windows that start and end inside of it
+    counts = lengths - shingleSize + 1
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    textStarts = np.cumsum(lengths) - lengths
+    positions = np.arange(offsets[-1]) + np.repeat(textStarts - offsets[:-1], counts)
+    return windows[positions], offsets
+
+
+def minHashSignatures(texts: Sequence[str], numHashes: int = 64,
+                      shingleSize: int = 3) -> np.ndarray:
+    """Compute the MinHash signature of each text.
+
+    The share of hashes on which two signatures agree estimates the Jaccard
+    similarity of the character shingles of the texts.
+
+    Args:
+        texts (Sequence[str]): texts to sign
+        numHashes (int) (optional): length of each signature
+        shingleSize (int) (optional): number of bytes in each shingle, at most 8
+
+    Returns:
+        uint32 array with a row of numHashes values for each text
+
+    Raises:
+        ValueError: if shingleSize is not between 1 and 8
+    """
+    if not 1 <= shingleSize <= 8:
+        raise ValueError("shingleSize must be between 1 and 8")
+    values, offsets = _shingles(texts, shingleSize)
+    random = np.random.default_rng(_SEED)
+    # multiply-shift hashing: the high 32 bits of a * x + b (mod 2^64), with a odd
+    a = random.integers(0, 1 << 63, numHashes, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = random.integers(0, 1 << 63, numHashes, dtype=np.uint64)
+    signatures = np.zeros((len(texts), numHashes), dtype=np.uint32)
+    first = 0
+    while first < len(texts):
+        # hash whole texts at a time, about _CHUNK_SIZE shingles at once
+        last = max(int(np.searchsorted(offsets, offsets[first] + _CHUNK_SIZE, side='right')) - 1,
+                   first + 1)
+        chunk = values[offsets[first]:offsets[last]]
+        hashes = ((a[:, None] * chunk + b[:, None]) >> np.uint64(32)).astype(np.uint32)
+        signatures[first:last] = np.minimum.reduceat(hashes, offsets[first:last] - offsets[first],
+                                                     axis=1).T
+        first = last
+    return signatures
+
+
+def _components(size: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Label the connected components of a graph with the smallest node of each."""
+    labels = np.arange(size)
+    while True:
+        previous = labels
+        lowest = np.minimum(labels[sources], labels[targets])
+        labels = labels.copy()
+        np.minimum.at(labels, sources, lowest)
+        np.minimum.at(labels, targets, lowest)
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+class QueryClusters:
+    """Search queries grouped into topics of near duplicates.
+
+    Attributes:
+        queries (Sequence[str]): every distinct query, in lower case
+        counts (np.ndarray): number of times each query was searched
+        labels (np.ndarray): cluster of each query, as the index of a query
+            in the cluster
+    """
+
+    def __init__(self, queries: Sequence[str], counts: np.ndarray, labels: np.ndarray) -> None:
+        """Create QueryClusters. See clusterQueries."""
+        self.queries = queries
+        self.counts = counts
+        self.labels = labels
+
+    def topics(self, numTopics: int) -> Sequence[Tuple[str, int, Sequence[Tuple[str, int]]]]:
+        """Get the most searched topics.
+
+        Args:
+            numTopics (int): number of topics to return
+
+        Returns:
+            Sequence of (name, total searches, queries), most searched first.
+            The name of a topic is its most searched query, and queries are
+            the (query, count) of every query of the topic, most searched first.
+        """
+        totals = np.bincount(self.labels, weights=self.counts, minlength=len(self.queries))
+        # stable sort keeps topics with the same total in order of first query
+        top = np.argsort(-totals, kind='stable')[:numTopics]
+        top = top[totals[top] > 0]
+        members = {label: [] for label in top.tolist()}
+        for index, label in enumerate(self.labels.tolist()):
+            if label in members:
+                members[label].append((self.queries[index], int(self.counts[index])))
+        result = []
+        for label in top.tolist():
+            queries = sorted(members[label], key=lambda x: -x[1])
+            result.append((queries[0][0], int(totals[label]), queries))
+        return result
+
+
+def clusterQueries(queries: Iterable[str], threshold: float = 0.5, numHashes: int = 64,
+                   bands: int = 16, shingleSize: int = 3) -> QueryClusters:
+    """Cluster near duplicate queries.
+
+    Args:
+        queries (Iterable[str]): every search query, with repeats. Empty
+            queries are skipped.
+        threshold (float) (optional): estimated Jaccard similarity of the
+            shingles of two queries, from 0 to 1, at which they are merged
+        numHashes (int) (optional): length of the MinHash signatures
+        bands (int) (optional): number of bands the signatures are split
+            into. More bands find pairs of lower similarity as candidates.
+        shingleSize (int) (optional): number of bytes in each shingle, at
+            most 8
+
+    Returns:
+        QueryClusters of the distinct queries
+
+    Raises:
+        ValueError: if numHashes is not a multiple of bands, threshold is not
+            between 0 and 1, or shingleSize is not between 1 and 8
+    """
+    if numHashes % bands != 0:
+        raise ValueError("numHashes must be a multiple of bands")
+    if not 0 <= threshold <= 1:
+        raise ValueError("threshold must be between 0 and 1")
+    queryCounts = Counter(x.lower() for x in queries if x.strip())
+    distinct = list(queryCounts)
+    counts = np.fromiter(queryCounts.values(), dtype=np.int64, count=len(distinct))
+    if not distinct:
+        return QueryClusters(distinct, counts, np.zeros(0, dtype=np.int64))
+
+    # queries that are equal once normalized are merged without hashing
+    normalized = [normalizeQuery(x) for x in distinct]
+    keys, first, inverse = np.unique(np.array(normalized, dtype=object),
+                                     return_index=True, return_inverse=True)
+    signatures = minHashSignatures(keys.tolist(), numHashes, shingleSize)
+
+    sources = [np.arange(len(keys))]
+    targets = [np.arange(len(keys))]
+    rows = numHashes // bands
+    for band in range(bands):
+        # the rows of the band packed into one key. Keys that collide are only
+        # extra candidates, which are dropped by the similarity check
+        bandKeys = np.zeros(len(keys), dtype=np.uint64)
+        for row in signatures[:, band * rows:(band + 1) * rows].T:
+            bandKeys = bandKeys * np.uint64(0x100000001b3) + row
+        _, bucket = np.unique(bandKeys, return_inverse=True)
+        # each key is a candidate with the first key of its bucket
+        firstOfBucket = np.full(bucket.max() + 1, len(keys))
+        np.minimum.at(firstOfBucket, bucket, np.arange(len(keys)))
+        candidates = firstOfBucket[bucket]
+        similarity = (signatures == signatures[candidates]).mean(axis=1)
+        isSimilar = similarity >= threshold
+        sources.append(np.flatnonzero(isSimilar))
+        targets.append(candidates[isSimilar])
+    keyLabels = _components(len(keys), np.concatenate(sources), np.concatenate(targets))
+
+    # label every distinct query with a query of its cluster
+    labels = first[keyLabels][inverse.ravel()]
+    return QueryClusters(distinct, counts, labels)
+
+
+def logSearchTopics(clusters: QueryClusters, numTopics: int, dir: Path) -> None:
+    """Save the most searched topics to Search_Topics.txt.
+
+    Args:
+        clusters (QueryClusters): clusters of the searches
+        numTopics (int): number of topics to save
+        dir (Path): directory to save the file to
+    """
+    with manifest.textOutput(dir.joinpath("Search_Topics.txt")) as f:
+        f.write("Top Search Topics:\n")
+        for name, total, queries in clusters.topics(numTopics):
+            f.write("{} , Frequency:{} , Queries:{}\n".format(name, total, len(queries)))
+            for query, count in queries[1:]:
+                f.write("    {} , Frequency:{}\n".format(query, count))
@@ -0,0 +1,263 @@
+"""Inverted index for full text search over parsed history.
+
+The text of each element (search queries, video and channel names, Chrome page
+titles) is split into tokens, and each token maps to the sorted ids of the
+elements that contain it. Posting lists are stored as the differences between
+consecutive ids, all in one array, so the index is compact and can be saved to
+and loaded from one .npz file.
+
+Queries are a list of terms that must all be present. A term that ends with *
+matches every token that starts with it.
+
+Classes:
+    SearchIndex
+
+Functions:
+    tokenize
+"""
+import bisect
+import calendar
+import datetime
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import manifest, timeConvert
+from .columns import decodeStrings, encodeStrings
+from .historyElements import HistoryElement, ChromeElement, SearchHistoryElement, WatchHistoryElement
+
+_TOKEN_REGEX = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lower case tokens of letters and digits.
+
+    Args:
+        text (str): text to split
+
+    Returns:
+        List of the tokens of the text, in order
+    """
+    return _TOKEN_REGEX.findall(text.lower())
+
+
+def _getText(element: HistoryElement) -> Optional[str]:
+    """Get the text of an element that is indexed, or None if it has none."""
+    if isinstance(element, SearchHistoryElement):
+        return element.query
+    if isinstance(element, WatchHistoryElement):
+        return "{} {}".format(element.videoName, element.channelName).strip()
+    if isinstance(element, ChromeElement):
+        return element.name
+    return None
+
+
+def _toEpoch(time: Optional[datetime.datetime]) -> Optional[int]:
+    """Get the epoch of a time, ignoring its time zone like TimeStamp.epoch."""
+    return calendar.timegm(time.timetuple()) if time is not None else None
+
+
+class SearchIndex:
+    """Inverted index of the text of history elements.
+
+    Elements are numbered by ids in the order that they were added.
+
+    Attributes:
+        tokens (Sequence[str]): every token, sorted
+        sources (Sequence[str]): name of each source of elements
+            (e.g. 'Youtube Watch History')
+    """
+
+    def __init__(self, tokens: Sequence[str], postingOffsets: np.ndarray, postings: np.ndarray,
+                 epochs: np.ndarray, sourceCodes: np.ndarray, sources: Sequence[str],
+                 textOffsets: np.ndarray, texts: np.ndarray) -> None:
+        """Create a SearchIndex. See SearchIndex.build and SearchIndex.load.
+
+        Args:
+            tokens (Sequence[str]): every token, sorted
+            postingOffsets (np.ndarray): offset of the posting list of each
+                token in postings, with the end of the last one at the end
+            postings (np.ndarray): every posting list, delta encoded
+            epochs (np.ndarray): epoch of each element
+            sourceCodes (np.ndarray): index of the source of each element
+            sources (Sequence[str]): name of each source
+            textOffsets (np.ndarray): offset of the text of each element
+            texts (np.ndarray): UTF-8 bytes of the text of every element
+        """
+        self.tokens = tokens
+        self.sources = sources
+        self._postingOffsets = postingOffsets
+        self._postings = postings
+        self._epochs = epochs
+        self._sourceCodes = sourceCodes
+        self._textOffsets = textOffsets
+        self._texts = texts
+
+    @classmethod
+    def build(cls, data: Mapping[str, Sequence[HistoryElement]]) -> "SearchIndex":
+        """Index the text of history elements.
+
+        Elements without text to index (such as a plain HistoryElement) are
+        skipped.
+
+        Args:
+            data (Mapping[str, Sequence[HistoryElement]]): elements by the name
+                of their source (e.g. {'Google Search History': [...]})
+
+        Returns:
+            SearchIndex of the elements
+        """
+        postingLists: Dict[str, List[int]] = {}
+        epochs = []
+        sourceCodes = []
+        texts = []
+        for sourceCode, elements in enumerate(data.values()):
+            for element in elements:
+                text = _getText(element)
+                if text is None:
+                    continue
+                elementId = len(texts)
+                for token in set(tokenize(text)):
+                    postingLists.setdefault(token, []).append(elementId)
+                epochs.append(element.timeStamp.epoch)
+                sourceCodes.append(sourceCode)
+                texts.append(text)
+
+        tokens = sorted(postingLists)
+        lengths = np.fromiter((len(postingLists[x]) for x in tokens), dtype=np.int64,
+                              count=len(tokens))
+        postingOffsets = np.concatenate(([0], np.cumsum(lengths)))
+        ids = np.fromiter((i for x in tokens for i in postingLists[x]), dtype=np.uint32,
+                          count=int(postingOffsets[-1]))
+        # ids increase within each list, so each is stored as the gap from the
+        # one before it, and the first as itself
+        postings = np.diff(ids, prepend=np.uint32(0))
+        postings[postingOffsets[:-1][lengths > 0]] = ids[postingOffsets[:-1][lengths > 0]]
+        textOffsets, textBytes = encodeStrings(texts)
+        return cls(tokens, postingOffsets, postings, np.array(epochs, dtype=np.int64),
+                   np.array(sourceCodes, dtype=np.int16), list(data), textOffsets, textBytes)
+
+    def __len__(self) -> int:
+        """Number of indexed elements."""
+        return len(self._epochs)
+
+    def _postingList(self, tokenIndex: int) -> np.ndarray:
+        """Decode the ids of the posting list of a token."""
+        start, end = self._postingOffsets[tokenIndex], self._postingOffsets[tokenIndex + 1]
+        return np.cumsum(self._postings[start:end], dtype=np.int64)
+
+    def _termIds(self, term: str) -> np.ndarray:
+        """Get the sorted ids of the elements that match one term."""
+        if term.endswith("*"):
+            prefix = term[:-1]
+            first = bisect.bisect_left(self.tokens, prefix)
+            last = bisect.bisect_left(self.tokens, prefix + "\U0010ffff")
+            if first == last:
+                return np.zeros(0, dtype=np.int64)
+            return np.unique(np.concatenate([self._postingList(i) for i in range(first, last)]))
+        index = bisect.bisect_left(self.tokens, term)
+        if index == len(self.tokens) or self.tokens[index] != term:
+            return np.zeros(0, dtype=np.int64)
+        return self._postingList(index)
+
+    def search(self, query: str, since: Optional[datetime.datetime] = None,
+               until: Optional[datetime.datetime] = None,
+               sources: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Find the elements that contain every term of a query.
+
+        Args:
+            query (str): terms separated by spaces, case insensitive. A term
+                that ends with * matches every token that starts with it
+                (e.g. 'pyth* sort').
+            since (datetime.datetime) (optional): only elements at or after this
+                time
+            until (datetime.datetime) (optional): only elements before this time
+            sources (Iterable[str]) (optional): only elements of these sources
+
+        Returns:
+            sorted ids of the matching elements. An empty query matches none.
+        """
+        terms = []
+        for word in query.split():
+            tokens = tokenize(word)
+            # only the last token of a word is a prefix (e.g. 'foo-ba*' is 'foo' and 'ba*')
+            if tokens and word.endswith("*"):
+                tokens[-1] += "*"
+            terms.extend(tokens)
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+        # intersect the shortest lists first, so the result shrinks quickly
+        termIds = sorted((self._termIds(x) for x in terms), key=len)
+        ids = termIds[0]
+        for other in termIds[1:]:
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        sinceEpoch, untilEpoch = _toEpoch(since), _toEpoch(until)
+        if sinceEpoch is not None:
+            ids = ids[self._epochs[ids] >= sinceEpoch]
+        if untilEpoch is not None:
+            ids = ids[self._epochs[ids] < untilEpoch]
+        if sources is not None:
+            codes = [self.sources.index(x) for x in sources if x in self.sources]
+            ids = ids[np.isin(self._sourceCodes[ids], codes)]
+        return ids
+
+    def entry(self, elementId: int) -> Tuple[datetime.datetime, str, str]:
+        """Get an indexed element.
+
+        Args:
+            elementId (int): id of the element, as given by search
+
+        Returns:
+            Tuple of the time, the source and the indexed text of the element
+        """
+        time = timeConvert.TimeStamp.fromEpoch(self._epochs[elementId])
+        start, end = self._textOffsets[elementId], self._textOffsets[elementId + 1]
+        text = self._texts[start:end].tobytes().decode("UTF-8")
+        return (datetime.datetime(time.year, time.monthNumber, time.day, time.hour,
+                                  time.minute, time.second),
+                self.sources[self._sourceCodes[elementId]], text)
+
+    def save(self, path: Path) -> None:
+        """Save the index to a .npz file.
+
+        The file is not written again if it was saved from the same index
+        (see manifest).
+
+        Args:
+            path (Path): file to save to
+        """
+        tokenOffsets, tokenBytes = encodeStrings(self.tokens)
+        sourceOffsets, sourceBytes = encodeStrings(self.sources)
+        arrays = dict(tokenOffsets=tokenOffsets, tokenBytes=tokenBytes,
+                      postingOffsets=self._postingOffsets, postings=self._postings,
+                      epochs=self._epochs, sourceCodes=self._sourceCodes,
+                      sourceOffsets=sourceOffsets, sourceBytes=sourceBytes,
+                      textOffsets=self._textOffsets, texts=self._texts)
+        key = manifest.outputKey('searchIndex', arrays)
+        if manifest.isCurrent(path, key):
+            return
+        with path.open("wb") as f:
+            np.savez_compressed(f, **arrays)
+        manifest.record(path, key)
+
+    @classmethod
+    def load(cls, path: Path) -> "SearchIndex":
+        """Load an index saved by SearchIndex.save.
+
+        Args:
+            path (Path): the saved .npz file
+
+        Returns:
+            the SearchIndex
+
+        Raises:
+            FileNotFoundError: if the file doesn't exist
+        """
+        with np.load(path) as arrays:
+            return cls(decodeStrings(arrays["tokenOffsets"], arrays["tokenBytes"]),
+                       arrays["postingOffsets"], arrays["postings"], arrays["epochs"],
+                       arrays["sourceCodes"],
+                       decodeStrings(arrays["sourceOffsets"], arrays["sourceBytes"]),
+                       arrays["textOffsets"], arrays["texts"])
@@ -1,6 +1,30 @@
-"""Module containing commonSearchTerms function and its helper functions"""
+"""Module containing commonSearchTerms function and its helper functions
 
-def commonSearchTerms(searchData, numTerms, dir):
+With a memory budget, searches are counted in a dictionary until its
+approximate size passes the budget. The counts are then spilled to a temporary
+file, sorted by search, and counting starts again. At the end the files are
+merged (an external k-way merge), adding up the counts of each search, and
+sorted again by when each search was first made, since that is the order the
+top searches are picked in. This gives the same top searches as counting in
+memory.
+"""
+import heapq
+import itertools
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from . import manifest
+
+#approximate bytes of each counted search besides its string (dictionary entry, list and ints)
+_ENTRY_BYTES = 160
+
+#most spill files that are merged at once, so a small budget doesn't open too many files
+_MAX_OPEN_RUNS = 64
+
+
+def commonSearchTerms(searchData, numTerms, dir, memoryBudget=None):
     """
     Finds a variable number of the most commonly searched terms across all data.
     Outputs data to a text file, Common_Searches.txt
@@ -8,24 +32,53 @@ def commonSearchTerms(searchData, numTerms, dir):
         searchData: List of dictionaries as created in parse. Used to evaluate search terms.
         numTerms: Integer specifying the number of terms to be output
         dir: Path, where to save the file
+        memoryBudget: (optional) approximate bytes that the counts of searches may use. When
+            they use more, they are spilled to temporary files and merged at the end. All
+            counts are kept in memory by default.
+    Raises:
+        ValueError: if memoryBudget is not positive
     """
-    searchNums = {}
-    for data in searchData:
-        #get search
-        search = getSearch(data)
-        if(search):
-            if search in searchNums:
-                searchNums[search] += 1
-            else:
-                searchNums[search] = 1
+    if memoryBudget is None:
+        searchNums = {}
+        for data in searchData:
+            #get search
+            search = getSearch(data)
+            if(search):
+                if search in searchNums:
+                    searchNums[search] += 1
+                else:
+                    searchNums[search] = 1
+        topSearches = _topSearches(searchNums.items(), numTerms)
+    else:
+        if memoryBudget <= 0:
+            raise ValueError("memoryBudget must be positive")
+        with tempfile.TemporaryDirectory(prefix="searchTerms") as tempDir:
+            topSearches = _topSearches(_spilledSearchNums(searchData, memoryBudget, Path(tempDir)),
+                                       numTerms)
+    logTopSearches(topSearches, dir)
+
+
+def _topSearches(searchNums, numTerms):
+    """
+    Helper function for commonSearchTerms.
+    Picks the searches with the largest counts, by the order they were first searched in.
+    Only the counts of the picked searches are kept.
+    Args:
+        searchNums: Iterable of (search, count), in the order each search was first made
+        numTerms: Integer specifying the number of terms to pick
+    Returns:
+        List of tuples of the search and its count, smallest count first
+    """
+    counts = {} #counts of the searches in topSearches, and of the search being added
     topSearches = []
-    for search in searchNums:
+    for search, count in searchNums:
+        counts[search] = count
         if(len(topSearches) < numTerms): #checks if list has been fully created
             if(len(topSearches) == 0):   #first addition, no need to sort
                 topSearches.append(search)
             else:
-                for i in range(len(topSearches)): 
-                    if searchNums[search] < searchNums[topSearches[i]]: #adds in smaller count before the larger value
+                for i in range(len(topSearches)):
+                    if counts[search] < counts[topSearches[i]]: #adds in smaller count before the larger value
                         topSearches.insert(i, search)
                         break
                     if(i == len(topSearches) - 1): #if at the end
@@ -34,21 +87,112 @@ def commonSearchTerms(searchData, numTerms, dir):
             for i in range(numTerms):
                 if(i == numTerms - 1): #if it has gotten to the end of the list
                     topSearches.insert(i+1, search)
-                    topSearches = topSearches[1:] #removes lowest count term 
-                if(searchNums[search] > searchNums[topSearches[i]]): #if it is greater than the current index
-                    if (searchNums[topSearches[i]] == searchNums[topSearches[i+1]]): #if the next index is the same, continue on to add later (because > it must be after all of the same)
+                    del counts[topSearches.pop(0)] #removes lowest count term
+                if(counts[search] > counts[topSearches[i]]): #if it is greater than the current index
+                    if (counts[topSearches[i]] == counts[topSearches[i+1]]): #if the next index is the same, continue on to add later (because > it must be after all of the same)
                         pass
-                    elif(searchNums[search] > searchNums[topSearches[i+1]]): #if it is also greater than the next index, continue on
+                    elif(counts[search] > counts[topSearches[i+1]]): #if it is also greater than the next index, continue on
                         pass
                     else:
                         topSearches.insert(i+1, search)
-                        topSearches = topSearches[1:] #removes lowest count term 
+                        del counts[topSearches.pop(0)] #removes lowest count term
                         break
                 else: #if it is smaller than the first index, don't continue
                     break
-    for i in range(len(topSearches)):
-        topSearches[i] = (topSearches[i], searchNums[topSearches[i]]) #adds search nums into list
-    logTopSearches(topSearches, dir)
+        if(len(counts) > len(topSearches)): #the search wasn't added
+            del counts[search]
+    return [(search, counts[search]) for search in topSearches] #adds search nums into list
+
+
+def _spilledSearchNums(searchData, memoryBudget, tempDir):
+    """
+    Helper function for commonSearchTerms.
+    Counts searches within a memory budget, spilling sorted counts to files in tempDir.
+    Args:
+        searchData: List of dictionaries as created in parse
+        memoryBudget: approximate bytes that counts may use
+        tempDir: Path of a directory for the spill files
+    Returns:
+        Iterator of (search, count), in the order each search was first made
+    """
+    runs = []
+    searchNums = {} #[index of the first search, count] of each search
+    size = 0
+    for index, data in enumerate(searchData):
+        search = getSearch(data)
+        if(search):
+            if search in searchNums:
+                searchNums[search][1] += 1
+            else:
+                searchNums[search] = [index, 1]
+                size += sys.getsizeof(search) + _ENTRY_BYTES
+                if size > memoryBudget:
+                    runs.append(_writeRun(_bySearch(searchNums), tempDir))
+                    searchNums = {}
+                    size = 0
+    last = _bySearch(searchNums)
+    searchNums = None
+    #once merged, the counts of a search are next to each other and are added up
+    merged = heapq.merge(*_openRuns(runs, tempDir, _entryKey), last, key=_entryKey)
+    runs = []
+    byFirst = []
+    size = 0
+    for search, parts in itertools.groupby(merged, key=_entryKey):
+        parts = list(parts)
+        byFirst.append([min(x[1] for x in parts), search, sum(x[2] for x in parts)])
+        size += sys.getsizeof(search) + _ENTRY_BYTES
+        if size > memoryBudget:
+            byFirst.sort()
+            runs.append(_writeRun(byFirst, tempDir))
+            byFirst = []
+            size = 0
+    byFirst.sort()
+    for first, search, count in heapq.merge(*_openRuns(runs, tempDir, _entryKey), byFirst, key=_entryKey):
+        yield search, count
+
+
+def _bySearch(searchNums):
+    """Helper function for _spilledSearchNums. Lists [search, first, count] of each search, sorted by search."""
+    return sorted([search, first, count] for search, (first, count) in searchNums.items())
+
+
+def _entryKey(entry):
+    """Key that the entries of a spill file are sorted by, which is the first item of each."""
+    return entry[0]
+
+
+def _writeRun(entries, tempDir):
+    """
+    Helper function for _spilledSearchNums.
+    Writes sorted entries to a new spill file, one JSON list per line.
+    Returns:
+        Path of the file
+    """
+    with tempfile.NamedTemporaryFile("w", encoding="UTF-8", dir=tempDir, suffix=".jsonl", delete=False) as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+    return Path(f.name)
+
+
+def _readRun(path):
+    """Helper function for _spilledSearchNums. Reads the entries of a spill file, then removes it."""
+    with path.open("r", encoding="UTF-8") as f:
+        for line in f:
+            yield json.loads(line)
+    path.unlink()
+
+
+def _openRuns(runs, tempDir, key):
+    """
+    Helper function for _spilledSearchNums.
+    Opens spill files to be merged, first merging them into fewer files if there are too many.
+    Returns:
+        List of iterators of the entries of each file
+    """
+    while len(runs) > _MAX_OPEN_RUNS:
+        merged = heapq.merge(*[_readRun(x) for x in runs[:_MAX_OPEN_RUNS]], key=key)
+        runs = runs[_MAX_OPEN_RUNS:] + [_writeRun(merged, tempDir)]
+    return [_readRun(x) for x in runs]
 
 
 def logTopSearches(topSearches, dir):
@@ -59,11 +203,16 @@ def logTopSearches(topSearches, dir):
         topSearches: List of top searches, with each entry being a tuple of the search and the frequency
         dir: path to subdirectory to store file at
     """
-    f = dir.joinpath("Common_Searches.txt").open("w")
+    path = dir.joinpath("Common_Searches.txt")
+    key = manifest.outputKey('topSearches', list(topSearches))
+    if manifest.isCurrent(path, key): #unchanged since the last run
+        return
+    f = path.open("w")
     f.write('Top Searches:\n')
     for search in topSearches:
         f.write(str(search[0]) + ' , Frequency:' + str(search[1]) + '\n')
     f.close()
+    manifest.record(path, key)
 
 
 def getSearch(term):
@@ -74,12 +223,23 @@ def getSearch(term):
     Args:
         term: A dictionary as created in parse module.
     """
-    if(term['Product'] == 'Youtube' and term['Action'] == 'Search'):
+    if(not isSearch(term['Product'], term['Action'])):
+        return None
+    if(term['Product'] == 'Youtube'):
         return term['Search'].lower() #uses lower to remove case sensitivity
-    elif(term['Product'] == 'Search'):
-        if('Searched for' in term['Action']):
-            if(term['Query']): #handles for none query
-                return term['Query'].lower()
-        else:
-            return None
-    return None
\ No newline at end of file
+    if(term['Query']): #handles for none query
+        return term['Query'].lower()
+    return None
+
+
+def isSearch(product, action):
+    """
+    Helper function for getSearch.
+    Returns True if an element of the given product and action is counted as a search.
+    Args:
+        product: String of the product of the element (e.g. 'Search')
+        action: String of the action of the element (e.g. 'Searched for')
+    """
+    if(product == 'Youtube'):
+        return action == 'Search'
+    return product == 'Search' and 'Searched for' in action
@@ -0,0 +1,310 @@
+"""Local HTTP service that answers queries over history loaded once.
+
+Every history file is parsed once into HistoryColumns, and queries are
+answered from the columns with numpy, without parsing or rendering anything.
+Responses are cached by query, since the history doesn't change while the
+service runs, so a repeated query is only a lookup.
+
+The service only listens on localhost (127.0.0.1), since the history is
+private.
+
+Endpoints (all GET, all answer JSON):
+    /sources: name and number of elements of each source
+    /counts?interval=month: number of elements in each interval of time
+    /profile?kind=hour: number of elements in each hour of the day, or each
+        day of the week with kind=weekday
+    /top-searches?n=25: the most common searches, counted as in
+        Common_Searches.txt (see searchTerms.getSearch)
+
+Every endpoint but /sources takes these filters, each of which may be given
+more than once:
+    source: only these sources (e.g. 'Google Search History')
+    product, action: only elements with these products or actions
+    since, until: only elements at or after since and before until, as ISO
+        dates or times (e.g. 2020-01-31 or 2020-01-31T12:00)
+
+Can be run as:
+    python -m GoogleArchive.service path/to/Takeout --port 8000
+
+Classes:
+    HistoryStore
+    QueryError
+    NotFoundError
+
+Functions:
+    serve
+"""
+import argparse
+import calendar
+import datetime
+import functools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from . import parse, searchTerms, timeSeries
+from .columns import HistoryColumns
+from .historyElements import SearchHistoryElement
+
+"""Address the service listens on. Only this machine can connect to it."""
+HOST = '127.0.0.1'
+
+"""Most responses that are cached."""
+CACHE_SIZE = 1024
+
+_FILTERS = ('source', 'product', 'action', 'since', 'until')
+
+
+class QueryError(ValueError):
+    """A query with a missing or invalid parameter."""
+
+
+class NotFoundError(LookupError):
+    """A query of a path that is not an endpoint."""
+
+
+class _Source:
+    """Columns of one source, with the codes that queries filter by."""
+
+    def __init__(self, columns: HistoryColumns) -> None:
+        self.epochs = columns.epochs
+        self.productCodes, self.products = columns.codes('product')
+        self.actionCodes, self.actions = columns.codes('action')
+        self.searchCodes = None
+        self.searches: Sequence[str] = []
+        if issubclass(columns.elementClass, SearchHistoryElement):
+            # searches are compared in lower case, like commonSearchTerms
+            queries = [x.lower() for x in columns.column('query')]
+            self.searches, self.searchCodes = np.unique(queries, return_inverse=True)
+            # only what getSearch counts is counted, not pages visited from a search.
+            # The extra False is for elements without a product or action, which have the code -1
+            isSearch = np.array([[searchTerms.isSearch(product, action) for action in self.actions] + [False]
+                                 for product in self.products] + [[False] * (len(self.actions) + 1)])
+            notCounted = ~isSearch[self.productCodes, self.actionCodes]
+            empty = np.flatnonzero(self.searches == '')
+            if len(empty):
+                notCounted |= self.searchCodes == empty[0]
+            self.searchCodes = np.where(notCounted, -1, self.searchCodes)
+
+
+class HistoryStore:
+    """History of a Takeout, held in memory to be queried.
+
+    Attributes:
+        sources (Dict[str, HistoryColumns]): columns of each source, by name
+            (e.g. 'Google Search History', or 'Maps Activity')
+    """
+
+    def __init__(self, sources: Mapping[str, HistoryColumns]) -> None:
+        """Create a HistoryStore. See HistoryStore.load.
+
+        Args:
+            sources (Mapping[str, HistoryColumns]): columns of each source
+        """
+        self.sources = dict(sources)
+        self._sources = {name: _Source(columns) for name, columns in self.sources.items()}
+        # each store has its own cache, so it is created here
+        self.query = functools.lru_cache(maxsize=CACHE_SIZE)(self._query)
+
+    @classmethod
+    def load(cls, takeoutPath: Path, processes: Optional[int] = None) -> "HistoryStore":
+        """Parse every history file of a Takeout, in parallel.
+
+        Args:
+            takeoutPath (Path): path to your takeout folder
+            processes (int) (optional): number of processes to parse with
+
+        Returns:
+            HistoryStore of every history file that exists
+        """
+        names = [name for name, *_ in parse.historyFiles(takeoutPath)]
+        return cls(parse.parseInParallel(takeoutPath, names, processes=processes))
+
+    def _query(self, path: str, parameters: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> bytes:
+        """Answer a query. Cached by self.query.
+
+        Args:
+            path (str): path of the endpoint (e.g. '/counts')
+            parameters: each parameter and its values, sorted, so the same
+                query always has the same key
+
+        Returns:
+            UTF-8 JSON of the answer
+
+        Raises:
+            QueryError: if a parameter is missing or invalid
+            NotFoundError: if there is no such endpoint
+        """
+        parameters = dict(parameters)
+        if path == '/sources':
+            answer = {name: len(columns) for name, columns in self.sources.items()}
+        elif path == '/counts':
+            interval = _single(parameters, 'interval', 'month')
+            try:
+                series = timeSeries.resample(self._epochs(parameters), interval)
+            except ValueError as e:
+                raise QueryError(str(e))
+            answer = {"interval": interval, "starts": [x.isoformat() for x in series.starts],
+                      "values": series.values.astype(np.int64).tolist()}
+        elif path == '/profile':
+            kind = _single(parameters, 'kind', 'hour')
+            epochs = self._epochs(parameters)
+            if kind == 'hour':
+                values = np.bincount(epochs // 3600 % 24, minlength=24)
+            elif kind == 'weekday':
+                # 1970-01-01 was a Thursday, and days count from Monday
+                values = np.bincount((epochs // 86400 + 3) % 7, minlength=7)
+            else:
+                raise QueryError("kind must be 'hour' or 'weekday'")
+            answer = {"kind": kind, "values": values.tolist()}
+        elif path == '/top-searches':
+            answer = {"searches": self._topSearches(parameters, _integer(parameters, 'n', 25))}
+        else:
+            raise NotFoundError(path)
+        return json.dumps(answer).encode("UTF-8")
+
+    def _masks(self, parameters: Mapping[str, Tuple[str, ...]]) -> Dict[str, np.ndarray]:
+        """Get a mask of the elements of each selected source that match the filters."""
+        names = parameters.get('source', tuple(self._sources))
+        for name in names:
+            if name not in self._sources:
+                raise QueryError("There is no source named {}".format(name))
+        since = _epoch(parameters, 'since')
+        until = _epoch(parameters, 'until')
+        masks = {}
+        for name in names:
+            source = self._sources[name]
+            mask = np.ones(len(source.epochs), dtype=bool)
+            if since is not None:
+                mask &= source.epochs >= since
+            if until is not None:
+                mask &= source.epochs < until
+            for field, codes, values in (('product', source.productCodes, source.products),
+                                         ('action', source.actionCodes, source.actions)):
+                if field in parameters:
+                    wanted = [i for i, x in enumerate(values) if x in parameters[field]]
+                    mask &= np.isin(codes, wanted)
+            masks[name] = mask
+        return masks
+
+    def _epochs(self, parameters: Mapping[str, Tuple[str, ...]]) -> np.ndarray:
+        """Get the epochs of every element that matches the filters."""
+        masks = self._masks(parameters)
+        return np.concatenate([np.zeros(0, dtype=np.int64)] +
+                              [self._sources[name].epochs[mask] for name, mask in masks.items()])
+
+    def _topSearches(self, parameters: Mapping[str, Tuple[str, ...]], n: int) -> List[Tuple[str, int]]:
+        """Get the most common searches of the elements that match the filters."""
+        counts: Dict[str, int] = {}
+        for name, mask in self._masks(parameters).items():
+            source = self._sources[name]
+            if source.searchCodes is None:
+                continue
+            codes = source.searchCodes[mask]
+            sourceCounts = np.bincount(codes[codes >= 0], minlength=len(source.searches))
+            for code in np.flatnonzero(sourceCounts).tolist():
+                search = source.searches[code]
+                counts[search] = counts.get(search, 0) + int(sourceCounts[code])
+        return sorted(counts.items(), key=lambda x: (-x[1], x[0]))[:n]
+
+
+def _single(parameters: Mapping[str, Tuple[str, ...]], name: str, default: str) -> str:
+    """Get a parameter that is given at most once."""
+    values = parameters.get(name, (default,))
+    if len(values) != 1:
+        raise QueryError("{} must be given once".format(name))
+    return values[0]
+
+
+def _integer(parameters: Mapping[str, Tuple[str, ...]], name: str, default: int) -> int:
+    """Get a parameter that is a positive integer."""
+    value = _single(parameters, name, str(default))
+    # isdigit alone accepts characters such as '²' that int can't read
+    if not value.isascii() or not value.isdigit() or int(value) == 0:
+        raise QueryError("{} must be a positive integer".format(name))
+    return int(value)
+
+
+def _epoch(parameters: Mapping[str, Tuple[str, ...]], name: str) -> Optional[int]:
+    """Get a parameter that is an ISO time as an epoch, with the time zone ignored."""
+    if name not in parameters:
+        return None
+    try:
+        moment = datetime.datetime.fromisoformat(_single(parameters, name, ''))
+    except ValueError:
+        raise QueryError("{} must be an ISO date or time (e.g. 2020-01-31)".format(name))
+    return calendar.timegm(moment.timetuple())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers the queries of one connection from the store of the server."""
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        parameters = tuple(sorted((name, tuple(values)) for name, values in
+                                  parse_qs(url.query, keep_blank_values=True).items()))
+        unknown = [name for name, _ in parameters if name not in _FILTERS + ('interval', 'kind', 'n')]
+        try:
+            if unknown:
+                raise QueryError("Unknown parameters: {}".format(", ".join(unknown)))
+            self._send(200, self.server.store.query(url.path, parameters))
+        except QueryError as e:
+            self._send(400, json.dumps({"error": str(e)}).encode("UTF-8"))
+        except NotFoundError:
+            self._send(404, json.dumps({"error": "No such endpoint"}).encode("UTF-8"))
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        """Don't log every request."""
+
+
+def serve(store: HistoryStore, port: int = 8000) -> ThreadingHTTPServer:
+    """Create a server that answers queries over a store, on localhost.
+
+    Call serve_forever on the server to answer queries, and shutdown to stop.
+
+    Args:
+        store (HistoryStore): history to query
+        port (int) (optional): port to listen on, or 0 for any free port
+
+    Returns:
+        the server, listening on 127.0.0.1
+    """
+    server = ThreadingHTTPServer((HOST, port), _Handler)
+    server.store = store
+    return server
+
+
+def main() -> None:
+    """Load the Takeout given on the command line and answer queries until stopped."""
+    parser = argparse.ArgumentParser(description="Query Google Takeout history over HTTP.")
+    parser.add_argument("takeoutPath", type=Path, help="path of the Takeout folder")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    args = parser.parse_args()
+    start = time.time()
+    store = HistoryStore.load(args.takeoutPath)
+    print("Took {}s to load {}".format(time.time() - start,
+                                       ", ".join(store.sources) or "no history"))
+    server = serve(store, args.port)
+    print("Answering queries at http://{}:{}/".format(HOST, server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Sessions, daily streaks and idle gaps of activity.
+
+Events are grouped into sessions by an inactivity gap: a new session starts
+whenever the time since the previous event is longer than the gap. Everything
+is computed with vectorized numpy operations (mostly np.diff) over the sorted
+epoch seconds of the data, with no Python loop per event.
+
+Functions:
+    sessionize
+    logSessions
+"""
+import datetime
+from pathlib import Path
+from typing import Mapping, Sequence
+
+import numpy as np
+
+from . import manifest, timeConvert
+from .historyElements import HistoryElement
+
+_SECONDS_PER_DAY = 86400
+
+"""Upper edges (in minutes) of the session length ranges that are reported."""
+_LENGTH_EDGES = (1, 5, 15, 30, 60, 120)
+
+
+class Sessions:
+    """Sessions of activity and the streaks and gaps between them.
+
+    Times are epoch seconds (see TimeStamp.epoch).
+
+    Attributes:
+        gapMinutes (int): longest inactivity that doesn't end a session
+        events (int): number of events
+        starts (np.ndarray): start time of each session
+        lengths (np.ndarray): seconds from the first to the last event of each
+            session
+        eventCounts (np.ndarray): number of events in each session
+        activeDays (int): number of days with at least one event
+        longestStreak (int): most consecutive days with at least one event
+        streakStart (int): first day of the longest streak, as an epoch
+        longestGap (int): most seconds between two consecutive events
+        gapStart (int): time of the event the longest gap starts at
+    """
+
+    def __init__(self, gapMinutes: int, epochs: np.ndarray) -> None:
+        """Create Sessions. See sessionize."""
+        self.gapMinutes = gapMinutes
+        self.events = len(epochs)
+        self.longestStreak = 0
+        self.streakStart = None
+        self.longestGap = 0
+        self.gapStart = None
+        if self.events == 0:
+            self.starts = self.lengths = self.eventCounts = np.zeros(0, dtype=np.int64)
+            self.activeDays = 0
+            return
+
+        gaps = np.diff(epochs)
+        isBreak = gaps > gapMinutes * 60
+        # index of the first and last event of each session
+        firsts = np.flatnonzero(np.concatenate(([True], isBreak)))
+        lasts = np.concatenate((firsts[1:] - 1, [self.events - 1]))
+        self.starts = epochs[firsts]
+        self.lengths = epochs[lasts] - self.starts
+        self.eventCounts = lasts - firsts + 1
+        if len(gaps):
+            longest = int(np.argmax(gaps))
+            self.longestGap = int(gaps[longest])
+            self.gapStart = int(epochs[longest])
+
+        days = epochs // _SECONDS_PER_DAY
+        days = days[np.concatenate(([True], np.diff(days) > 0))]
+        self.activeDays = len(days)
+        # each streak starts at a day that doesn't follow the one before it
+        streakFirsts = np.flatnonzero(np.concatenate(([True], np.diff(days) != 1)))
+        streakLengths = np.diff(np.concatenate((streakFirsts, [len(days)])))
+        longest = int(np.argmax(streakLengths))
+        self.longestStreak = int(streakLengths[longest])
+        self.streakStart = int(days[streakFirsts[longest]]) * _SECONDS_PER_DAY
+
+    def __len__(self) -> int:
+        """Number of sessions."""
+        return len(self.starts)
+
+    def lengthDistribution(self) -> Sequence[int]:
+        """Count the sessions in each range of length.
+
+        Returns:
+            number of sessions shorter than each edge of _LENGTH_EDGES (and at
+            least as long as the edge before it), followed by the number of
+            sessions at least as long as the last edge
+        """
+        ranges = np.searchsorted(np.array(_LENGTH_EDGES) * 60, self.lengths, side='right')
+        return np.bincount(ranges, minlength=len(_LENGTH_EDGES) + 1).tolist()
+
+
+def sessionize(data: Sequence[HistoryElement], gapMinutes: int = 30) -> Sessions:
+    """Group the events of data into sessions.
+
+    Args:
+        data (Sequence[HistoryElement]): events, in any order
+        gapMinutes (int) (optional): longest inactivity, in minutes, that
+            doesn't end a session
+
+    Returns:
+        Sessions of the data
+
+    Raises:
+        ValueError: if gapMinutes is less than 1
+    """
+    if gapMinutes < 1:
+        raise ValueError("gapMinutes must be at least 1")
+    return Sessions(gapMinutes, np.sort(timeConvert.getEpochs(data)))
+
+
+def _formatEpoch(epoch: int) -> str:
+    """Format epoch seconds as a date and time."""
+    return str(datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=int(epoch)))
+
+
+def _formatDuration(seconds: float) -> str:
+    """Format seconds as hours and minutes."""
+    minutes = int(round(seconds / 60))
+    return "{}h {}m".format(minutes // 60, minutes % 60)
+
+
+def logSessions(allSessions: Mapping[str, Sessions], dir: Path) -> None:
+    """Save the sessions of each source of data to Sessions.txt.
+
+    Args:
+        allSessions (Mapping[str, Sessions]): Sessions by the name of their
+            data (e.g. 'Youtube Watch Data')
+        dir (Path): directory to save the file to
+    """
+    labels = ["< {} min".format(_LENGTH_EDGES[0])]
+    labels.extend("{}-{} min".format(low, high) for low, high in zip(_LENGTH_EDGES, _LENGTH_EDGES[1:]))
+    labels.append(">= {} min".format(_LENGTH_EDGES[-1]))
+    with manifest.textOutput(dir.joinpath("Sessions.txt")) as f:
+        for title, sessions in allSessions.items():
+            f.write("{} (sessions end after {} minutes of inactivity)\n".format(
+                title, sessions.gapMinutes))
+            f.write("Events: {} , Sessions: {}\n".format(sessions.events, len(sessions)))
+            if len(sessions) == 0:
+                f.write("\n")
+                continue
+            f.write("Average session: {} , {:.1f} events\n".format(
+                _formatDuration(sessions.lengths.mean()), sessions.eventCounts.mean()))
+            f.write("Median session: {}\n".format(_formatDuration(np.median(sessions.lengths))))
+            longest = int(np.argmax(sessions.lengths))
+            f.write("Longest session: {} , starting {}\n".format(
+                _formatDuration(sessions.lengths[longest]), _formatEpoch(sessions.starts[longest])))
+            f.write("Active days: {}\n".format(sessions.activeDays))
+            f.write("Longest streak: {} days , starting {}\n".format(
+                sessions.longestStreak, _formatEpoch(sessions.streakStart).split()[0]))
+            if sessions.gapStart is not None:
+                f.write("Longest gap: {} , starting {}\n".format(
+                    _formatDuration(sessions.longestGap), _formatEpoch(sessions.gapStart)))
+            f.write("Session lengths:\n")
+            for label, count in zip(labels, sessions.lengthDistribution()):
+                f.write("{} , {}\n".format(label, count))
+            f.write("\n")
@@ -0,0 +1,69 @@
+"""Dictionary encoding for strings that repeat across many elements.
+
+Classes:
+    SymbolTable
+"""
+from typing import Dict, List, Sequence
+
+
+class SymbolTable:
+    """Maps strings to dense integer codes.
+
+    Each distinct string is stored exactly once. Codes are assigned in the
+    order that strings are first seen, starting at 0, so they can be used
+    directly as keys of integer counters or as indices into lists.
+
+    Attributes:
+        symbols (Sequence[str]): the distinct strings, indexed by their code
+    """
+
+    def __init__(self) -> None:
+        """Create an empty SymbolTable."""
+        self._codes: Dict[str, int] = {}
+        self._symbols: List[str] = []
+
+    def code(self, symbol: str) -> int:
+        """Get the code for a string, adding it to the table if it is new.
+
+        Args:
+            symbol (str): the string to encode
+
+        Returns:
+            the integer code of the string
+        """
+        code = self._codes.get(symbol)
+        if code is None:
+            code = len(self._symbols)
+            self._codes[symbol] = code
+            self._symbols.append(symbol)
+        return code
+
+    def intern(self, symbol: str) -> str:
+        """Get the stored copy of a string, adding it if it is new.
+
+        Equal strings passed through the same table share a single object.
+
+        Args:
+            symbol (str): the string to intern
+
+        Returns:
+            the canonical copy of the string
+        """
+        return self._symbols[self.code(symbol)]
+
+    @property
+    def symbols(self) -> Sequence[str]:
+        """The distinct strings of the table, indexed by their code."""
+        return tuple(self._symbols)
+
+    def __getitem__(self, code: int) -> str:
+        """Get the string for a code."""
+        return self._symbols[code]
+
+    def __contains__(self, symbol: str) -> bool:
+        """Check if a string has been added to the table."""
+        return symbol in self._codes
+
+    def __len__(self) -> int:
+        """Number of distinct strings in the table."""
+        return len(self._symbols)
@@ -1,9 +1,29 @@
 """Functions and classes for dealing with times."""
 from __future__ import annotations  # Allows us to use HistoryElement type
 
+import calendar
 import datetime
 from typing import Sequence
 
+import numpy as np
+
+_MONTHS = {'Jan': 1,
+           'Feb': 2,
+           'Mar': 3,
+           'Apr': 4,
+           'May': 5,
+           'Jun': 6,
+           'Jul': 7,
+           'Aug': 8,
+           'Sep': 9,
+           'Oct': 10,
+           'Nov': 11,
+           'Dec': 12
+           }
+
+"""3 letter name of each month, indexed by the 1 based month number."""
+_MONTH_NAMES = [None] + list(_MONTHS)
+
 def getHours(data: Sequence[HistoryElement]) -> Sequence[int]:
     """Get hours for the given data.
 
@@ -37,6 +57,56 @@ def getWeeks(data: Sequence[HistoryElement]) -> Sequence[int]:
     _checkData(data)
     return [x.timeStamp.toDateTime().weekday() for x in data]
 
+def getEpochs(data: Sequence[HistoryElement]) -> np.ndarray:
+    """Get the epoch seconds of the given HistoryElements.
+
+    Args:
+        data (Sequence[HistoryElement]): elements to get the epochs of
+
+    If data already holds a column of epochs (such as HistoryColumns), that
+    column is returned without reading any TimeStamp.
+
+    Returns:
+        int64 array of TimeStamp.epoch that corresponds elementwise to data
+
+    Raises:
+        ValueError: if any HistoryElement doesn't contain a TimeStamp
+    """
+    epochs = getattr(data, 'epochs', None)
+    if isinstance(epochs, np.ndarray):
+        return epochs
+    _checkData(data)
+    return np.fromiter((x.timeStamp.epoch for x in data), dtype=np.int64, count=len(data))
+
+def getWeekdayHourCounts(epochs: np.ndarray, minutesPerBin: int = 60) -> np.ndarray:
+    """Count epochs by day of the week and time of day, in one pass.
+
+    Each epoch gets one combined index, weekday * binsPerDay + bin of the day,
+    so a single bincount fills the whole grid. The counts by hour and by day of
+    the week are its sums over each axis.
+
+    Args:
+        epochs (np.ndarray): epoch seconds (see TimeStamp.epoch)
+        minutesPerBin (int) (optional): minutes of each bin of the day. Must
+            divide an hour, so every bin is within one hour (e.g. 60 for
+            hours, 15 for quarter hours or 1 for minutes).
+
+    Returns:
+        int64 array of shape (7, 1440 // minutesPerBin), with rows from Monday
+        and columns from midnight
+
+    Raises:
+        ValueError: if minutesPerBin doesn't divide 60
+    """
+    if minutesPerBin < 1 or 60 % minutesPerBin != 0:
+        raise ValueError("minutesPerBin must divide 60, not {}".format(minutesPerBin))
+    binsPerDay = 1440 // minutesPerBin
+    epochs = np.asarray(epochs, dtype=np.int64)
+    days, seconds = np.divmod(epochs, 86400)
+    # Jan 1, 1970 was a Thursday, and weekdays count from Monday
+    indices = (days + 3) % 7 * binsPerDay + seconds // (minutesPerBin * 60)
+    return np.bincount(indices, minlength=7 * binsPerDay).reshape(7, binsPerDay)
+
 def _checkData(data: Sequence[HistoryElement]):
     """Check the given data to ensure the types and values are valid.
 
@@ -87,6 +157,28 @@ class TimeStamp:
         meridiem = dateList[2][3:5]
         self._hour = TimeStamp._adjustHour(int(dateList[0]), meridiem)
 
+    @classmethod
+    def fromEpoch(cls, epoch: int) -> TimeStamp:
+        """Create a TimeStamp from its epoch seconds.
+
+        This is the inverse of TimeStamp.epoch.
+
+        Args:
+            epoch (int): seconds since Jan 1, 1970, as given by TimeStamp.epoch
+
+        Returns:
+            TimeStamp of the same time
+        """
+        time = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=int(epoch))
+        timeStamp = cls.__new__(cls)
+        timeStamp._month = _MONTH_NAMES[time.month]
+        timeStamp._day = time.day
+        timeStamp._year = time.year
+        timeStamp._hour = time.hour
+        timeStamp._minute = time.minute
+        timeStamp._second = time.second
+        return timeStamp
+
     @staticmethod
     def _adjustHour(hour: int, meridiem: str) -> int:
         """Adjust hour to be on 24 hour scale.
@@ -113,6 +205,11 @@ class TimeStamp:
         """Month of the TimeStamp."""
         return self._month
 
+    @property
+    def monthNumber(self) -> int:
+        """1 based month of the TimeStamp (1 is January)."""
+        return _MONTHS[self._month]
+
     @property
     def day(self) -> int:
         """Day of the TimeStamp."""
@@ -133,6 +230,16 @@ class TimeStamp:
         """Second of the TimeStamp."""
         return self._second
 
+    @property
+    def epoch(self) -> int:
+        """Seconds since Jan 1, 1970 of the TimeStamp.
+
+        The time zone is ignored, so this is the local time as it is written in
+        the Google document, counted as if it was UTC.
+        """
+        return calendar.timegm((self._year, self.monthNumber, self._day,
+                                self._hour, self._minute, self._second))
+
     @property
     def hour(self) -> int:
         """Hour of the TimeStamp."""
@@ -153,22 +260,9 @@ class TimeStamp:
             raise TypeError("interval must be of type str")
         if interval not in {'day', 'month', 'year'}:
             raise ValueError("interval must be one of 'month', 'day', or 'year'")
-        months = {'Jan': 1,
-                  'Feb': 2,
-                  'Mar': 3,
-                  'Apr': 4,
-                  'May': 5,
-                  'Jun': 6,
-                  'Jul': 7,
-                  'Aug': 8,
-                  'Sep': 9,
-                  'Oct': 10,
-                  'Nov': 11,
-                  'Dec': 12
-                  }
         if interval == 'day':
-            return datetime.datetime(self.year, months[self.month], self.day)
+            return datetime.datetime(self.year, self.monthNumber, self.day)
         elif interval == 'month':
-            return datetime.datetime(self.year, months[self.month], 1)
+            return datetime.datetime(self.year, self.monthNumber, 1)
         elif interval == 'year':
             return datetime.datetime(self.year, 1, 1)
\ No newline at end of file
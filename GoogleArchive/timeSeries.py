@@ -0,0 +1,204 @@
+"""Resampling and rolling windows over epoch time stamps.
+
+Time stamps are bucketed with integer arithmetic on numpy arrays of epoch
+seconds (see TimeStamp.epoch), so bucketing is O(n) with no datetime per
+element. Resampled series are dense: every bucket between the first and the
+last time stamp is present, with a count of 0 if nothing happened in it.
+
+Intervals are given as strings of an optional count and a unit, such as
+'day', '3 days', '2 weeks' or 'quarter'. The units are hour, day, week (ISO
+weeks, starting on Monday), month, quarter and year.
+
+Functions:
+    parseInterval
+    bucketIndices
+    bucketStart
+    resample
+    rolling
+"""
+import datetime
+import re
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+_INTERVAL_REGEX = re.compile(r"^\s*(\d+)?\s*(hour|day|week|month|quarter|year)s?\s*$", re.IGNORECASE)
+
+_SECONDS_PER_HOUR = 3600
+_SECONDS_PER_DAY = 86400
+
+"""Length in seconds of the fixed width units."""
+_FIXED_UNITS = {'hour': _SECONDS_PER_HOUR, 'day': _SECONDS_PER_DAY, 'week': 7 * _SECONDS_PER_DAY}
+
+"""Number of months in the calendar units."""
+_CALENDAR_UNITS = {'month': 1, 'quarter': 3, 'year': 12}
+
+"""Jan 1, 1970 was a Thursday, so weeks start 3 days before the epoch."""
+_WEEK_OFFSET = 3 * _SECONDS_PER_DAY
+
+
+class TimeSeries:
+    """Dense series of values for consecutive buckets of time.
+
+    Attributes:
+        interval (str): the interval the series was resampled to
+        starts (Sequence[datetime.datetime]): the start of each bucket
+        values (np.ndarray): the value of each bucket
+    """
+
+    def __init__(self, interval: str, starts: Sequence[datetime.datetime], values: np.ndarray):
+        """Create a TimeSeries.
+
+        Args:
+            interval (str): the interval of the buckets
+            starts (Sequence[datetime.datetime]): the start of each bucket
+            values (np.ndarray): the value of each bucket
+        """
+        self.interval = interval
+        self.starts = starts
+        self.values = values
+
+    def __len__(self) -> int:
+        """Number of buckets in the series."""
+        return len(self.values)
+
+
+def parseInterval(interval: str) -> Tuple[int, str]:
+    """Split an interval into its count and unit.
+
+    Args:
+        interval (str): the interval (e.g. 'month' or '3 days'), case
+            insensitive
+
+    Returns:
+        Tuple of the count and the unit (e.g. (3, 'day'))
+
+    Raises:
+        TypeError: if interval is not a string
+        ValueError: if interval is not a count and a unit, or the count is 0
+    """
+    if not isinstance(interval, str):
+        raise TypeError("interval must be of type str")
+    match = _INTERVAL_REGEX.match(interval)
+    if match is None:
+        raise ValueError("interval must be an optional count and one of hour, day, week, "
+                         "month, quarter or year, not {}".format(interval))
+    count = int(match.group(1)) if match.group(1) else 1
+    if count < 1:
+        raise ValueError("The count of an interval must be at least 1")
+    return count, match.group(2).lower()
+
+
+def _civilFromEpochs(epochs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the year and the month (1-12) of each epoch.
+
+    Uses the days to civil date algorithm of the proleptic Gregorian calendar,
+    in integer arithmetic only.
+    """
+    days = epochs // _SECONDS_PER_DAY + 719468
+    era = days // 146097
+    dayOfEra = days - era * 146097
+    yearOfEra = (dayOfEra - dayOfEra // 1460 + dayOfEra // 36524 - dayOfEra // 146096) // 365
+    dayOfYear = dayOfEra - (365 * yearOfEra + yearOfEra // 4 - yearOfEra // 100)
+    shiftedMonth = (5 * dayOfYear + 2) // 153
+    months = np.where(shiftedMonth < 10, shiftedMonth + 3, shiftedMonth - 9)
+    years = yearOfEra + era * 400 + (months <= 2)
+    return years, months
+
+
+def bucketIndices(epochs: np.ndarray, interval: str) -> np.ndarray:
+    """Get the index of the bucket that each epoch falls in.
+
+    Indices count buckets from a fixed origin, so consecutive buckets have
+    consecutive indices and the same time always has the same index.
+
+    Args:
+        epochs (np.ndarray): epoch seconds
+        interval (str): the interval of the buckets (e.g. 'week')
+
+    Returns:
+        array of int64 bucket indices, elementwise to epochs
+
+    Raises:
+        ValueError: if the interval is not valid
+    """
+    count, unit = parseInterval(interval)
+    epochs = np.asarray(epochs, dtype=np.int64)
+    if unit in _FIXED_UNITS:
+        offset = _WEEK_OFFSET if unit == 'week' else 0
+        return (epochs + offset) // (_FIXED_UNITS[unit] * count)
+    years, months = _civilFromEpochs(epochs)
+    return (years * 12 + months - 1) // (_CALENDAR_UNITS[unit] * count)
+
+
+def bucketStart(index: int, interval: str) -> datetime.datetime:
+    """Get the start of a bucket from its index.
+
+    Args:
+        index (int): index of the bucket, as given by bucketIndices
+        interval (str): the interval of the buckets
+
+    Returns:
+        the time the bucket starts at
+    """
+    count, unit = parseInterval(interval)
+    if unit in _FIXED_UNITS:
+        offset = _WEEK_OFFSET if unit == 'week' else 0
+        seconds = int(index) * _FIXED_UNITS[unit] * count - offset
+        return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)
+    month = int(index) * _CALENDAR_UNITS[unit] * count
+    return datetime.datetime(month // 12, month % 12 + 1, 1)
+
+
+def resample(epochs: np.ndarray, interval: str,
+             weights: Optional[np.ndarray] = None) -> TimeSeries:
+    """Count epochs in each bucket of an interval.
+
+    Args:
+        epochs (np.ndarray): epoch seconds, in any order
+        interval (str): the interval of the buckets (e.g. 'month')
+        weights (np.ndarray) (optional): value to add for each epoch instead of 1
+
+    Returns:
+        dense TimeSeries from the bucket of the earliest epoch to the bucket of
+        the latest one. Empty if there are no epochs.
+
+    Raises:
+        ValueError: if the interval is not valid
+    """
+    indices = bucketIndices(epochs, interval)
+    if len(indices) == 0:
+        return TimeSeries(interval, [], np.zeros(0))
+    first = indices.min()
+    values = np.bincount(indices - first, weights=weights)
+    starts = [bucketStart(first + i, interval) for i in range(len(values))]
+    return TimeSeries(interval, starts, values)
+
+
+def rolling(values: np.ndarray, window: int, kind: str = 'mean') -> np.ndarray:
+    """Compute a rolling sum or mean of a series using prefix sums.
+
+    The first window - 1 values use the part of the window that exists.
+
+    Args:
+        values (np.ndarray): values of a dense series, such as TimeSeries.values
+        window (int): number of buckets in each window
+        kind (str) (optional): 'mean' or 'sum'
+
+    Returns:
+        array of the rolling values, the same length as values
+
+    Raises:
+        ValueError: if window is less than 1 or kind is not 'mean' or 'sum'
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    if kind not in {'mean', 'sum'}:
+        raise ValueError("kind must be either 'mean' or 'sum'")
+    prefix = np.concatenate(([0], np.cumsum(values, dtype=np.float64)))
+    ends = np.arange(1, len(values) + 1)
+    begins = np.maximum(ends - window, 0)
+    sums = prefix[ends] - prefix[begins]
+    if kind == 'sum':
+        return sums
+    return sums / (ends - begins)
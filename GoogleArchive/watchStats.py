@@ -0,0 +1,189 @@
+"""Statistics of YouTube watch history.
+
+Video and channel IDs are dictionary-encoded into SymbolTables as the history
+is read, and every count is keyed by those integer codes. Names are kept once
+per code for display.
+
+Functions:
+    videoID
+    channelID
+    watchStats
+    logWatchStats
+"""
+import datetime
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from . import manifest
+from .historyElements import WatchHistoryElement
+from .symbols import SymbolTable
+
+
+def videoID(videoLink: str) -> str:
+    """Get the ID of a video from its link.
+
+    Args:
+        videoLink (str): link to the video
+            (e.g. 'https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+
+    Returns:
+        the ID of the video, or the empty string if the link has none
+    """
+    values = parse_qs(urlsplit(videoLink).query).get("v")
+    return values[0] if values else ""
+
+
+def channelID(channelLink: str) -> str:
+    """Get the ID of a channel from its link.
+
+    Args:
+        channelLink (str): link to the channel
+            (e.g. 'https://www.youtube.com/channel/UCuAXFkgsw1L7xaCfnd5JJOw')
+
+    Returns:
+        the ID of the channel (the last part of the path), or the empty string
+        if the link has none
+    """
+    return urlsplit(channelLink).path.rstrip("/").split("/")[-1]
+
+
+class WatchStats:
+    """Counts of watched videos grouped by video and by channel.
+
+    Attributes:
+        videos (SymbolTable): IDs of every video that has been watched
+        channels (SymbolTable): IDs of every channel that has been watched
+        total (int): number of watches counted
+    """
+
+    def __init__(self) -> None:
+        """Create empty WatchStats."""
+        self.videos = SymbolTable()
+        self.channels = SymbolTable()
+        self.total = 0
+        self._videoNames: List[str] = []
+        self._channelNames: List[str] = []
+        self._videoWatches = Counter()
+        self._channelWatches = Counter()
+        # keyed by (code, year * 12 + month - 1)
+        self._channelMonths = Counter()
+
+    def add(self, element: WatchHistoryElement) -> None:
+        """Count a single watch.
+
+        Watches of removed videos, which have no link, are ignored.
+
+        Args:
+            element (WatchHistoryElement): element to count
+        """
+        video = videoID(element.videoLink)
+        if not video:
+            return
+        self.total += 1
+        videoCode = self.videos.code(video)
+        if videoCode == len(self._videoNames):
+            self._videoNames.append(element.videoName)
+        self._videoWatches[videoCode] += 1
+
+        channel = channelID(element.channelLink)
+        if not channel:
+            return
+        channelCode = self.channels.code(channel)
+        if channelCode == len(self._channelNames):
+            self._channelNames.append(element.channelName)
+        self._channelWatches[channelCode] += 1
+        timeStamp = element.timeStamp
+        self._channelMonths[channelCode, timeStamp.year * 12 + timeStamp.monthNumber - 1] += 1
+
+    def videoName(self, code: int) -> str:
+        """Name of the video with the given code."""
+        return self._videoNames[code]
+
+    def channelName(self, code: int) -> str:
+        """Name of the channel with the given code."""
+        return self._channelNames[code]
+
+    def topChannels(self, numChannels: int) -> Sequence[Tuple[int, int]]:
+        """Get the most watched channels.
+
+        Args:
+            numChannels (int): number of channels to return
+
+        Returns:
+            Sequence of (channel code, watches), most watched first
+        """
+        return self._channelWatches.most_common(numChannels)
+
+    def rewatches(self, numVideos: int) -> Sequence[Tuple[int, int]]:
+        """Get the videos that were watched the most times.
+
+        Only videos that were watched more than once are included.
+
+        Args:
+            numVideos (int): number of videos to return
+
+        Returns:
+            Sequence of (video code, watches), most watched first
+        """
+        return [(code, count) for code, count in self._videoWatches.most_common(numVideos)
+                if count > 1]
+
+    @property
+    def rewatchCount(self) -> int:
+        """Number of watches of a video that had already been watched."""
+        return self.total - len(self.videos)
+
+    def channelActivity(self, code: int) -> Sequence[Tuple[datetime.datetime, int]]:
+        """Get the number of watches of a channel for each month.
+
+        Args:
+            code (int): code of the channel
+
+        Returns:
+            Sequence of (first day of the month, watches), oldest first. Months
+            without watches are left out.
+        """
+        months = sorted((month, count) for (key, month), count in self._channelMonths.items()
+                        if key == code)
+        return [(datetime.datetime(month // 12, month % 12 + 1, 1), count)
+                for month, count in months]
+
+
+def watchStats(data: Iterable[WatchHistoryElement]) -> WatchStats:
+    """Compute WatchStats in a single pass over watch history.
+
+    Args:
+        data (Iterable[WatchHistoryElement]): the watch history
+
+    Returns:
+        WatchStats of the given data
+    """
+    stats = WatchStats()
+    for element in data:
+        stats.add(element)
+    return stats
+
+
+def logWatchStats(stats: WatchStats, numItems: int, dir: Path) -> None:
+    """Save channel and rewatch statistics to Youtube_Watch_Stats.txt.
+
+    Args:
+        stats (WatchStats): stats to save
+        numItems (int): number of channels and videos to list
+        dir (Path): directory to save the file to
+    """
+    with manifest.textOutput(dir.joinpath("Youtube_Watch_Stats.txt")) as f:
+        f.write("Watches: {}, Videos: {}, Channels: {}, Rewatches: {}\n".format(
+            stats.total, len(stats.videos), len(stats.channels), stats.rewatchCount))
+        f.write("\nTop Channels:\n")
+        for code, count in stats.topChannels(numItems):
+            f.write("{} , Frequency:{}\n".format(stats.channelName(code), count))
+        f.write("\nMost Rewatched Videos:\n")
+        for code, count in stats.rewatches(numItems):
+            f.write("{} , Frequency:{}\n".format(stats.videoName(code), count))
+        for code, count in stats.topChannels(numItems):
+            f.write("\n{}\n".format(stats.channelName(code)))
+            for month, monthCount in stats.channelActivity(code):
+                f.write("    {}: {}\n".format(month.strftime("%Y-%m"), monthCount))
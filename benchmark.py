@@ -0,0 +1,12 @@
+import GoogleArchive
+from GoogleArchive import benchmark
+from pathlib import Path
+
+def main():
+    takeoutPath = Path("Takeout/")
+    benchmark.internMemoryReport(takeoutPath, GoogleArchive.outputDir)
+    benchmark.backendSpeedReport(takeoutPath, GoogleArchive.outputDir)
+    input('Press any key to exit.')
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file